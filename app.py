@@ -3,43 +3,68 @@
 from flask import Flask
 from models.models import db, User
 from flask_login import LoginManager
-from forms import LoginForm
 from routes.routes import init_routes
+from migrations import migrate
+from database import init_database
 from config import DevelopmentConfig, ProductionConfig
 from dotenv import load_dotenv
 import os
 
-app = Flask(__name__)
+# Built on first access of `app` (see __getattr__ below)
+_app = None
 
-# Load configuration based on the environment
-if os.environ.get('FLASK_ENV') == 'production':
-    app.config.from_object(ProductionConfig)
-else:
-    app.config.from_object(DevelopmentConfig)
 
-# Initialize extensions
-db.init_app(app)
-login_manager = LoginManager()
-login_manager.init_app(app)
-login_manager.login_view = 'login'  # Redirect to 'login' view if unauthorized
-login_manager.login_message_category = 'info'
+def create_app(config_object=None, **overrides):
+    """Build and configure the Flask application
 
-# Create the database tables
-with app.app_context():
-    db.create_all()
+    Keyword arguments override individual config values, e.g. to run a
+    render worker without the web app's background threads.
+    """
+    # Load environment variables from .env file before reading config
+    load_dotenv()
 
-# User loader callback for Flask-Login
-@login_manager.user_loader
-def load_user(user_id):
-    return db.session.get(User, int(user_id))
+    app = Flask(__name__)
 
-# Initialize routes
-init_routes(app)
+    # Load configuration based on the environment
+    if config_object is None:
+        config_object = ProductionConfig if os.environ.get('FLASK_ENV') == 'production' else DevelopmentConfig
+    app.config.from_object(config_object)
+    app.config.update(overrides)
+
+    # Initialize extensions
+    db.init_app(app)
+    init_database(app)
+    login_manager = LoginManager()
+    login_manager.init_app(app)
+    login_manager.login_view = 'login'  # Redirect to 'login' view if unauthorized
+    login_manager.login_message_category = 'info'
+
+    # User loader callback for Flask-Login
+    @login_manager.user_loader
+    def load_user(user_id):
+        return db.session.get(User, int(user_id))
+
+    # Bring the database schema up to date
+    with app.app_context():
+        migrate(db.engine)
+
+    # Initialize routes
+    init_routes(app)
+    return app
+
+
+def __getattr__(name):
+    # `from app import app` and `gunicorn app:app` keep working, but importing
+    # this module no longer builds an app, connects or migrates on its own
+    global _app
+    if name == 'app':
+        if _app is None:
+            _app = create_app()
+        return _app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Load environment variables from .env file
-load_dotenv()
 
 if __name__ == '__main__':
     # Use production-ready server configuration
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port)
\ No newline at end of file
+    create_app().run(host='0.0.0.0', port=port)
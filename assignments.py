@@ -0,0 +1,76 @@
+import json
+from datetime import datetime, timezone
+from sqlalchemy import case, text, update
+from models.models import db, Folder, video_folders, video_tags
+
+# Association table and the id column of the other side, by target kind
+ASSIGNMENT_TABLES = {
+    'tag': (video_tags, 'tag_id', 'tags'),
+    'folder': (video_folders, 'folder_id', 'folders'),
+}
+
+
+def assign(kind, video_ids, target_ids):
+    """Link every video to every tag or folder with one INSERT OR IGNORE
+
+    Ids are passed as JSON arrays so selections of any size stay one
+    statement with two parameters. Returns the number of new links.
+    INSERT OR IGNORE and json_each are SQLite's; migrate() refuses to
+    start on other databases.
+    """
+    table, column, target_table = ASSIGNMENT_TABLES[kind]
+    result = db.session.execute(text(
+        f"INSERT OR IGNORE INTO {table.name} (video_id, {column}, created_at) "
+        f"SELECT videos.id, {target_table}.id, :now FROM videos, {target_table} "
+        f"WHERE videos.id IN (SELECT value FROM json_each(:video_ids)) "
+        f"AND {target_table}.id IN (SELECT value FROM json_each(:target_ids))"
+    ), {
+        'now': datetime.now(timezone.utc),
+        'video_ids': _json_ids(video_ids),
+        'target_ids': _json_ids(target_ids),
+    })
+    return result.rowcount
+
+
+def unassign(kind, video_ids, target_ids):
+    """Remove links between the videos and tags or folders with one DELETE"""
+    table, column, _ = ASSIGNMENT_TABLES[kind]
+    result = db.session.execute(text(
+        f"DELETE FROM {table.name} "
+        f"WHERE video_id IN (SELECT value FROM json_each(:video_ids)) "
+        f"AND {column} IN (SELECT value FROM json_each(:target_ids))"
+    ), {
+        'video_ids': _json_ids(video_ids),
+        'target_ids': _json_ids(target_ids),
+    })
+    return result.rowcount
+
+
+def count_existing(table_name, ids):
+    """Number of the given ids present in a table, for request validation"""
+    return db.session.execute(text(
+        f"SELECT COUNT(*) FROM {table_name} WHERE id IN (SELECT value FROM json_each(:ids))"
+    ), {'ids': _json_ids(set(ids))}).scalar()
+
+
+def reorder_folders(positions):
+    """Set position and parent for many folders with one UPDATE ... CASE
+
+    `positions` is a list of dicts with `id`, `position` and `parent_id`.
+    """
+    if not positions:
+        return 0
+    ids = [item['id'] for item in positions]
+    result = db.session.execute(
+        update(Folder).where(Folder.id.in_(ids)).values(
+            position=case({item['id']: item['position'] for item in positions}, value=Folder.id),
+            parent_id=case({item['id']: item.get('parent_id') for item in positions}, value=Folder.id)
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+
+def _json_ids(ids):
+    # Ids from the browser may arrive as strings
+    return json.dumps([int(value) for value in ids])
@@ -0,0 +1,111 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# Registered periodic maintenance tasks, keyed by name
+_tasks = {}
+_tasks_lock = threading.Lock()
+_scheduler_thread = None
+
+# Single worker for slow side effects (file moves and deletes) taken off
+# the request path; one thread keeps them in submission order
+_worker = None
+
+# Session.info key for jobs waiting on the surrounding commit
+_PENDING_JOBS = 'pending_background_jobs'
+
+
+def register_periodic_task(name, interval, func):
+    """Register a function to be run every `interval` seconds"""
+    with _tasks_lock:
+        _tasks[name] = {
+            'interval': interval,
+            'func': func,
+            'last_run': 0.0
+        }
+
+
+def run_due_tasks(now=None):
+    """Run every registered task whose interval has elapsed"""
+    now = time.monotonic() if now is None else now
+    with _tasks_lock:
+        due = [(name, task) for name, task in _tasks.items()
+               if now - task['last_run'] >= task['interval']]
+        for _, task in due:
+            task['last_run'] = now
+
+    for name, task in due:
+        try:
+            task['func']()
+        except Exception as e:
+            print(f"Error running background task {name}: {str(e)}")
+    return [name for name, _ in due]
+
+
+def start_scheduler(app, tick=5):
+    """Start the daemon thread that runs periodic tasks inside an app context"""
+    global _scheduler_thread
+    if _scheduler_thread is not None and _scheduler_thread.is_alive():
+        return _scheduler_thread
+
+    def loop():
+        while True:
+            with app.app_context():
+                run_due_tasks()
+            time.sleep(tick)
+
+    _scheduler_thread = threading.Thread(target=loop, name='background-scheduler', daemon=True)
+    _scheduler_thread.start()
+    return _scheduler_thread
+
+
+def start_background_worker():
+    """Start the worker that runs submitted jobs in order"""
+    global _worker
+    if _worker is None:
+        _worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='background-worker')
+    return _worker
+
+
+def stop_background_worker():
+    """Wait for submitted jobs to finish and stop the worker"""
+    global _worker
+    if _worker is not None:
+        _worker.shutdown(wait=True)
+        _worker = None
+
+
+def submit_background(func, *args, **kwargs):
+    """Run `func` on the background worker, or inline if none is running"""
+    if _worker is None:
+        _run_job(func, args, kwargs)
+        return None
+    return _worker.submit(_run_job, func, args, kwargs)
+
+
+def submit_after_commit(session, func, *args):
+    """Submit a job to the background worker once `session` commits
+
+    Jobs are dropped if the session rolls back instead.
+    """
+    session.info.setdefault(_PENDING_JOBS, []).append((func, args))
+
+
+@event.listens_for(Session, 'after_commit')
+def _submit_pending_jobs(session):
+    for func, args in session.info.pop(_PENDING_JOBS, []):
+        submit_background(func, *args)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending_jobs(session):
+    session.info.pop(_PENDING_JOBS, None)
+
+
+def _run_job(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    except Exception as e:
+        print(f"Error running background job {func.__name__}: {str(e)}")
@@ -0,0 +1,61 @@
+"""Cut many clips from one video in a single decode pass
+
+Clip definitions are a JSON list (or {"clips": [...]}) of
+{"name": ..., "segments": [{"start": "MM:SS", "end": "MM:SS"}, ...]}:
+
+    python -m batch_clips 12 highlights.json           # render now, in this process
+    python -m batch_clips 12 highlights.json --queue   # leave it to the render workers
+"""
+import argparse
+import json
+import sys
+from helper import clip_batch_payload, validate_clip_definitions
+from jobs import enqueue
+from models.models import db, Video
+from worker import render_clip_batch_job
+
+
+def load_definitions(path):
+    """Clip definitions from a JSON file"""
+    with open(path) as definitions_file:
+        data = json.load(definitions_file)
+    return data.get('clips') if isinstance(data, dict) else data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('video_id', type=int)
+    parser.add_argument('definitions', help='JSON file of clip definitions')
+    parser.add_argument('--queue', action='store_true', help='queue a job instead of rendering here')
+    args = parser.parse_args(argv)
+
+    clips = load_definitions(args.definitions)
+    error = validate_clip_definitions(clips)
+    if error:
+        print(f"Error: {error}")
+        return 1
+
+    from app import create_app
+    app = create_app(JOB_WORKER_THREADS=0, BACKGROUND_TASKS_ENABLED=False, WRITE_QUEUE_ENABLED=False)
+    with app.app_context():
+        video = db.session.get(Video, args.video_id)
+        if video is None:
+            print(f"Error: video {args.video_id} not found")
+            return 1
+        payload = clip_batch_payload(app.config, video, clips)
+
+        if args.queue:
+            job = enqueue('clip_batch', payload, priority=10)
+            db.session.commit()
+            print(f"Queued job {job.id} for {len(clips)} clips")
+            return 0
+
+        result = render_clip_batch_job(payload, lambda progress, status=None: print(f"{progress:3d}% {status or ''}"))
+        print(f"Created {len(result['clip_ids'])} clips")
+        for name in result['failed']:
+            print(f"Failed: {name}")
+        return 1 if result['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+"""Performance benchmarks, runnable as `python -m benchmarks.<name>`"""
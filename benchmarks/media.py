@@ -0,0 +1,384 @@
+"""Media and library benchmarks on synthetic fixtures, with stored baselines
+
+Run with `python -m benchmarks.media`. Source videos are generated with
+FFmpeg's lavfi `testsrc` and `sine` sources, so every machine benchmarks
+the same media; they are cached in the work directory between runs.
+
+    python -m benchmarks.media                          # run and print
+    python -m benchmarks.media --only render,library    # some groups only
+    python -m benchmarks.media --save benchmarks/baselines/laptop.json
+    python -m benchmarks.media --compare benchmarks/baselines/laptop.json
+
+With --compare the exit status is non-zero when any benchmark's median
+is slower than the baseline by more than the threshold. Media groups are
+skipped when FFmpeg is not installed.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from sqlalchemy import delete, insert
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Synthetic sources: name -> (duration in seconds, resolution)
+FIXTURES = {
+    'sd': (10, '640x360'),
+    'hd': (30, '1280x720'),
+    'fhd': (60, '1920x1080'),
+}
+
+CLIP_SEGMENTS = (1, 5, 20)
+SCAN_FILES = 32
+LIBRARY_ROWS = (1000, 10000)
+STREAM_SEEKS = 20
+SEEK_READ_BYTES = 64 * 1024
+
+# A benchmark regresses when its median is this much slower than the baseline...
+REGRESSION_THRESHOLD = 0.15
+# ...and by at least this many seconds, so fast benchmarks do not flag on noise
+MIN_REGRESSION_SECONDS = 0.005
+
+GROUPS = ('render', 'thumbnail', 'scan', 'stream', 'library')
+MEDIA_GROUPS = ('render', 'thumbnail', 'scan', 'stream')
+
+
+def fixture_command(path, duration, resolution):
+    """FFmpeg command generating a test pattern video with a sine tone"""
+    return [
+        'ffmpeg', '-y', '-loglevel', 'error',
+        '-f', 'lavfi', '-i', f'testsrc=duration={duration}:size={resolution}:rate=30',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={duration}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-g', '60',
+        '-c:a', 'aac', '-shortest', str(path)
+    ]
+
+
+def make_fixture(directory, name):
+    """Path of a synthetic fixture, generating it on first use"""
+    duration, resolution = FIXTURES[name]
+    path = os.path.join(directory, f'{name}_{resolution}_{duration}s.mp4')
+    if not os.path.exists(path):
+        os.makedirs(directory, exist_ok=True)
+        partial = path + '.partial.mp4'
+        result = subprocess.run(fixture_command(partial, duration, resolution),
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Could not generate fixture {name}: {result.stderr.strip()}")
+        os.replace(partial, path)
+    return path
+
+
+def timed(func, repeat, warmup=1):
+    """Run `func` `repeat` times after `warmup` untimed runs; summary statistics of the wall times"""
+    for _ in range(warmup):
+        func()
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        runs.append(time.perf_counter() - started)
+    return {'median': statistics.median(runs), 'min': min(runs), 'max': max(runs), 'runs': len(runs)}
+
+
+def spread_intervals(duration, count):
+    """`count` evenly spaced one-second (or shorter) intervals across a source"""
+    length = min(1.0, duration / (2 * count))
+    step = duration / count
+    return [(round(i * step, 3), round(i * step + length, 3)) for i in range(count)]
+
+
+def bench_render(app, workdir, repeat):
+    """create_clip's render: 1, 5 and 20 segments with poster and preview"""
+    from render import render_clip
+    source = make_fixture(os.path.join(workdir, 'fixtures'), 'hd')
+    output_dir = os.path.join(workdir, 'renders')
+    results = {}
+    for count in CLIP_SEGMENTS:
+        intervals = spread_intervals(FIXTURES['hd'][0], count)
+
+        def run():
+            result = render_clip(source, intervals, os.path.join(output_dir, 'clip.mp4'),
+                                 poster_path=os.path.join(output_dir, 'poster.webp'),
+                                 preview_path=os.path.join(output_dir, 'preview.webp'))
+            if result.returncode != 0:
+                raise RuntimeError(f"Render failed: {result.stderr.strip()[-500:]}")
+        results[f'render/{count}_segments'] = timed(run, repeat)
+    return results
+
+
+def bench_thumbnail(app, workdir, repeat):
+    """A single thumbnail per resolution, and a batch across every fixture"""
+    from media_worker import generate_thumbnails
+    from thumbnails import THUMBNAIL_SIZES, render_thumbnail
+    fixtures = {name: make_fixture(os.path.join(workdir, 'fixtures'), name) for name in FIXTURES}
+    output_dir = os.path.join(workdir, 'thumbnails')
+    results = {}
+    for name, source in fixtures.items():
+        def run():
+            if not render_thumbnail(source, os.path.join(output_dir, f'{name}.webp'), 1000, 'md', 'webp'):
+                raise RuntimeError(f"Thumbnail of {name} failed")
+        results[f'thumbnail/single_{name}'] = timed(run, repeat)
+
+    items = [{'source': source, 'output': os.path.join(output_dir, f'batch_{i}.webp'),
+              'timestamp_ms': 1000 + i * 100, 'width': THUMBNAIL_SIZES['md'], 'fmt': 'webp'}
+             for i, source in enumerate(list(fixtures.values()) * 4)]
+    results[f'thumbnail/batch_{len(items)}'] = timed(lambda: generate_thumbnails(items), repeat)
+    return results
+
+
+def bench_scan(app, workdir, repeat):
+    """A full /scan-progress scan of a folder of SCAN_FILES videos"""
+    from models.models import db, Job, Video
+    source = make_fixture(os.path.join(workdir, 'fixtures'), 'sd')
+    folder = os.path.join(workdir, 'scan')
+    os.makedirs(folder, exist_ok=True)
+    for i in range(SCAN_FILES):
+        path = os.path.join(folder, f'video_{i:03d}.mp4')
+        if not os.path.exists(path):
+            shutil.copyfile(source, path)
+
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['selected_folder'] = folder
+
+    def run():
+        with app.app_context():
+            db.session.execute(delete(Video))
+            db.session.execute(delete(Job))
+            db.session.commit()
+        processed = 0
+        while processed < SCAN_FILES:
+            response = client.post('/scan-progress', json={'processed': processed, 'total': SCAN_FILES})
+            data = response.get_json()
+            if response.status_code != 200 or 'error' in data:
+                raise RuntimeError(f"Scan failed: {data}")
+            processed = data['processed']
+    return {f'scan/{SCAN_FILES}_files': timed(run, repeat)}
+
+
+def bench_stream(app, workdir, repeat):
+    """stream_video: a full read of each fixture and random-offset range seeks"""
+    from models.models import db, Video
+    results = {}
+    client = app.test_client()
+    for name in FIXTURES:
+        path = make_fixture(os.path.join(workdir, 'fixtures'), name)
+        with app.app_context():
+            video = Video.query.filter_by(file_path=path).first()
+            if video is None:
+                video = Video(title=f'stream {name}', file_path=path)
+                db.session.add(video)
+                db.session.commit()
+            video_id = video.id
+        size = os.path.getsize(path)
+
+        def read_all():
+            response = client.get(f'/stream_video/{video_id}')
+            if len(response.data) != size:
+                raise RuntimeError(f"Short read streaming {name}")
+        results[f'stream/full_{name}'] = timed(read_all, repeat)
+
+        offsets = random.Random(name).sample(range(max(1, size - SEEK_READ_BYTES)), STREAM_SEEKS)
+
+        def seek():
+            # Time to the first SEEK_READ_BYTES after each seek, as a player sees it
+            for offset in offsets:
+                response = client.get(f'/stream_video/{video_id}', buffered=False,
+                                      headers={'Range': f'bytes={offset}-'})
+                # A full response from byte 0 would time reads, not seeks
+                expected_range = f'bytes {offset}-{size - 1}/{size}'
+                if response.status_code != 206 or response.headers.get('Content-Range') != expected_range:
+                    response.close()
+                    raise RuntimeError(f"stream_video ignored Range bytes={offset}- on {name}: "
+                                       f"{response.status_code} {response.headers.get('Content-Range')}")
+                received = 0
+                for chunk in response.response:
+                    received += len(chunk)
+                    if received >= SEEK_READ_BYTES:
+                        break
+                response.close()
+        results[f'stream/{STREAM_SEEKS}_seeks_{name}'] = timed(seek, repeat)
+    return results
+
+
+def bench_library(app, workdir, repeat, sizes=LIBRARY_ROWS):
+    """The library page and a search across it at 1k and 10k videos"""
+    from fragment_cache import FRAGMENTS
+    from models.models import db, Video
+    client = app.test_client()
+    results = {}
+    for rows in sizes:
+        with app.app_context():
+            db.session.execute(delete(Video))
+            db.session.execute(insert(Video), [{
+                'title': f'Library video {i:05d}',
+                'file_path': os.path.join(workdir, 'library', f'video_{i:05d}.mp4'),
+                'fingerprint': f'{i:020x}',
+                'duration': 30.0 + i % 600
+            } for i in range(rows)])
+            db.session.commit()
+
+        def render_page(url):
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f"GET {url} returned {response.status_code}")
+            return response
+
+        # Rendering and queries with the fragment cache off, then cache hits
+        # separately, so a slower page cannot hide behind the cache
+        saved_size = FRAGMENTS.max_entries
+        try:
+            FRAGMENTS.max_entries = 0
+            FRAGMENTS.clear()
+            results[f'library/index_{rows}_rows'] = timed(lambda: render_page('/'), repeat)
+            results[f'library/search_{rows}_rows'] = timed(lambda: render_page('/search?q=video'), repeat)
+            FRAGMENTS.max_entries = max(saved_size, 16)
+            results[f'library/index_{rows}_rows_cached'] = timed(lambda: render_page('/'), repeat)
+            results[f'library/search_{rows}_rows_cached'] = timed(lambda: render_page('/search?q=video'), repeat)
+        finally:
+            FRAGMENTS.max_entries = saved_size
+            FRAGMENTS.clear()
+    return results
+
+
+BENCHMARKS = {
+    'render': bench_render,
+    'thumbnail': bench_thumbnail,
+    'scan': bench_scan,
+    'stream': bench_stream,
+    'library': bench_library,
+}
+
+
+def run_benchmarks(app, workdir, groups=GROUPS, repeat=3):
+    """Run benchmark groups; returns a results document for saving or comparing"""
+    has_ffmpeg = shutil.which('ffmpeg') is not None
+    results, skipped = {}, []
+    for group in groups:
+        if group in MEDIA_GROUPS and not has_ffmpeg:
+            skipped.append(group)
+            continue
+        results.update(BENCHMARKS[group](app, workdir, repeat))
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                    'processor': platform.processor(), 'cpus': os.cpu_count(),
+                    'ffmpeg': _ffmpeg_version() if has_ffmpeg else None},
+        'repeat': repeat,
+        'skipped': skipped,
+        'results': results,
+    }
+
+
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD,
+                    min_seconds=MIN_REGRESSION_SECONDS):
+    """Compare medians with a baseline document
+
+    Returns (name, baseline median, current median, relative change,
+    status) rows, where status is 'regression', 'improvement', 'ok', 'new'
+    or 'missing'.
+    """
+    rows = []
+    before, after = baseline['results'], current['results']
+    for name in sorted(set(before) | set(after)):
+        if name not in before:
+            rows.append((name, None, after[name]['median'], None, 'new'))
+            continue
+        if name not in after:
+            # Skipped groups are not regressions, e.g. no FFmpeg on this machine
+            rows.append((name, before[name]['median'], None, None, 'missing'))
+            continue
+        old, new = before[name]['median'], after[name]['median']
+        change = (new - old) / old if old else 0.0
+        if change > threshold and new - old > min_seconds:
+            status = 'regression'
+        elif change < -threshold and old - new > min_seconds:
+            status = 'improvement'
+        else:
+            status = 'ok'
+        rows.append((name, old, new, change, status))
+    return rows
+
+
+def create_benchmark_app(workdir):
+    """An app on its own database and media directories inside `workdir`"""
+    from app import create_app
+    from config import TestingConfig
+    return create_app(
+        TestingConfig,
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(workdir, 'benchmark.db')}",
+        THUMBNAIL_STORE=os.path.join(workdir, 'thumbnail_store'),
+        CLIP_THUMBNAIL_DIR=os.path.join(workdir, 'clip_thumbnails'),
+        PROFILE_DIR=os.path.join(workdir, 'profiles'),
+        QUERY_COUNT_HEADER=False,
+        # bench_library turns the cache on only for its *_cached entries
+        FRAGMENT_CACHE_SIZE=0,
+    )
+
+
+def _ffmpeg_version():
+    result = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True)
+    return result.stdout.splitlines()[0] if result.stdout else None
+
+
+def _format_seconds(value):
+    return '-' if value is None else f'{value * 1000:10.1f} ms'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--only', help=f"comma-separated groups ({', '.join(GROUPS)})")
+    parser.add_argument('--repeat', type=int, default=3, help='runs per benchmark')
+    parser.add_argument('--workdir', default=os.path.join(ROOT, 'instance', 'benchmarks'),
+                        help='fixtures, database and outputs (fixtures are reused)')
+    parser.add_argument('--save', help='write the results to this JSON baseline')
+    parser.add_argument('--compare', help='compare against this JSON baseline')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative slowdown flagged as a regression')
+    args = parser.parse_args(argv)
+
+    groups = args.only.split(',') if args.only else GROUPS
+    unknown = [group for group in groups if group not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown groups: {', '.join(unknown)}")
+
+    os.makedirs(args.workdir, exist_ok=True)
+    # A fresh database each run; the generated fixtures are kept
+    if os.path.exists(os.path.join(args.workdir, 'benchmark.db')):
+        os.remove(os.path.join(args.workdir, 'benchmark.db'))
+    app = create_benchmark_app(args.workdir)
+    current = run_benchmarks(app, args.workdir, groups, args.repeat)
+    if current['skipped']:
+        print(f"Skipped (ffmpeg not installed): {', '.join(current['skipped'])}")
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w') as baseline_file:
+            json.dump(current, baseline_file, indent=2)
+        print(f"Saved baseline to {args.save}")
+
+    if not args.compare:
+        for name, stats in sorted(current['results'].items()):
+            print(f"{name:36} {_format_seconds(stats['median'])}  (min {stats['min'] * 1000:.1f} ms)")
+        return 0
+
+    with open(args.compare) as baseline_file:
+        baseline = json.load(baseline_file)
+    rows = compare_results(baseline, current, args.threshold)
+    print(f"{'benchmark':36} {'baseline':>13} {'current':>13} {'change':>8}")
+    for name, old, new, change, status in rows:
+        change_text = '' if change is None else f'{change:+.0%}'
+        flag = '' if status == 'ok' else status.upper()
+        print(f"{name:36} {_format_seconds(old):>13} {_format_seconds(new):>13} {change_text:>8}  {flag}")
+    return 1 if any(row[4] == 'regression' for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
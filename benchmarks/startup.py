@@ -0,0 +1,97 @@
+"""Import time and startup budget for the application
+
+Run with `python -m benchmarks.startup`. A fresh interpreter imports `app`
+with `-X importtime` and builds an app against an in-memory database; the
+slowest modules are reported and the exit status is non-zero when the
+import time exceeds the budget or a lazily loaded subsystem was imported
+at startup.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Milliseconds allowed for `import app` in a fresh interpreter
+IMPORT_BUDGET_MS = 1500
+
+# Subsystems that must only be imported when first used
+LAZY_MODULES = ('tkinter', 'gradio', 'av')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_CHILD = """
+import json, sys, time
+start = time.perf_counter()
+import app
+from config import TestingConfig
+imported = time.perf_counter()
+
+class StartupConfig(TestingConfig):
+    SQLALCHEMY_DATABASE_URI = 'sqlite://'
+
+app.create_app(StartupConfig)
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'modules': sorted(sys.modules),
+}))
+"""
+
+
+def parse_importtime(stderr):
+    """Parse `-X importtime` output into (module, self_us, cumulative_us) rows"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((module.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_startup():
+    """Import and build the app in a fresh interpreter and time it"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', _CHILD],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup failed: {result.stderr.strip().splitlines()[-1]}")
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    measurement['imports'] = parse_importtime(result.stderr)
+    return measurement
+
+
+def check_startup(measurement, budget_ms=IMPORT_BUDGET_MS):
+    """List the ways a measurement breaks the startup budget"""
+    problems = []
+    if measurement['import_ms'] > budget_ms:
+        problems.append(f"import took {measurement['import_ms']:.0f} ms, budget is {budget_ms} ms")
+    loaded = set(measurement['modules'])
+    for module in LAZY_MODULES:
+        if module in loaded:
+            problems.append(f"{module} is imported at startup")
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument('--top', type=int, default=15, help='slowest modules to list')
+    args = parser.parse_args(argv)
+
+    measurement = measure_startup()
+    print(f"import app:   {measurement['import_ms']:8.1f} ms")
+    print(f"create_app(): {measurement['create_app_ms']:8.1f} ms")
+    print(f"\n{'self ms':>9} {'total ms':>9}  module")
+    for module, self_us, cumulative_us in sorted(measurement['imports'], key=lambda row: -row[2])[:args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {module}")
+
+    problems = check_startup(measurement, args.budget_ms)
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
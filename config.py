@@ -5,18 +5,107 @@ class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'your_secret_key')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # Content-addressed video thumbnail store, kept within STORAGE_QUOTA_MB
+    THUMBNAIL_STORE = os.path.join('static', 'thumbnails', 'store')
+    THUMBNAIL_FORMAT = os.environ.get('THUMBNAIL_FORMAT', 'webp')
+    THUMBNAIL_TIMESTAMP_MS = 1000
+
+    # Clip posters and animated previews rendered alongside each clip
+    CLIP_THUMBNAIL_DIR = os.path.join('static', 'thumbnails', 'clips')
+    CLIP_PREVIEW_ENABLED = True
+    CLIP_PREVIEW_SECONDS = 3
+
+    # Unreferenced clip thumbnails are collected by a periodic sweep
+    THUMBNAIL_GC_INTERVAL = 600
+    THUMBNAIL_GC_GRACE_SECONDS = 3600
+
+    # Small all-intra proxies the editor plays so seeking is instant; clip
+    # renders always read the original
+    PROXY_ENABLED = True
+    PROXY_DIR = os.path.join('instance', 'proxies')
+    PROXY_HEIGHT = 540
+    PROXY_GOP = 1
+
+    # Deleted clips stay restorable for this long before a purge removes them
+    TRASH_TTL_SECONDS = 7 * 24 * 3600
+    TRASH_PURGE_INTERVAL = 3600
+
+    # Regenerable media is evicted least recently used first above this quota;
+    # user clips count towards it but are never evicted
+    STORAGE_QUOTA_MB = int(os.environ.get('STORAGE_QUOTA_MB', 20480))
+    STORAGE_RECONCILE_INTERVAL = 900
+
+    # Files ingested per scan request, probed and thumbnailed as one batch
+    SCAN_BATCH_SIZE = 16
+    DURATION_BACKFILL_INTERVAL = 600
+
+    # Rows per page for the keyset-paginated library and clip lists
+    LIBRARY_PAGE_SIZE = 60
+    CLIPS_PAGE_SIZE = 48
+    ORGANIZE_PAGE_SIZE = 100
+
+    # Clip renders, thumbnails and analysis run as queued jobs. Workers run as
+    # threads in the web process and/or separately with `python -m worker`.
+    JOB_WORKER_THREADS = 1
+    JOB_LEASE_SECONDS = 60
+    JOB_POLL_INTERVAL = 1.0
+    JOB_RETENTION_SECONDS = 24 * 3600
+
+    # /events streams: updates from this process arrive at once, the database
+    # is polled for workers in other processes. Streams close after
+    # EVENTS_STREAM_SECONDS and browsers reconnect.
+    EVENTS_POLL_INTERVAL = 2.0
+    EVENTS_KEEPALIVE_SECONDS = 15
+    EVENTS_STREAM_SECONDS = 300
+    EVENTS_RECENT_SECONDS = 60
+
+    # Request profiling: admins (by username) trigger it with an `X-Profile: 1`
+    # header or `?_profile=1`; a sample rate above 0 also profiles random requests
+    PROFILING_ADMINS = [name for name in os.environ.get('PROFILING_ADMINS', '').split(',') if name]
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILE_DIR = os.path.join('instance', 'profiles')
+    PROFILE_MAX_FILES = 200
+
+    # Rendered listing responses kept in memory, keyed by the data version
+    FRAGMENT_CACHE_SIZE = 256
+
+    # Periodic maintenance tasks run in a background thread
+    BACKGROUND_TASKS_ENABLED = True
+
+    # Applied to every SQLite connection; WAL lets reads proceed during writes
+    SQLITE_PRAGMAS = {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -32000,
+        'temp_store': 'MEMORY',
+    }
+
+    # Background writes (scan, render, ingest) go through one batching writer
+    WRITE_QUEUE_ENABLED = True
+    WRITE_QUEUE_BATCH_SIZE = 64
+    WRITE_QUEUE_MAX_DELAY = 0.05
+
 class DevelopmentConfig(Config):
     DEBUG = True
+    QUERY_COUNT_HEADER = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///your_database.db'
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test_database.db'
     WTF_CSRF_ENABLED = False
+    BACKGROUND_TASKS_ENABLED = False
+    WRITE_QUEUE_ENABLED = False
+    JOB_WORKER_THREADS = 0
+    QUERY_COUNT_HEADER = True
 
 class ProductionConfig(Config):
     DEBUG = False
-    uri = os.environ.get('DATABASE_URL')  # Get the Heroku DATABASE_URL
-    if uri and uri.startswith('postgres://'):
-        uri = uri.replace('postgres://', 'postgresql://', 1)
-    SQLALCHEMY_DATABASE_URI = uri
+    # Clip renders and scans only run as jobs; set 0 when dedicated
+    # `python -m worker` processes take them instead
+    JOB_WORKER_THREADS = int(os.environ.get('JOB_WORKER_THREADS', 1))
+    # SQLite only (see migrations.migrate); DATABASE_URL can move the file
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///your_database.db')
@@ -0,0 +1,155 @@
+import queue
+import threading
+from concurrent.futures import Future
+from sqlalchemy import event
+from models.models import db
+
+# Single writer thread shared by background jobs
+_writer = None
+
+
+def init_database(app):
+    """Apply the configured SQLite pragmas to every pooled connection"""
+    with app.app_context():
+        engine = db.engine
+        if engine.dialect.name != 'sqlite':
+            return
+
+        pragmas = app.config.get('SQLITE_PRAGMAS', {})
+
+        @event.listens_for(engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            # busy_timeout first so the remaining pragmas wait out other writers
+            for name in sorted(pragmas, key=lambda name: name != 'busy_timeout'):
+                cursor.execute(f"PRAGMA {name} = {pragmas[name]}")
+            cursor.close()
+
+        # Connections opened before the listener existed lack the pragmas
+        engine.dispose()
+
+
+class WriteQueue:
+    """Serializes database writes onto one thread, committing them in batches
+
+    A job is a function run with `db.session` inside the writer's app
+    context; the writer commits after each batch. Jobs in a failed batch are
+    retried one per transaction, so one bad job only fails its own Future.
+    Jobs should return plain values, not ORM instances.
+    """
+
+    def __init__(self, app, batch_size=64, max_delay=0.05):
+        self.app = app
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Finish the queued jobs and stop the writer thread"""
+        self._queue.put(None)
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, func, *args, **kwargs):
+        future = Future()
+        self._queue.put((func, args, kwargs, future))
+        return future
+
+    @property
+    def on_writer_thread(self):
+        return threading.current_thread() is self._thread
+
+    def _run(self):
+        running = True
+        while running:
+            batch = [self._queue.get()]
+            # Gather whatever else arrives shortly after into the same transaction
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=self.max_delay))
+                except queue.Empty:
+                    break
+            if None in batch:
+                running = False
+                batch = [job for job in batch if job is not None]
+            if batch:
+                with self.app.app_context():
+                    self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        results = []
+        try:
+            for func, args, kwargs, _ in batch:
+                results.append(func(*args, **kwargs))
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Write batch failed, retrying jobs individually: {str(e)}")
+            for job in batch:
+                self._write_one(job)
+            return
+        finally:
+            self.batches += 1
+
+        for (_, _, _, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _write_one(self, job):
+        func, args, kwargs, future = job
+        try:
+            result = func(*args, **kwargs)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+
+def start_writer(app):
+    """Start the shared write queue configured from the app"""
+    global _writer
+    if _writer is None:
+        _writer = WriteQueue(app, app.config['WRITE_QUEUE_BATCH_SIZE'],
+                             app.config['WRITE_QUEUE_MAX_DELAY']).start()
+    return _writer
+
+
+def stop_writer(timeout=None):
+    global _writer
+    if _writer is not None:
+        _writer.stop(timeout)
+        _writer = None
+
+
+def submit_write(func, *args, **kwargs):
+    """Queue a write job and return a Future for its result
+
+    Without a running writer the job runs and commits immediately in the
+    caller's session.
+    """
+    if _writer is not None:
+        if not _writer.on_writer_thread:
+            return _writer.submit(func, *args, **kwargs)
+        # Nested job: becomes part of the batch the writer is committing
+        future = Future()
+        future.set_result(func(*args, **kwargs))
+        return future
+
+    future = Future()
+    try:
+        result = func(*args, **kwargs)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        future.set_exception(e)
+    else:
+        future.set_result(result)
+    return future
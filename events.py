@@ -0,0 +1,101 @@
+import json
+import threading
+import time
+import uuid
+from flask import session
+from flask_login import current_user
+
+
+class Subscription:
+    """One open event stream, woken whenever its owner's jobs change"""
+
+    def __init__(self, owner):
+        self.owner = owner
+        self.changed = threading.Event()
+
+
+class EventBus:
+    """In-process pub/sub from job updates to the streams watching them
+
+    Only wakes streams in this process; streams also poll the database so
+    updates made by workers in other processes still reach them.
+    """
+
+    def __init__(self):
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, owner):
+        subscription = Subscription(owner)
+        with self._lock:
+            self._subscriptions.setdefault(owner, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscriptions = self._subscriptions.get(subscription.owner, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self._subscriptions.pop(subscription.owner, None)
+
+    def publish(self, owner):
+        """Wake every stream watching `owner`'s jobs"""
+        if owner is None:
+            return
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(owner, ()))
+        for subscription in subscriptions:
+            subscription.changed.set()
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+
+BUS = EventBus()
+
+
+def job_owner():
+    """Key identifying whose jobs these are: the user, or this browser session"""
+    if current_user.is_authenticated:
+        return f'user:{current_user.get_id()}'
+    if 'job_owner' not in session:
+        session['job_owner'] = uuid.uuid4().hex
+    return f"session:{session['job_owner']}"
+
+
+def format_event(event, data):
+    """One Server-Sent Events message"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def event_stream(owner, poll, poll_interval=5.0, keepalive_interval=15.0,
+                 max_seconds=300.0, retry_ms=2000):
+    """Yield SSE messages from `poll()` each time `owner`'s jobs change
+
+    `poll` returns (event, data) pairs that are new since its last call. It
+    also runs every `poll_interval` seconds without a wake-up, for updates
+    from other processes. A comment line keeps idle proxies from closing
+    the connection. The stream ends after `max_seconds` and the browser's
+    EventSource reconnects on its own, so no thread is held forever.
+    """
+    subscription = BUS.subscribe(owner)
+    started = last_sent = time.monotonic()
+    try:
+        yield f'retry: {retry_ms}\n\n'
+        while True:
+            subscription.changed.clear()
+            messages = [format_event(event, data) for event, data in poll()]
+            if messages:
+                last_sent = time.monotonic()
+                yield ''.join(messages)
+            elif time.monotonic() - last_sent >= keepalive_interval:
+                last_sent = time.monotonic()
+                yield ': keepalive\n\n'
+
+            remaining = max_seconds - (time.monotonic() - started)
+            if remaining <= 0:
+                return
+            subscription.changed.wait(min(poll_interval, keepalive_interval, remaining))
+    finally:
+        BUS.unsubscribe(subscription)
@@ -0,0 +1,135 @@
+from sqlalchemy import delete, func, select, text, update
+from models.models import db, Folder, folder_closure, video_folders
+
+# Triggers keeping folder_closure and folders.depth in step with parent_id
+FOLDER_TREE_DDL = [
+    """CREATE TRIGGER IF NOT EXISTS folders_closure_insert AFTER INSERT ON folders BEGIN
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+            SELECT new.id, new.id, 0
+            UNION ALL
+            SELECT ancestor_id, new.id, depth + 1 FROM folder_closure WHERE descendant_id = new.parent_id;
+        UPDATE folders SET depth = (
+            SELECT MAX(depth) FROM folder_closure WHERE descendant_id = new.id
+        ) WHERE id = new.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS folders_closure_cycle BEFORE UPDATE OF parent_id ON folders
+    WHEN new.parent_id IS NOT NULL BEGIN
+        SELECT RAISE(ABORT, 'Cannot move a folder into its own subtree')
+        WHERE EXISTS (SELECT 1 FROM folder_closure
+                      WHERE ancestor_id = new.id AND descendant_id = new.parent_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS folders_closure_move AFTER UPDATE OF parent_id ON folders
+    WHEN old.parent_id IS NOT new.parent_id BEGIN
+        DELETE FROM folder_closure
+        WHERE descendant_id IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = new.id)
+          AND ancestor_id NOT IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = new.id);
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+            SELECT above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+            FROM folder_closure AS above, folder_closure AS below
+            WHERE above.descendant_id = new.parent_id AND below.ancestor_id = new.id;
+        UPDATE folders SET depth = (
+            SELECT MAX(depth) FROM folder_closure WHERE descendant_id = folders.id
+        ) WHERE id IN (SELECT descendant_id FROM folder_closure WHERE ancestor_id = new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS folders_closure_delete AFTER DELETE ON folders BEGIN
+        DELETE FROM folder_closure WHERE descendant_id = old.id;
+        DELETE FROM folder_closure WHERE ancestor_id = old.id;
+    END""",
+]
+
+
+def install_folder_tree(connection):
+    """Create the closure triggers, rebuilding the closure when it is empty"""
+    for statement in FOLDER_TREE_DDL:
+        connection.exec_driver_sql(statement)
+    if connection.exec_driver_sql("SELECT 1 FROM folder_closure LIMIT 1").first() is None:
+        rebuild_folder_tree(connection)
+
+
+def rebuild_folder_tree(connection):
+    """Recompute folder_closure and folders.depth from parent_id"""
+    connection.exec_driver_sql("DELETE FROM folder_closure")
+    connection.exec_driver_sql("""
+        WITH RECURSIVE paths (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM folders
+            UNION ALL
+            SELECT paths.ancestor_id, folders.id, paths.depth + 1
+            FROM paths JOIN folders ON folders.parent_id = paths.descendant_id
+        )
+        INSERT INTO folder_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM paths
+    """)
+    connection.exec_driver_sql("""
+        UPDATE folders SET depth = (
+            SELECT MAX(depth) FROM folder_closure WHERE descendant_id = folders.id
+        )
+    """)
+
+
+def subtree_ids(folder_id):
+    """Select the ids of a folder and every folder below it"""
+    return select(folder_closure.c.descendant_id)\
+        .where(folder_closure.c.ancestor_id == folder_id)
+
+
+def videos_under(folder_id):
+    """Select the ids of videos filed anywhere under a folder"""
+    return select(video_folders.c.video_id).distinct()\
+        .where(video_folders.c.folder_id.in_(subtree_ids(folder_id)))
+
+
+def subtree_video_counts():
+    """Map each folder id to the number of distinct videos anywhere under it"""
+    rows = db.session.execute(
+        select(folder_closure.c.ancestor_id, func.count(video_folders.c.video_id.distinct()))
+        .join(video_folders, video_folders.c.folder_id == folder_closure.c.descendant_id)
+        .group_by(folder_closure.c.ancestor_id)
+    )
+    return dict(rows.all())
+
+
+def delete_subtree(folder_id):
+    """Delete a folder and all of its descendants in one statement"""
+    result = db.session.execute(
+        delete(Folder).where(Folder.id.in_(subtree_ids(folder_id))),
+        execution_options={'synchronize_session': False}
+    )
+    return result.rowcount
+
+
+def move_folder(folder_id, parent_id, position=None):
+    """Re-parent a folder; its subtree follows and the triggers fix the closure
+
+    Raises ValueError when `parent_id` is inside the folder's own subtree.
+    """
+    if parent_id is not None and db.session.execute(
+            select(folder_closure.c.ancestor_id).where(
+                folder_closure.c.ancestor_id == folder_id,
+                folder_closure.c.descendant_id == parent_id)).first():
+        raise ValueError('Cannot move a folder into its own subtree')
+
+    values = {'parent_id': parent_id}
+    if position is not None:
+        values['position'] = position
+    db.session.execute(
+        update(Folder).where(Folder.id == folder_id).values(**values),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def ordered_tree():
+    """Every folder in depth-first display order with depth and child flag"""
+    return db.session.execute(text("""
+        WITH RECURSIVE tree (id, sort_path) AS (
+            SELECT id, printf('%010d.%010d', COALESCE(position, 0), id)
+            FROM folders WHERE parent_id IS NULL
+            UNION ALL
+            SELECT folders.id, tree.sort_path || '/' || printf('%010d.%010d', COALESCE(folders.position, 0), folders.id)
+            FROM folders JOIN tree ON folders.parent_id = tree.id
+        )
+        SELECT folders.id, folders.name, folders.parent_id, folders.position,
+               folders.is_open, folders.depth,
+               EXISTS (SELECT 1 FROM folders AS child WHERE child.parent_id = folders.id) AS has_children
+        FROM tree JOIN folders ON folders.id = tree.id
+        ORDER BY tree.sort_path
+    """)).all()
@@ -0,0 +1,147 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, g, make_response, request, session
+from sqlalchemy import event, text
+from models.models import db
+from metrics import CACHE_REQUESTS
+
+# Tables whose rows appear in library, clip and organize listings; any write
+# to them bumps the data version and so invalidates every cached fragment
+VERSIONED_TABLES = ('videos', 'clips', 'clip_segments', 'tags', 'tag_categories',
+                    'folders', 'video_tags', 'video_folders')
+
+
+def data_version_ddl():
+    """SQL statements that create the version counter and its triggers"""
+    # The counter starts at a random value so a recreated database never
+    # reuses versions (and ETags) handed out for the previous one
+    statements = [
+        "CREATE TABLE IF NOT EXISTS data_version ("
+        "id INTEGER PRIMARY KEY CHECK (id = 1), version INTEGER NOT NULL)",
+        "INSERT OR IGNORE INTO data_version (id, version) VALUES (1, abs(random() % 1000000000000))",
+    ]
+    for table in VERSIONED_TABLES:
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            statements.append(
+                f"CREATE TRIGGER IF NOT EXISTS {table}_version_{operation.lower()} "
+                f"AFTER {operation} ON {table} BEGIN "
+                f"UPDATE data_version SET version = version + 1 WHERE id = 1; "
+                f"END"
+            )
+    return statements
+
+
+def install_data_version(connection):
+    """Create the data version counter and the triggers that bump it"""
+    for statement in data_version_ddl():
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_data_version(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS data_version")
+
+
+def current_data_version():
+    """The data version, read once per request
+
+    Read from the database rather than kept in memory so writes by render
+    workers and other processes invalidate this process's fragments too.
+    """
+    if 'data_version' not in g:
+        g.data_version = db.session.execute(
+            text("SELECT version FROM data_version WHERE id = 1")).scalar()
+    return g.data_version
+
+
+class FragmentCache:
+    """Rendered responses keyed by (endpoint, params, data version), least recently used out"""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            if version != self.version:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, version, entry):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self.version:
+                # Entries for other versions can never be served again
+                self._entries.clear()
+                self.version = version
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.version = None
+
+
+FRAGMENTS = FragmentCache()
+
+
+def cached_fragment(view):
+    """Serve a listing view with an ETag, 304s and the fragment cache
+
+    The ETag covers the endpoint, its arguments, whether HTMX asked for a
+    fragment, the logged-in user (the nav shows it) and the data version.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_data_version()
+        key = (request.endpoint, tuple(sorted(kwargs.items())),
+               tuple(sorted(request.args.items(multi=True))),
+               bool(request.headers.get('HX-Request')), session.get('_user_id'))
+        etag = hashlib.blake2b(repr((key, version)).encode(), digest_size=12).hexdigest()
+
+        if request.if_none_match:
+            matched = request.if_none_match.contains(etag)
+            CACHE_REQUESTS.inc(cache='etag', result='hit' if matched else 'miss')
+            if matched:
+                return _with_validators(current_app.response_class(status=304), etag)
+
+        entry = FRAGMENTS.get(key, version)
+        CACHE_REQUESTS.inc(cache='fragment', result='miss' if entry is None else 'hit')
+        if entry is not None:
+            body, status, headers = entry
+            return _with_validators(current_app.response_class(body, status=status, headers=headers), etag)
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.is_streamed:
+            FRAGMENTS.set(key, version, (response.get_data(), response.status_code, list(response.headers)))
+        return _with_validators(response, etag)
+    return wrapper
+
+
+def init_fragment_cache(app):
+    FRAGMENTS.max_entries = app.config['FRAGMENT_CACHE_SIZE']
+
+    @app.teardown_request
+    def forget_data_version(exc):
+        # `g` outlives the request when an app context was already pushed
+        g.pop('data_version', None)
+
+
+def _with_validators(response, etag):
+    response.set_etag(etag)
+    # Browsers and HTMX revalidate every time; unchanged data costs a 304
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.update(('HX-Request', 'Cookie'))
+    return response
@@ -4,32 +4,76 @@ from pathlib import Path
 import shutil
 import sqlite3
 import subprocess
-from models.models import db, Clip, Video
+import time
+import uuid
+from sqlalchemy import false, func, or_
+from werkzeug.utils import secure_filename
+from models.models import db, Clip, ClipSegment, TrashItem, Video
+from database import submit_write
+from media_worker import probe_durations
+from pagination import keyset_page
+from search import build_match_query, matching_ids
+from segments import normalize_segments, parse_time, to_segment_dicts
+from storage import record_artifacts, static_path
+from thumbnails import compute_fingerprint
 
 
-def get_clips_data():
+def get_clips_page(video_id=None, search=None, cursor=None, limit=48):
+    """Get one keyset-paginated page of formatted clips, newest first"""
+    # Select the video title in the same query instead of per clip
+    clips = db.session.query(Clip, Video.title.label('video_title'))\
+        .join(Video)
+    if video_id:
+        clips = clips.filter(Clip.video_id == video_id)
+    if search:
+        # Full-text index lookup instead of a LIKE scan over every clip name
+        if build_match_query(search):
+            clips = clips.filter(Clip.id.in_(matching_ids('clip', search)))
+        else:
+            clips = clips.filter(false())
+    clips, next_cursor = keyset_page(
+        clips, [Clip.created_at, Clip.id], cursor, limit, descending=True,
+        key=lambda row: [row.Clip.created_at, row.Clip.id]
+    )
+    
+    return [{
+        'id': clip.Clip.id,
+        'name': clip.Clip.clip_name,
+        'start_time': clip.Clip.start_time,
+        'end_time': clip.Clip.end_time,
+        'path': clip.Clip.clip_path,
+        'created_at': clip.Clip.created_at,
+        'thumbnail_path': clip.Clip.thumbnail_path,
+        'preview_path': clip.Clip.preview_path,
+        'video_title': clip.video_title
+    } for clip in clips], next_cursor
+
+def get_clips_data(video_id=None, search=None, cursor=None, limit=48):
     """Helper function to get formatted clips data"""
     try:
-        # Use SQLAlchemy models instead of raw SQL
-        clips = db.session.query(Clip, Video.title.label('video_title'))\
-            .join(Video)\
-            .order_by(Clip.created_at.desc())\
-            .all()
-        
-        return [{
-            'id': clip.Clip.id,
-            'name': clip.Clip.clip_name,
-            'start_time': clip.Clip.start_time,
-            'end_time': clip.Clip.end_time,
-            'path': clip.Clip.clip_path,
-            'created_at': clip.Clip.created_at,
-            'thumbnail_path': clip.Clip.thumbnail_path,
-            'video_title': clip.video_title
-        } for clip in clips]
+        clips, _ = get_clips_page(video_id, search, cursor, limit)
+        return clips
     except Exception as e:
         print(f"Error getting clips data: {str(e)}")
         return []
 
+def get_library_page(cursor=None, limit=60):
+    """Get one keyset-paginated page of library videos, ordered by title"""
+    # Correlated count, so only the clips of videos on this page are touched
+    clip_count = db.session.query(func.count(Clip.id))\
+        .filter(Clip.video_id == Video.id)\
+        .correlate(Video)\
+        .scalar_subquery()
+    
+    videos = db.session.query(
+        Video.id, Video.title, Video.file_path, Video.thumbnail_path,
+        Video.fingerprint, Video.duration,
+        clip_count.label('clip_count')
+    )
+    
+    videos, next_cursor = keyset_page(videos, [Video.title, Video.id], cursor, limit)
+    return [video._asdict() for video in videos], next_cursor
+
 def generate_thumbnail(video_path, output_path, timestamp="00:00:05"):
     """Generate a thumbnail for a video at the specified timestamp"""
     try:
@@ -56,6 +100,13 @@ def ensure_thumbnail_dirs():
     Path('static/thumbnails/videos').mkdir(parents=True, exist_ok=True)
     Path('static/thumbnails/clips').mkdir(parents=True, exist_ok=True) 
 
+def format_duration(seconds):
+    """Format a duration in seconds as M:SS"""
+    if seconds is None:
+        return "Unknown"
+    minutes = int(seconds // 60)
+    return f"{minutes}:{int(seconds % 60):02d}"
+
 def get_video_duration(file_path):
     """Get video duration using ffprobe"""
     cmd = [
@@ -67,13 +118,189 @@ def get_video_duration(file_path):
     ]
     try:
         output = subprocess.check_output(cmd).decode().strip()
-        duration = float(output)
-        minutes = int(duration // 60)
-        seconds = int(duration % 60)
-        return f"{minutes}:{seconds:02d}"
+        return format_duration(float(output))
     except:
         return "Unknown"
 
+def backfill_video_durations(limit=64):
+    """Probe stored videos that have no duration yet in one batched call"""
+    videos = Video.query.filter(Video.duration.is_(None)).limit(limit).all()
+    videos = [video for video in videos if os.path.exists(video.file_path)]
+    if not videos:
+        return 0
+
+    durations = {}
+    for video, result in zip(videos, probe_durations([video.file_path for video in videos])):
+        if result['status'] == 'success':
+            durations[video.id] = result['duration']
+    # Probing is done before the write so the transaction stays short
+    db.session.rollback()
+    return submit_write(update_video_durations, durations).result()
+
+def update_video_durations(durations):
+    """Store probed durations keyed by video id (write queue job)"""
+    for video in Video.query.filter(Video.id.in_(list(durations))).all():
+        video.duration = durations[video.id]
+    return len(durations)
+
+def upsert_videos(rows):
+    """Insert or update videos keyed by file path (write queue job)
+
+    Each row is a dict with `title`, `file_path`, `fingerprint` and
+    `duration`; titles of existing videos are left alone.
+    """
+    existing = {video.file_path: video for video in
+                Video.query.filter(Video.file_path.in_([row['file_path'] for row in rows])).all()}
+    for row in rows:
+        video = existing.get(row['file_path'])
+        if video is None:
+            video = Video(title=row['title'], file_path=row['file_path'])
+            db.session.add(video)
+            existing[row['file_path']] = video
+        video.fingerprint = row['fingerprint']
+        video.duration = row['duration']
+    return len(rows)
+
+def ingest_video_files(paths):
+    """Probe, fingerprint and store video files; returns (path, fingerprint) pairs
+
+    The probes run before the write, so its transaction stays short.
+    """
+    probes = probe_durations(paths)
+    rows = [{
+        'title': Path(path).stem,
+        'file_path': path,
+        'fingerprint': compute_fingerprint(path),
+        'duration': probe.get('duration')
+    } for path, probe in zip(paths, probes)]
+    submit_write(upsert_videos, rows).result()
+    return [(row['file_path'], row['fingerprint']) for row in rows]
+
+def clip_render_payload(config, video, clip_name, segments, taken_paths=None):
+    """Output paths and Clip fields for rendering one clip of `video`
+
+    Paths already in `taken_paths` get a numeric suffix, so the clips of one
+    batch never overwrite each other.
+    """
+    output_dir = os.path.join('clips', str(video.id))
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Generate output path
+    output_stem = secure_filename(clip_name) if clip_name else 'clippy'
+    if output_stem.endswith('.mp4'):
+        output_stem = output_stem[:-len('.mp4')]
+    output_path = os.path.join(output_dir, f"{output_stem}.mp4")
+    suffix = 2
+    while taken_paths is not None and output_path in taken_paths:
+        output_path = os.path.join(output_dir, f"{output_stem}_{suffix}.mp4")
+        suffix += 1
+    if taken_paths is not None:
+        taken_paths.add(output_path)
+
+    # Poster frame and preview are extra outputs of the same render
+    thumbnails = clip_thumbnail_paths(config['CLIP_THUMBNAIL_DIR'], config['THUMBNAIL_FORMAT'],
+                                      video.id, config['CLIP_PREVIEW_ENABLED'])
+
+    return {
+        'fields': {
+            'video_id': video.id,
+            'clip_name': clip_name,
+            'start_time': segments[0]['start'],
+            'end_time': segments[-1]['end'],
+            'clip_path': output_path,
+            'thumbnail_path': thumbnails['thumbnail_path'],
+            'preview_path': thumbnails['preview_path']
+        },
+        'segments': segments,
+        'output_path': output_path,
+        'poster_path': thumbnails['poster_file'],
+        'preview_path': thumbnails['preview_file']
+    }
+
+def clip_thumbnail_paths(thumb_dir, fmt, video_id, preview=True):
+    """New poster (and preview) files for a clip, with the static paths stored on it"""
+    thumb_token = f"{video_id}_{uuid.uuid4().hex[:12]}"
+    poster_filename = f"{thumb_token}.{fmt}"
+    preview_filename = f"{thumb_token}_preview.webp" if preview else None
+    return {
+        'poster_file': os.path.join(thumb_dir, poster_filename),
+        'preview_file': os.path.join(thumb_dir, preview_filename) if preview else None,
+        'thumbnail_path': f"thumbnails/clips/{poster_filename}",
+        'preview_path': f"thumbnails/clips/{preview_filename}" if preview else None
+    }
+
+def clip_thumbnail_settings(config):
+    """clip_thumbnail job settings from the app config (the job also takes `clip_ids`)"""
+    return {
+        'thumb_dir': config['CLIP_THUMBNAIL_DIR'],
+        'fmt': config['THUMBNAIL_FORMAT'],
+        'preview_seconds': config['CLIP_PREVIEW_SECONDS'] if config['CLIP_PREVIEW_ENABLED'] else None
+    }
+
+def validate_clip_definitions(clips):
+    """Error message for the first invalid {name, segments} clip definition, or None"""
+    if not clips or not isinstance(clips, list):
+        return 'No clips provided'
+    for index, clip in enumerate(clips):
+        if not isinstance(clip, dict) or not clip.get('segments'):
+            return f'Clip {index + 1} has no segments'
+        try:
+            normalize_segments(clip['segments'])
+        except (AttributeError, TypeError, ValueError) as e:
+            return f'Clip {index + 1}: {e}'
+    return None
+
+def clip_batch_payload(config, video, clips, snap_keyframes=False):
+    """Job payload rendering validated clip definitions of one video together"""
+    taken_paths = set()
+    return {
+        'video_id': video.id,
+        'clips': [clip_render_payload(config, video, clip.get('name') or f'clip_{index + 1}',
+                                      to_segment_dicts(normalize_segments(clip['segments'], video.duration or None)),
+                                      taken_paths)
+                  for index, clip in enumerate(clips)],
+        'preview_seconds': config['CLIP_PREVIEW_SECONDS'],
+        'snap_keyframes': snap_keyframes
+    }
+
+def save_clip(fields, segments):
+    """Insert a rendered clip and its segments, returning the clip id (write queue job)"""
+    clip = Clip(**fields)
+    clip.segments = [ClipSegment(start_time=segment['start'], end_time=segment['end'])
+                     for segment in segments]
+    db.session.add(clip)
+    db.session.flush()
+    files = [('clip', clip.clip_path)]
+    files += [(kind, static_path(path)) for kind, path in
+              (('clip_poster', clip.thumbnail_path), ('clip_preview', clip.preview_path)) if path]
+    record_artifacts([{'path': path, 'kind': kind, 'video_id': clip.video_id, 'clip_id': clip.id}
+                      for kind, path in files])
+    return clip.id
+
+def save_clip_thumbnails(clip_id, thumbnail_path=None, preview_path=None):
+    """Store re-rendered thumbnails on a clip and in the storage ledger (write queue job)"""
+    clip = db.session.get(Clip, clip_id)
+    if clip is None:
+        return False
+    files = []
+    if thumbnail_path:
+        clip.thumbnail_path = thumbnail_path
+        files.append(('clip_poster', static_path(thumbnail_path)))
+    if preview_path:
+        clip.preview_path = preview_path
+        files.append(('clip_preview', static_path(preview_path)))
+    record_artifacts([{'path': path, 'kind': kind, 'video_id': clip.video_id, 'clip_id': clip.id}
+                      for kind, path in files])
+    return True
+
+def timeToSeconds(time_str):
+    """Convert time string (SS, MM:SS or HH:MM:SS) to seconds"""
+    try:
+        return parse_time(time_str)
+    except ValueError as e:
+        print(f"Error converting time: {time_str}")
+        raise e
+
 def is_video_file(file_path):
     """Check if file is a video based on mimetype"""
     mime_type, _ = mimetypes.guess_type(file_path)
@@ -112,38 +339,42 @@ def delete_thumbnail(thumbnail_path):
         except Exception as e:
             print(f"Error deleting thumbnail {thumbnail_path}: {str(e)}")
 
-def cleanup_orphaned_thumbnails():
-    """Clean up thumbnails that don't have corresponding clips in the database"""
+def cleanup_orphaned_thumbnails(thumb_dir='static/thumbnails/clips', grace_seconds=3600):
+    """Delete clip thumbnails that no clip references once past a grace period"""
     try:
-        # Get all thumbnail paths from the database using SQLAlchemy
-        db_thumbnails = set()
-        clips = Clip.query.filter(
-            Clip.thumbnail_path.isnot(None),
-            Clip.clip_path.isnot(None)
-        ).with_entities(Clip.thumbnail_path).distinct().all()
-        
-        for clip in clips:
-            if clip.thumbnail_path:
-                db_thumbnails.add(clip.thumbnail_path)
-                db_thumbnails.add(os.path.basename(clip.thumbnail_path))
-        
-        # Check all thumbnails in the clips directory
-        clips_thumb_dir = Path('static/thumbnails/clips')
-        if clips_thumb_dir.exists():
-            for thumb_file in clips_thumb_dir.glob('*'):
-                relative_path = f"thumbnails/clips/{thumb_file.name}"
-                if (relative_path not in db_thumbnails and 
-                    thumb_file.name not in db_thumbnails):
-                    print(f"Found orphaned thumbnail: {thumb_file}")
-                    # Double check that no clips use this thumbnail
-                    clip_count = Clip.query.filter(
-                        Clip.thumbnail_path.like(f'%{thumb_file.name}%')
-                    ).count()
-                    
-                    if clip_count == 0:
-                        print(f"Deleting confirmed orphaned thumbnail: {thumb_file}")
-                        thumb_file.unlink()
-                    else:
-                        print(f"Thumbnail still in use, keeping: {thumb_file}")
+        clips_thumb_dir = Path(thumb_dir)
+        if not clips_thumb_dir.exists():
+            return 0
+
+        # Files newer than the grace period may belong to a render that has
+        # not committed its clip row yet
+        cutoff = time.time() - grace_seconds
+        candidates = {thumb_file.name: thumb_file
+                      for thumb_file in clips_thumb_dir.iterdir()
+                      if thumb_file.is_file() and thumb_file.stat().st_mtime < cutoff}
+        if not candidates:
+            return 0
+
+        # One query for every referenced file, diffed against the directory.
+        # Trashed clips keep their thumbnails until they are purged.
+        referenced = set()
+        rows = db.session.query(Clip.thumbnail_path, Clip.preview_path).filter(
+            or_(Clip.thumbnail_path.isnot(None), Clip.preview_path.isnot(None))
+        ).union_all(
+            db.session.query(TrashItem.thumbnail_path, TrashItem.preview_path)
+        ).all()
+        for row in rows:
+            for path in row:
+                if path:
+                    referenced.add(os.path.basename(path))
+
+        removed = 0
+        for name, thumb_file in candidates.items():
+            if name not in referenced:
+                print(f"Deleting orphaned thumbnail: {thumb_file}")
+                thumb_file.unlink(missing_ok=True)
+                removed += 1
+        return removed
     except Exception as e:
         print(f"Error cleaning up orphaned thumbnails: {str(e)}")
+        return 0
@@ -0,0 +1,70 @@
+import threading
+import time
+from flask import g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Query counters active on the current thread
+_local = threading.local()
+
+
+class QueryCounter:
+    """Context manager recording the SQL statements executed inside it"""
+
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        _active_counters().append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active_counters().remove(self)
+        return False
+
+
+def _active_counters():
+    if not hasattr(_local, 'counters'):
+        _local.counters = []
+    return _local.counters
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_counters():
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    counters = _active_counters()
+    if not counters:
+        return
+    start_times = conn.info.get('query_start_time')
+    duration = time.perf_counter() - start_times.pop() if start_times else 0.0
+    for counter in counters:
+        counter.statements.append((statement, duration))
+
+
+def init_query_instrumentation(app):
+    """Count the queries issued by every request and report them in a header"""
+    @app.before_request
+    def start_query_counter():
+        g.query_counter = QueryCounter().__enter__()
+
+    @app.after_request
+    def report_query_count(response):
+        counter = g.get('query_counter')
+        if counter is not None and app.config.get('QUERY_COUNT_HEADER'):
+            response.headers['X-Query-Count'] = str(counter.count)
+        return response
+
+    @app.teardown_request
+    def stop_query_counter(exc):
+        counter = g.pop('query_counter', None)
+        if counter is not None:
+            counter.__exit__(None, None, None)
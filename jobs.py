@@ -0,0 +1,223 @@
+import json
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import and_, delete, func, or_, select, true, update
+from events import BUS
+from metrics import JOB_OLDEST_WAIT, JOB_QUEUE_DEPTH, JOB_WAIT
+from models.models import db, Job
+
+# Job states that still have work to do
+PENDING_STATES = ('queued', 'running')
+
+
+def enqueue(kind, payload, priority=0, max_attempts=3, owner=None):
+    """Add a job to the queue in the caller's transaction and return it
+
+    `owner` (see events.job_owner) lets that user follow the job on /events.
+    """
+    job = Job(kind=kind, payload=json.dumps(payload), priority=priority,
+              max_attempts=max_attempts, state='queued', run_after=_now(), owner=owner)
+    db.session.add(job)
+    db.session.flush()
+    return job
+
+
+def enqueue_unique(kind, payload, priority=0, max_attempts=3, same_payload=False):
+    """Enqueue a job unless one of the same kind (and, optionally, payload) is already pending"""
+    query = Job.query.filter(Job.kind == kind, Job.state.in_(PENDING_STATES))
+    if same_payload:
+        query = query.filter(Job.payload == json.dumps(payload))
+    job = query.first()
+    return job or enqueue(kind, payload, priority, max_attempts)
+
+
+def claim_job(worker_id, kinds=None, lease_seconds=60):
+    """Claim the next runnable job for a worker, or return None
+
+    One UPDATE ... RETURNING picks and leases the job, so two workers can
+    never claim the same row. Running jobs whose lease has lapsed (their
+    worker died or stalled) are claimable again until they run out of
+    attempts. Returns a dict with `id`, `kind`, `payload` and `attempts`.
+    """
+    now = _now()
+    _fail_abandoned(now)
+
+    claimable = and_(
+        Job.kind.in_(kinds) if kinds else true(),
+        or_(and_(Job.state == 'queued', Job.run_after <= now),
+            and_(Job.state == 'running', Job.lease_expires_at < now, Job.attempts < Job.max_attempts))
+    )
+    candidate = select(Job.id).where(claimable)\
+        .order_by(Job.priority.desc(), Job.id).limit(1).scalar_subquery()
+    row = db.session.execute(
+        update(Job).where(Job.id == candidate, claimable).values(
+            state='running',
+            worker_id=worker_id,
+            attempts=Job.attempts + 1,
+            lease_expires_at=now + timedelta(seconds=lease_seconds),
+            heartbeat_at=now,
+            started_at=now,
+            status='Started'
+        ).returning(Job.id, Job.kind, Job.payload, Job.attempts, Job.created_at, Job.owner),
+        execution_options={'synchronize_session': False}
+    ).first()
+    db.session.commit()
+    if row is None:
+        return None
+    BUS.publish(row.owner)
+    JOB_WAIT.observe(_seconds_since(row.created_at, now), kind=row.kind)
+    return {'id': row.id, 'kind': row.kind, 'payload': json.loads(row.payload), 'attempts': row.attempts}
+
+
+def heartbeat(job_id, worker_id, lease_seconds=60, progress=None, status=None):
+    """Extend a job's lease and record progress; False if the worker lost it"""
+    now = _now()
+    values = {'heartbeat_at': now, 'lease_expires_at': now + timedelta(seconds=lease_seconds)}
+    if progress is not None:
+        values['progress'] = progress
+    if status is not None:
+        values['status'] = status
+    return _update_owned(job_id, worker_id, values)
+
+
+def complete_job(job_id, worker_id, result=None):
+    """Mark a job succeeded; False if another worker has taken it over"""
+    return _update_owned(job_id, worker_id, {
+        'state': 'succeeded',
+        'result': json.dumps(result),
+        'progress': 100,
+        'status': 'Done',
+        'finished_at': _now(),
+        'lease_expires_at': None,
+    })
+
+
+def fail_job(job_id, worker_id, error, retry_delay=5):
+    """Record a failed attempt, requeueing with backoff while attempts remain
+
+    Returns the job's new state, or None if the worker no longer owns it.
+    """
+    job = db.session.execute(select(Job.attempts, Job.max_attempts).where(
+        Job.id == job_id, Job.worker_id == worker_id, Job.state == 'running')).first()
+    if job is None:
+        db.session.rollback()
+        return None
+
+    now = _now()
+    if job.attempts < job.max_attempts:
+        values = {'state': 'queued', 'status': f'Retrying: {error}',
+                  'run_after': now + timedelta(seconds=retry_delay * 2 ** (job.attempts - 1))}
+    else:
+        values = {'state': 'failed', 'status': 'Failed', 'finished_at': now}
+    values.update(error=str(error), lease_expires_at=None, worker_id=None)
+    if not _update_owned(job_id, worker_id, values):
+        return None
+    return values['state']
+
+
+def job_status(job_id):
+    """Progress of a job as a dict, or None if it does not exist"""
+    # Workers update jobs from other sessions, so never trust a cached row
+    job = db.session.get(Job, job_id, populate_existing=True)
+    if job is None:
+        return None
+    return {
+        'id': job.id,
+        'kind': job.kind,
+        'state': job.state,
+        'progress': job.progress,
+        'status': job.status,
+        'error': job.error,
+        'attempts': job.attempts,
+        'result': json.loads(job.result) if job.result else None,
+    }
+
+
+def job_events(owner, since, sent, job_id=None):
+    """SSE (event, data) pairs for `owner`'s jobs that changed since last sent
+
+    Covers pending jobs and ones finished after `since`. `sent` maps job id
+    to the last (state, progress, status) reported and is updated in place.
+    Events are `progress`, `complete` (with the job's result) and `error`.
+    """
+    query = select(Job.id, Job.kind, Job.state, Job.progress, Job.status, Job.result, Job.error)\
+        .where(Job.owner == owner,
+               or_(Job.state.in_(PENDING_STATES), Job.finished_at >= since))\
+        .order_by(Job.id)
+    if job_id is not None:
+        query = query.where(Job.id == job_id)
+    events = []
+    for job in db.session.execute(query):
+        snapshot = (job.state, job.progress, job.status)
+        if sent.get(job.id) == snapshot:
+            continue
+        sent[job.id] = snapshot
+        data = {'id': job.id, 'kind': job.kind, 'state': job.state,
+                'progress': job.progress, 'status': job.status}
+        if job.state == 'succeeded':
+            events.append(('complete', dict(data, result=json.loads(job.result) if job.result else None)))
+        elif job.state == 'failed':
+            events.append(('error', dict(data, error=job.error)))
+        else:
+            events.append(('progress', data))
+    return events
+
+
+def collect_queue_metrics():
+    """Set the queue depth and oldest-wait gauges from the jobs table"""
+    now = _now()
+    JOB_QUEUE_DEPTH.clear()
+    JOB_OLDEST_WAIT.clear()
+    for kind, state, count, oldest in db.session.execute(
+            select(Job.kind, Job.state, func.count(), func.min(Job.created_at))
+            .where(Job.state.in_(PENDING_STATES))
+            .group_by(Job.kind, Job.state)):
+        JOB_QUEUE_DEPTH.set(count, kind=kind, state=state)
+        if state == 'queued':
+            JOB_OLDEST_WAIT.set(round(_seconds_since(oldest, now), 3), kind=kind)
+
+
+def prune_jobs(older_than_seconds):
+    """Delete finished jobs older than the retention period"""
+    result = db.session.execute(delete(Job).where(
+        Job.state.in_(('succeeded', 'failed')),
+        Job.finished_at < _now() - timedelta(seconds=older_than_seconds)
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def _fail_abandoned(now):
+    """Fail running jobs whose lease lapsed on their last attempt"""
+    db.session.execute(update(Job).where(
+        Job.state == 'running', Job.lease_expires_at < now, Job.attempts >= Job.max_attempts
+    ).values(state='failed', status='Failed', error='Worker lease expired',
+             finished_at=now, lease_expires_at=None),
+        execution_options={'synchronize_session': False})
+
+
+def _update_owned(job_id, worker_id, values):
+    # Compare-and-set on the owning worker: a worker whose lease was taken
+    # over cannot overwrite the new owner's progress or result
+    row = db.session.execute(
+        update(Job).where(Job.id == job_id, Job.worker_id == worker_id, Job.state == 'running')
+        .values(**values).returning(Job.owner),
+        execution_options={'synchronize_session': False}
+    ).first()
+    db.session.commit()
+    if row is None:
+        return False
+    BUS.publish(row.owner)
+    return True
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _seconds_since(stored, now):
+    # SQLite hands stored UTC datetimes back without a timezone
+    if isinstance(stored, str):
+        stored = datetime.fromisoformat(stored)
+    if stored.tzinfo is None:
+        stored = stored.replace(tzinfo=timezone.utc)
+    return max(0.0, (now - stored).total_seconds())
@@ -0,0 +1,209 @@
+import os
+import re
+import subprocess
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from thumbnails import THUMBNAIL_FORMATS, THUMBNAIL_SIZES, store_path
+
+# PyAV decodes in-process and avoids spawning FFmpeg for probes entirely.
+# It is heavy to import, so it is loaded on the first probe, not at startup.
+_NOT_LOADED = object()
+av = _NOT_LOADED
+
+_INPUT_PATTERN = re.compile(r"^Input #(\d+), .*, from '(.*)':$")
+_DURATION_PATTERN = re.compile(r"^\s+Duration: (N/A|(\d+):(\d+):(\d+(?:\.\d+)?))")
+
+
+def probe_durations(paths, batch_size=32, max_workers=2):
+    """Probe the duration of many media files with few process launches
+
+    Returns one result dict per path, in order, with a `status` of
+    'success' (and `duration` in seconds) or 'error' (and `error`).
+    """
+    paths = [str(path) for path in paths]
+    if _load_pyav() is not None:
+        return [_probe_with_pyav(path) for path in paths]
+
+    batches = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_probe_batch, batches)
+    return [result for batch in results for result in batch]
+
+
+def generate_thumbnails(items, batch_size=16, max_workers=2):
+    """Render many thumbnails with one FFmpeg process per batch
+
+    Each item is a dict with `source`, `output`, `timestamp_ms`, `width` and
+    `fmt`. A failing batch is bisected so one bad file only costs a few
+    extra launches. Returns one result dict per item, in order.
+    """
+    items = list(items)
+    batches = [items[i:i + batch_size] for i in range(0, len(items), batch_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(_thumbnail_batch, batches)
+    return [result for batch in results for result in batch]
+
+
+def warm_thumbnail_store(root, sources, timestamp_ms, fmt, sizes=('md',)):
+    """Pre-render store thumbnails for (path, fingerprint) pairs in batches"""
+    items = []
+    for source, fingerprint in sources:
+        for size in sizes:
+            output = store_path(root, fingerprint, timestamp_ms, size, fmt)
+            if not output.exists():
+                items.append({'source': source, 'output': output, 'timestamp_ms': timestamp_ms,
+                              'width': THUMBNAIL_SIZES[size], 'fmt': fmt})
+    return generate_thumbnails(items)
+
+
+def probe_keyframes(path):
+    """Keyframe timestamps (seconds) of a file's first video stream
+
+    Reads packet flags only, so nothing is decoded. Returns an empty list
+    when the file cannot be probed.
+    """
+    cmd = ['ffprobe', '-v', 'error', '-select_streams', 'v:0',
+           '-show_entries', 'packet=pts_time,flags', '-of', 'csv=p=0', str(path)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    except Exception as e:
+        print(f"Error probing keyframes of {path}: {e}")
+        return []
+    return parse_keyframes(result.stdout)
+
+
+def parse_keyframes(output):
+    """Sorted keyframe times from ffprobe's `pts_time,flags` packet lines"""
+    keyframes = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.strip().partition(',')
+        if 'K' in flags:
+            try:
+                keyframes.append(float(pts_time))
+            except ValueError:
+                continue
+    return sorted(keyframes)
+
+
+def parse_probe_output(stderr):
+    """Map input index to duration (or None) from FFmpeg's input dump"""
+    durations = {}
+    current = None
+    for line in stderr.splitlines():
+        input_match = _INPUT_PATTERN.match(line)
+        if input_match:
+            current = int(input_match.group(1))
+            durations[current] = None
+            continue
+        duration_match = _DURATION_PATTERN.match(line)
+        if duration_match and current is not None and duration_match.group(2):
+            hours, minutes, seconds = duration_match.group(2, 3, 4)
+            durations[current] = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+    return durations
+
+
+def _probe_batch(paths):
+    """Probe one batch, restarting after any input FFmpeg cannot open"""
+    results = []
+    remaining = list(paths)
+    while remaining:
+        cmd = ['ffmpeg', '-hide_banner', '-nostdin']
+        for path in remaining:
+            cmd += ['-i', path]
+        try:
+            stderr = subprocess.run(cmd, capture_output=True, text=True).stderr
+        except Exception as e:
+            results.extend(_error(path, str(e)) for path in remaining)
+            break
+
+        durations = parse_probe_output(stderr)
+        opened = len(durations)
+        for index in range(opened):
+            if durations[index] is None:
+                results.append(_error(remaining[index], 'Unknown duration'))
+            else:
+                results.append({'path': remaining[index], 'status': 'success',
+                                'duration': durations[index]})
+
+        if opened >= len(remaining):
+            break
+
+        # FFmpeg stops at the first input it cannot open
+        failed = remaining[opened]
+        message = next((line for line in stderr.splitlines() if failed in line), 'Could not open file')
+        results.append(_error(failed, message.strip()))
+        remaining = remaining[opened + 1:]
+    return results
+
+
+def _load_pyav():
+    """Import PyAV on first use, returning None when it is not installed"""
+    global av
+    if av is _NOT_LOADED:
+        try:
+            import av as pyav
+        except ImportError:
+            pyav = None
+        av = pyav
+    return av
+
+
+def _probe_with_pyav(path):
+    """Probe a file in-process with PyAV"""
+    try:
+        with av.open(path) as container:
+            if container.duration is None:
+                return _error(path, 'Unknown duration')
+            return {'path': path, 'status': 'success',
+                    'duration': container.duration / av.time_base}
+    except Exception as e:
+        return _error(path, str(e))
+
+
+def _thumbnail_batch(items):
+    """Render a batch of thumbnails, bisecting on failure"""
+    if not items:
+        return []
+
+    temp_paths = []
+    cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-y']
+    for item in items:
+        cmd += ['-ss', f"{item['timestamp_ms'] / 1000:.3f}", '-i', str(item['source'])]
+    for index, item in enumerate(items):
+        output = Path(item['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = output.with_name(f".{output.name}.{uuid.uuid4().hex[:8]}.tmp")
+        temp_paths.append(temp_path)
+        cmd += ['-map', f'{index}:v:0', '-frames:v', '1',
+                '-vf', f"scale={item['width']}:-2",
+                *THUMBNAIL_FORMATS[item['fmt']]['args'],
+                '-f', 'image2', str(temp_path)]
+
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        succeeded = result.returncode == 0 and all(path.exists() for path in temp_paths)
+        error = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else 'FFmpeg failed'
+    except Exception as e:
+        succeeded = False
+        error = str(e)
+
+    if succeeded:
+        for item, temp_path in zip(items, temp_paths):
+            os.replace(temp_path, item['output'])
+        return [{'path': str(item['source']), 'output': str(item['output']), 'status': 'success'}
+                for item in items]
+
+    for temp_path in temp_paths:
+        if temp_path.exists():
+            temp_path.unlink()
+
+    if len(items) == 1:
+        return [_error(str(items[0]['source']), error)]
+
+    middle = len(items) // 2
+    return _thumbnail_batch(items[:middle]) + _thumbnail_batch(items[middle:])
+
+
+def _error(path, message):
+    return {'path': str(path), 'status': 'error', 'error': message}
@@ -0,0 +1,186 @@
+import math
+import threading
+import time
+from flask import g, request
+
+# Default latency buckets in seconds, as used by Prometheus client libraries
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Metric:
+    """A named family of samples keyed by label values"""
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, '')) for label in self.labels)
+
+    def _label_text(self, key, extra=()):
+        pairs = list(zip(self.labels, key)) + list(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted((key, self._snapshot(value)) for key, value in self._values.items())
+        for key, value in items:
+            lines.extend(self._sample_lines(key, value))
+        return lines
+
+    def _snapshot(self, value):
+        return value
+
+    def _sample_lines(self, key, value):
+        return [f'{self.name}{self._label_text(key)} {_number(value)}']
+
+
+class Counter(Metric):
+    """A value that only goes up"""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that can go up and down, or is set at scrape time"""
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative buckets, with their sum"""
+    kind = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def _snapshot(self, value):
+        # observe() updates the counts in place, so copy them under the lock
+        counts, total = value
+        return list(counts), total
+
+    def _sample_lines(self, key, value):
+        counts, total = value
+        lines = [f'{self.name}_bucket{self._label_text(key, [("le", _number(bound))])} {count}'
+                 for bound, count in zip(self.buckets, counts)]
+        lines.append(f'{self.name}_sum{self._label_text(key)} {_number(total)}')
+        lines.append(f'{self.name}_count{self._label_text(key)} {counts[-1]}')
+        return lines
+
+
+# Every metric in this process, in definition order
+REGISTRY = []
+
+# Functions run before each scrape to refresh gauges from the database
+_collectors = []
+
+REQUEST_LATENCY = Histogram('http_request_duration_seconds', 'Request latency by route',
+                            ('method', 'route', 'status'))
+REQUESTS_IN_FLIGHT = Gauge('http_requests_in_flight', 'Requests currently being handled')
+STREAM_BYTES = Counter('stream_video_bytes_total', 'Bytes of video sent by stream_video')
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups by cache and result (hit or miss)',
+                         ('cache', 'result'))
+JOB_QUEUE_DEPTH = Gauge('job_queue_depth', 'Jobs waiting or running, by kind and state',
+                        ('kind', 'state'))
+JOB_OLDEST_WAIT = Gauge('job_queue_oldest_wait_seconds', 'Age of the oldest queued job, by kind',
+                        ('kind',))
+JOB_WAIT = Histogram('job_wait_seconds', 'Time from enqueue to claim', ('kind',),
+                     buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900))
+JOB_DURATION = Histogram('job_duration_seconds', 'Time to run a claimed job', ('kind', 'outcome'),
+                         buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900))
+FFMPEG_DURATION = Histogram('ffmpeg_duration_seconds', 'Wall time of FFmpeg work by job kind', ('kind',),
+                            buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900))
+ENCODE_SPEED = Histogram('encode_speed_ratio', 'Seconds of media encoded per second of wall time',
+                         buckets=(0.25, 0.5, 1, 2, 4, 8, 16, 32))
+
+
+def register_collector(func):
+    """Run `func` before every scrape, e.g. to set gauges from the database"""
+    if func not in _collectors:
+        _collectors.append(func)
+    return func
+
+
+def render_metrics():
+    """All metrics in the Prometheus text exposition format"""
+    for collector in _collectors:
+        try:
+            collector()
+        except Exception as e:
+            print(f"Error collecting metrics from {collector.__name__}: {str(e)}")
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def init_request_metrics(app):
+    """Record latency and in-flight counts for every request"""
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc()
+
+    @app.after_request
+    def observe_request_latency(response):
+        started = g.get('request_started')
+        if started is not None:
+            # Route templates, not paths, so ids do not explode the label set
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.observe(time.perf_counter() - started, method=request.method,
+                                    route=route, status=response.status_code)
+        return response
+
+    @app.teardown_request
+    def finish_request(exc):
+        if g.pop('request_started', None) is not None:
+            REQUESTS_IN_FLIGHT.dec()
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return str(value)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,148 @@
+from datetime import datetime, timezone
+from sqlalchemy import event
+from models.models import db
+from search import install_search_index
+from folder_tree import install_folder_tree
+from fragment_cache import install_data_version
+
+# Ordered (version, name, function) entries registered with @migration
+MIGRATIONS = []
+
+
+def migration(version, name):
+    """Register a schema migration; versions must be applied in order"""
+    def register(func):
+        MIGRATIONS.append((version, name, func))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+
+def migrate(engine):
+    """Apply every pending migration, each in its own transaction
+
+    Returns the versions that were applied. Migrations are written to be
+    safe on both brand new databases and ones created by older releases.
+    Only SQLite is supported: search, folder trees, the data version and
+    bulk assignments are built on FTS5, triggers and json_each.
+    """
+    if engine.dialect.name != 'sqlite':
+        raise RuntimeError(f"Unsupported database '{engine.dialect.name}': this app requires SQLite")
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE IF NOT EXISTS schema_migrations ("
+            "version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TEXT NOT NULL)"
+        )
+
+    applied = []
+    for version, name, func in MIGRATIONS:
+        with engine.begin() as connection:
+            if version in applied_versions(connection):
+                continue
+            func(connection)
+            connection.exec_driver_sql(
+                "INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)",
+                (version, name, datetime.now(timezone.utc).isoformat())
+            )
+        print(f"Applied migration {version}: {name}")
+        applied.append(version)
+    return applied
+
+
+def applied_versions(connection):
+    """Set of migration versions recorded in the database"""
+    rows = connection.exec_driver_sql("SELECT version FROM schema_migrations")
+    return {row[0] for row in rows}
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_migration_history(target, connection, **kw):
+    # Dropping the schema also forgets which migrations built it
+    connection.exec_driver_sql("DROP TABLE IF EXISTS schema_migrations")
+
+
+def add_column(connection, table, column, ddl):
+    """Add a column unless the table already has it"""
+    columns = {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table})")}
+    if column not in columns:
+        connection.exec_driver_sql(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+
+@migration(1, 'baseline')
+def create_tables(connection):
+    """Create any missing tables from the models"""
+    db.metadata.create_all(connection, checkfirst=True)
+
+
+@migration(2, 'media_metadata_columns')
+def add_media_metadata_columns(connection):
+    """Columns added for the thumbnail store, duration cache and clip previews"""
+    add_column(connection, 'videos', 'fingerprint', 'VARCHAR(40)')
+    add_column(connection, 'videos', 'duration', 'FLOAT')
+    add_column(connection, 'clips', 'preview_path', 'VARCHAR(255)')
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_videos_fingerprint ON videos (fingerprint)"
+    )
+
+
+@migration(3, 'listing_indexes')
+def create_listing_indexes(connection):
+    """Indexes behind the library, clip list and organize queries"""
+    for statement in [
+        "CREATE INDEX IF NOT EXISTS ix_videos_title_id ON videos (title, id)",
+        "CREATE INDEX IF NOT EXISTS ix_clips_created_at_id ON clips (created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_clips_video_id_created_at_id ON clips (video_id, created_at, id)",
+        "CREATE INDEX IF NOT EXISTS ix_folders_parent_id_position ON folders (parent_id, position)",
+        "CREATE INDEX IF NOT EXISTS ix_tags_category_id ON tags (category_id)",
+        "CREATE INDEX IF NOT EXISTS ix_video_tags_tag_id ON video_tags (tag_id, video_id)",
+        "CREATE INDEX IF NOT EXISTS ix_video_folders_folder_id ON video_folders (folder_id, video_id)",
+    ]:
+        connection.exec_driver_sql(statement)
+    # Give the planner statistics for the new indexes
+    connection.exec_driver_sql("ANALYZE")
+
+
+@migration(4, 'full_text_search')
+def create_search_index(connection):
+    """FTS5 index over clip, video, tag and folder names"""
+    install_search_index(connection)
+
+
+@migration(5, 'folder_closure')
+def create_folder_closure(connection):
+    """Closure table for the folder hierarchy, with maintained depth"""
+    add_column(connection, 'folders', 'depth', 'INTEGER NOT NULL DEFAULT 0')
+    db.metadata.tables['folder_closure'].create(connection, checkfirst=True)
+    install_folder_tree(connection)
+
+
+@migration(6, 'trash_items')
+def create_trash_items(connection):
+    """Server-side trash for deleted clips"""
+    db.metadata.tables['trash_items'].create(connection, checkfirst=True)
+
+
+@migration(7, 'storage_artifacts')
+def create_storage_artifacts(connection):
+    """Ledger of derived media files and their sizes"""
+    db.metadata.tables['storage_artifacts'].create(connection, checkfirst=True)
+
+
+@migration(8, 'jobs')
+def create_jobs(connection):
+    """Database-backed queue shared by the web app and render workers"""
+    db.metadata.tables['jobs'].create(connection, checkfirst=True)
+
+
+@migration(9, 'data_version')
+def create_data_version(connection):
+    """Counter bumped by every write to listed data, behind ETags and the fragment cache"""
+    install_data_version(connection)
+
+
+@migration(10, 'job_owners')
+def add_job_owners(connection):
+    """Owner of each job, so users can follow their jobs' progress"""
+    add_column(connection, 'jobs', 'owner', 'VARCHAR(64)')
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_jobs_owner_state ON jobs (owner, state)")
@@ -30,11 +30,17 @@ class User(db.Model, UserMixin):
 
 class Video(db.Model):
     __tablename__ = 'videos'
+    __table_args__ = (
+        # Keyset pagination of the library by (title, id)
+        db.Index('ix_videos_title_id', 'title', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(255), nullable=False)
     file_path = db.Column(db.String(255), unique=True, nullable=False)
     thumbnail_path = db.Column(db.String(255))
+    fingerprint = db.Column(db.String(40), index=True)
+    duration = db.Column(db.Float)
     created_at = db.Column(
         db.DateTime(timezone=True),
         default=lambda: datetime.now(timezone.utc)
@@ -47,6 +53,11 @@ class Video(db.Model):
 
 class Clip(db.Model):
     __tablename__ = 'clips'
+    __table_args__ = (
+        # Keyset pagination of clip lists by (created_at, id), overall and per video
+        db.Index('ix_clips_created_at_id', 'created_at', 'id'),
+        db.Index('ix_clips_video_id_created_at_id', 'video_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     video_id = db.Column(db.Integer, db.ForeignKey('videos.id'), nullable=False)
@@ -55,19 +66,101 @@ class Clip(db.Model):
     end_time = db.Column(db.String(20), nullable=False)
     clip_path = db.Column(db.String(255), nullable=False)
     thumbnail_path = db.Column(db.String(255))
+    preview_path = db.Column(db.String(255))
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     # Relationships
     segments = db.relationship('ClipSegment', backref='clip', lazy=True, cascade='all, delete-orphan')
 
+class TrashItem(db.Model):
+    """A deleted clip kept restorable until it expires"""
+    __tablename__ = 'trash_items'
+    __table_args__ = (
+        db.Index('ix_trash_items_batch_id', 'batch_id'),
+        db.Index('ix_trash_items_expires_at', 'expires_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    batch_id = db.Column(db.String(32), nullable=False)
+    clip_id = db.Column(db.Integer, nullable=False)
+    video_id = db.Column(db.Integer, nullable=False)
+    clip_name = db.Column(db.String(255), nullable=False)
+    # Clip row and segments as JSON, re-inserted on restore
+    data = db.Column(db.Text, nullable=False)
+    original_path = db.Column(db.String(255), nullable=False)
+    trashed_path = db.Column(db.String(255))
+    thumbnail_path = db.Column(db.String(255))
+    preview_path = db.Column(db.String(255))
+    deleted_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+class StorageArtifact(db.Model):
+    """A file on disk derived from a video, with its size for storage accounting"""
+    __tablename__ = 'storage_artifacts'
+    __table_args__ = (
+        # Least recently used regenerable artifacts first, for eviction
+        db.Index('ix_storage_artifacts_regenerable_last_used_at', 'regenerable', 'last_used_at'),
+        db.Index('ix_storage_artifacts_video_id', 'video_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    path = db.Column(db.String(255), unique=True, nullable=False)
+    kind = db.Column(db.String(20), nullable=False)
+    # Plain ids rather than foreign keys: rows are reconciled against disk
+    video_id = db.Column(db.Integer)
+    clip_id = db.Column(db.Integer)
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    regenerable = db.Column(db.Boolean, nullable=False, default=False)
+    last_used_at = db.Column(db.DateTime, nullable=False)
+    recorded_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+
+class Job(db.Model):
+    """A unit of background work (render, thumbnails, analysis) claimed by workers"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Next claimable job: queued by priority, or running with a lapsed lease
+        db.Index('ix_jobs_state_priority_id', 'state', 'priority', 'id'),
+        db.Index('ix_jobs_state_lease_expires_at', 'state', 'lease_expires_at'),
+        # A user's jobs for their /events stream
+        db.Index('ix_jobs_owner_state', 'owner', 'state'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(20), nullable=False)
+    # JSON arguments for the handler, and its JSON result once done
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    result = db.Column(db.Text)
+    state = db.Column(db.String(20), nullable=False, default='queued')
+    priority = db.Column(db.Integer, nullable=False, default=0)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    worker_id = db.Column(db.String(64))
+    lease_expires_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    run_after = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    status = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    # Who follows the job's progress: 'user:<id>' or 'session:<token>'
+    owner = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
 class Folder(db.Model):
     __tablename__ = 'folders'
+    __table_args__ = (
+        # Children of a folder in display order
+        db.Index('ix_folders_parent_id_position', 'parent_id', 'position'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     parent_id = db.Column(db.Integer, db.ForeignKey('folders.id'))
     is_open = db.Column(db.Boolean, default=False)
     position = db.Column(db.Integer, default=0)
+    # Number of ancestors; maintained with folder_closure by database triggers
+    depth = db.Column(db.Integer, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     
     # Self-referential relationship for parent/child folders
@@ -93,7 +186,7 @@ class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(255), nullable=False, unique=True)
     color = db.Column(db.String(7), default='#6c757d')
-    category_id = db.Column(db.Integer, db.ForeignKey('tag_categories.id'))
+    category_id = db.Column(db.Integer, db.ForeignKey('tag_categories.id'), index=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
 class ClipSegment(db.Model):
@@ -109,11 +202,24 @@ class ClipSegment(db.Model):
 video_folders = db.Table('video_folders',
     db.Column('video_id', db.Integer, db.ForeignKey('videos.id', ondelete='CASCADE'), primary_key=True),
     db.Column('folder_id', db.Integer, db.ForeignKey('folders.id', ondelete='CASCADE'), primary_key=True),
-    db.Column('created_at', db.DateTime, default=lambda: datetime.now(timezone.utc))
+    db.Column('created_at', db.DateTime, default=lambda: datetime.now(timezone.utc)),
+    # The primary key covers video -> folders; this covers folder -> videos
+    db.Index('ix_video_folders_folder_id', 'folder_id', 'video_id')
 )
 
 video_tags = db.Table('video_tags',
     db.Column('video_id', db.Integer, db.ForeignKey('videos.id', ondelete='CASCADE'), primary_key=True),
     db.Column('tag_id', db.Integer, db.ForeignKey('tags.id', ondelete='CASCADE'), primary_key=True),
-    db.Column('created_at', db.DateTime, default=lambda: datetime.now(timezone.utc))
-)
\ No newline at end of file
+    db.Column('created_at', db.DateTime, default=lambda: datetime.now(timezone.utc)),
+    # The primary key covers video -> tags; this covers tag -> videos
+    db.Index('ix_video_tags_tag_id', 'tag_id', 'video_id')
+)
+
+# Every (ancestor, descendant) pair in the folder tree, including each
+# folder paired with itself at depth 0. Maintained by triggers in folder_tree.py.
+folder_closure = db.Table('folder_closure',
+    db.Column('ancestor_id', db.Integer, db.ForeignKey('folders.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('descendant_id', db.Integer, db.ForeignKey('folders.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('depth', db.Integer, nullable=False),
+    db.Index('ix_folder_closure_descendant_id', 'descendant_id', 'ancestor_id', 'depth')
+)
@@ -0,0 +1,59 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values):
+    """Encode the sort key of the last row on a page as an opaque cursor"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor back into typed sort key values, or None if invalid"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [
+            datetime.fromisoformat(value) if _is_datetime(column) and value is not None else value
+            for column, value in zip(columns, values)
+        ]
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(query, columns, cursor=None, limit=50, descending=False, key=None):
+    """Fetch one page of `query` ordered by `columns`, starting after `cursor`
+
+    `columns` must form a unique sort key (end it with the primary key).
+    `key` extracts the sort key values from a row; by default they are read
+    as attributes named after the columns. Returns (rows, next_cursor);
+    next_cursor is None on the last page.
+    """
+    after = decode_cursor(cursor, columns)
+    if after is not None:
+        sort_key = tuple_(*columns)
+        query = query.filter(sort_key < tuple_(*after) if descending else sort_key > tuple_(*after))
+
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        values = key(last) if key else [getattr(last, column.key) for column in columns]
+        next_cursor = encode_cursor(values)
+    return rows, next_cursor
+
+
+def _is_datetime(column):
+    try:
+        return issubclass(column.type.python_type, datetime)
+    except NotImplementedError:
+        return False
@@ -0,0 +1,133 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import time
+import uuid
+from flask import current_app, g, request
+from flask_login import current_user
+
+# Profile names: timestamp to the millisecond (so names sort by age) plus a random suffix
+PROFILE_NAME_PATTERN = re.compile(r'^\d{8}-\d{9}-[0-9a-f]{6}$')
+
+# Functions listed in a saved profile's report, by cumulative time
+REPORT_FUNCTIONS = 40
+
+
+def is_profiling_admin():
+    """Whether the logged-in user may trigger and browse profiles"""
+    return (current_user.is_authenticated
+            and current_user.username in current_app.config['PROFILING_ADMINS'])
+
+
+def init_profiling(app):
+    """Profile requests flagged by an admin or picked by the sampling rate
+
+    An admin triggers a profile with an `X-Profile: 1` header or a
+    `_profile=1` query argument. Each profile saves the cProfile stats and
+    the request's SQL statements with timings to PROFILE_DIR.
+    """
+    @app.before_request
+    def start_profiler():
+        if request.path.startswith('/_profiles'):
+            return
+        trigger = None
+        if request.headers.get('X-Profile') == '1' or request.args.get('_profile') == '1':
+            if is_profiling_admin():
+                trigger = 'admin'
+        elif random.random() < app.config['PROFILING_SAMPLE_RATE']:
+            trigger = 'sample'
+        if trigger:
+            g.profile_trigger = trigger
+            g.profile_started = time.perf_counter()
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    @app.after_request
+    def save_profile(response):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return response
+        profiler.disable()
+        try:
+            name = write_profile(app.config['PROFILE_DIR'], profiler, {
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'route': request.url_rule.rule if request.url_rule else None,
+                'status': response.status_code,
+                'duration_ms': round((time.perf_counter() - g.profile_started) * 1000, 2),
+                'trigger': g.profile_trigger,
+                'user': current_user.username if current_user.is_authenticated else None,
+            }, g.get('query_counter'))
+            prune_profiles(app.config['PROFILE_DIR'], app.config['PROFILE_MAX_FILES'])
+            response.headers['X-Profile-Id'] = name
+        except Exception as e:
+            print(f"Error saving profile: {str(e)}")
+        return response
+
+
+def write_profile(directory, profiler, meta, query_counter=None):
+    """Save a profile's stats, report and SQL; returns the profile name"""
+    os.makedirs(directory, exist_ok=True)
+    now = time.time()
+    name = f"{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}{int(now * 1000) % 1000:03d}-{uuid.uuid4().hex[:6]}"
+
+    report = io.StringIO()
+    stats = pstats.Stats(profiler, stream=report)
+    stats.sort_stats('cumulative').print_stats(REPORT_FUNCTIONS)
+    stats.dump_stats(os.path.join(directory, f'{name}.prof'))
+
+    statements = query_counter.statements if query_counter is not None else []
+    record = dict(meta, name=name, created_at=now, report=report.getvalue(), sql=[
+        {'statement': statement, 'duration_ms': round(duration * 1000, 3)}
+        for statement, duration in statements
+    ])
+    record['sql_count'] = len(record['sql'])
+    record['sql_ms'] = round(sum(query['duration_ms'] for query in record['sql']), 3)
+    with open(os.path.join(directory, f'{name}.json'), 'w') as profile_file:
+        json.dump(record, profile_file)
+    return name
+
+
+def prune_profiles(directory, max_profiles):
+    """Delete the oldest profiles beyond `max_profiles`"""
+    names = sorted(list_profile_names(directory))
+    for name in names[:max(0, len(names) - max_profiles)]:
+        for extension in ('json', 'prof'):
+            try:
+                os.remove(os.path.join(directory, f'{name}.{extension}'))
+            except FileNotFoundError:
+                pass
+
+
+def list_profile_names(directory):
+    if not os.path.isdir(directory):
+        return []
+    return [entry[:-len('.json')] for entry in os.listdir(directory)
+            if entry.endswith('.json') and PROFILE_NAME_PATTERN.match(entry[:-len('.json')])]
+
+
+def list_profiles(directory):
+    """Summaries of saved profiles, newest first"""
+    summaries = []
+    for name in sorted(list_profile_names(directory), reverse=True):
+        profile = load_profile(directory, name)
+        if profile:
+            summaries.append({key: profile.get(key) for key in (
+                'name', 'created_at', 'method', 'path', 'status', 'duration_ms',
+                'sql_count', 'sql_ms', 'trigger', 'user')})
+    return summaries
+
+
+def load_profile(directory, name):
+    """A saved profile by name, or None"""
+    if not PROFILE_NAME_PATTERN.match(name or ''):
+        return None
+    try:
+        with open(os.path.join(directory, f'{name}.json')) as profile_file:
+            return json.load(profile_file)
+    except (OSError, ValueError):
+        return None
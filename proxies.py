@@ -0,0 +1,96 @@
+import os
+import subprocess
+import uuid
+from pathlib import Path
+
+
+def proxy_settings(config):
+    """Proxy job settings from the app config, or None when proxies are off"""
+    if not config['PROXY_ENABLED']:
+        return None
+    return {'root': config['PROXY_DIR'], 'height': config['PROXY_HEIGHT'], 'gop': config['PROXY_GOP']}
+
+
+def proxy_path(root, fingerprint, height):
+    """Location of a video's editing proxy, named after the source fingerprint"""
+    return Path(root) / fingerprint[:2] / f"{fingerprint}_{height}p.mp4"
+
+
+def find_proxy(root, fingerprint, height):
+    """Path of a video's proxy if it has been rendered, else None"""
+    if not fingerprint:
+        return None
+    path = proxy_path(root, fingerprint, height)
+    if not path.exists():
+        return None
+    _touch(path)
+    return path
+
+
+def proxy_failed(root, fingerprint, height):
+    """Whether rendering this proxy has failed before, e.g. for a corrupt source"""
+    return _failure_marker(root, fingerprint, height).exists()
+
+
+def mark_proxy_failed(root, fingerprint, height):
+    """Remember a failed render so the proxy is not queued again
+
+    Markers are keyed by fingerprint, so a replaced source file is retried.
+    """
+    marker = _failure_marker(root, fingerprint, height)
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.touch()
+
+
+def proxy_command(source_path, output_path, height=540, gop=1):
+    """FFmpeg command for a small, short-GOP H.264 proxy
+
+    With `gop` 1 every frame is a keyframe, so a seek decodes one small
+    frame instead of running on from the last keyframe of the original.
+    Timestamps are kept, so positions in the proxy are positions in the
+    original. Sources smaller than `height` are not scaled up.
+    """
+    return [
+        'ffmpeg', '-hide_banner', '-nostdin', '-y',
+        '-i', str(source_path),
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-vf', f"scale=-2:'min({height},ih)'",
+        '-c:v', 'libx264', '-preset', 'veryfast', '-tune', 'fastdecode', '-crf', '28',
+        '-g', str(gop), '-keyint_min', str(gop), '-sc_threshold', '0', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '96k', '-ac', '2',
+        '-movflags', '+faststart',
+        '-f', 'mp4', str(output_path)
+    ]
+
+
+def render_proxy(source_path, output_path, height=540, gop=1):
+    """Render a proxy with FFmpeg; returns True on success"""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = output_path.with_name(f".{output_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        result = subprocess.run(proxy_command(source_path, temp_path, height, gop),
+                                capture_output=True, text=True)
+        if result.returncode != 0 or not temp_path.exists():
+            print(f"Error generating proxy: {result.stderr.strip()[-500:]}")
+            return False
+        os.replace(temp_path, output_path)
+        return True
+    except Exception as e:
+        print(f"Error generating proxy: {str(e)}")
+        return False
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def _failure_marker(root, fingerprint, height):
+    return proxy_path(root, fingerprint, height).with_suffix('.failed')
+
+
+def _touch(path):
+    """Mark a proxy as recently used for storage eviction"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
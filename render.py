@@ -0,0 +1,234 @@
+import os
+import subprocess
+from pathlib import Path
+from thumbnails import THUMBNAIL_FORMATS
+
+
+# A batch render is split into several FFmpeg passes beyond these sizes, so
+# one graph never holds too many open encoders or trim branches
+MAX_CLIPS_PER_PASS = 8
+MAX_SEGMENTS_PER_PASS = 64
+
+
+def build_clip_filter(intervals, poster_width=None, preview_seconds=None, preview_width=None,
+                      inputs=None, prefix=''):
+    """Build the filter graph that cuts, joins and optionally thumbnails a clip
+
+    `intervals` is a list of (start, end) pairs in seconds. When a poster or
+    preview is requested the joined video is split so every output comes from
+    the same decode of the source. `inputs` gives a (video, audio) pad per
+    interval (the source's streams by default) and `prefix` namespaces every
+    label, so several clips can share one graph.
+    """
+    inputs = inputs or [('[0:v]', '[0:a]')] * len(intervals)
+    filter_parts = []
+    for i, ((start, end), (video_pad, audio_pad)) in enumerate(zip(intervals, inputs)):
+        duration = end - start
+        filter_parts.append(f"{video_pad}trim=start={start}:duration={duration},setpts=PTS-STARTPTS[{prefix}v{i}];")
+        filter_parts.append(f"{audio_pad}atrim=start={start}:duration={duration},asetpts=PTS-STARTPTS[{prefix}a{i}];")
+
+    n_segments = len(intervals)
+    video_inputs = ''.join(f'[{prefix}v{i}]' for i in range(n_segments))
+    audio_inputs = ''.join(f'[{prefix}a{i}]' for i in range(n_segments))
+
+    branches = []
+    if poster_width:
+        branches.append('poster')
+    if preview_seconds:
+        branches.append('preview')
+
+    if not branches:
+        filter_parts.append(f"{video_inputs}concat=n={n_segments}:v=1[{prefix}outv];")
+    else:
+        split_outputs = f'[{prefix}outv]' + ''.join(f'[{prefix}{name}src]' for name in branches)
+        filter_parts.append(f"{video_inputs}concat=n={n_segments}:v=1,split={len(branches) + 1}{split_outputs};")
+
+    if poster_width:
+        total = sum(end - start for start, end in intervals)
+        filter_parts.append(_poster_filter(f'[{prefix}postersrc]', total, poster_width, f'[{prefix}poster]') + ';')
+    if preview_seconds:
+        filter_parts.append(_preview_filter(f'[{prefix}previewsrc]', preview_seconds,
+                                            preview_width or poster_width or 320, f'[{prefix}preview]') + ';')
+
+    filter_parts.append(f"{audio_inputs}concat=n={n_segments}:v=0:a=1[{prefix}outa]")
+    return ''.join(filter_parts)
+
+
+def build_batch_filter(clips, poster_width=None, preview_seconds=None):
+    """Build one graph rendering many clips from a single decode of the source
+
+    Each clip is a dict with `intervals` and optional `poster_path` and
+    `preview_path`. The source's video and audio are decoded once and fanned
+    out with split/asplit, one branch per segment.
+    """
+    n_branches = sum(len(clip['intervals']) for clip in clips)
+    video_pads = [f'[sv{i}]' for i in range(n_branches)]
+    audio_pads = [f'[sa{i}]' for i in range(n_branches)]
+    parts = [f"[0:v]split={n_branches}{''.join(video_pads)}",
+             f"[0:a]asplit={n_branches}{''.join(audio_pads)}"]
+
+    branch = 0
+    for k, clip in enumerate(clips):
+        count = len(clip['intervals'])
+        parts.append(build_clip_filter(
+            clip['intervals'],
+            poster_width=poster_width if clip.get('poster_path') else None,
+            preview_seconds=preview_seconds if clip.get('preview_path') else None,
+            preview_width=poster_width,
+            inputs=list(zip(video_pads[branch:branch + count], audio_pads[branch:branch + count])),
+            prefix=f'c{k}'
+        ))
+        branch += count
+    return ';'.join(parts)
+
+
+def build_clip_command(source_path, intervals, output_path, poster_path=None,
+                       preview_path=None, poster_width=320, preview_seconds=3):
+    """Build the FFmpeg command rendering a clip and its thumbnails in one pass"""
+    filter_complex = build_clip_filter(
+        intervals,
+        poster_width=poster_width if poster_path else None,
+        preview_seconds=preview_seconds if preview_path else None,
+        preview_width=poster_width
+    )
+
+    return ['ffmpeg', '-i', source_path, '-filter_complex', filter_complex,
+            *_output_args('', output_path, poster_path, preview_path)]
+
+
+def build_batch_command(source_path, clips, poster_width=320, preview_seconds=3):
+    """Build one FFmpeg command rendering every clip (and thumbnails) in `clips`"""
+    filter_complex = build_batch_filter(clips, poster_width, preview_seconds)
+    cmd = ['ffmpeg', '-i', source_path, '-filter_complex', filter_complex]
+    for k, clip in enumerate(clips):
+        cmd += _output_args(f'c{k}', clip['output_path'], clip.get('poster_path'), clip.get('preview_path'))
+    return cmd
+
+
+def build_thumbnail_command(clip_path, duration, poster_path=None, preview_path=None,
+                            poster_width=320, preview_seconds=3):
+    """Build the FFmpeg command re-rendering a clip's poster and/or preview from the clip file"""
+    branches = [name for name, path in (('poster', poster_path), ('preview', preview_path)) if path]
+    parts = [f"[0:v]split={len(branches)}" + ''.join(f'[{name}src]' for name in branches)]
+    if poster_path:
+        parts.append(_poster_filter('[postersrc]', duration, poster_width, '[poster]'))
+    if preview_path:
+        parts.append(_preview_filter('[previewsrc]', preview_seconds, poster_width, '[preview]'))
+    return ['ffmpeg', '-i', clip_path, '-filter_complex', ';'.join(parts),
+            *_thumbnail_output_args('', poster_path, preview_path)]
+
+
+def chunk_clips(clips, max_clips=MAX_CLIPS_PER_PASS, max_segments=MAX_SEGMENTS_PER_PASS):
+    """Group clips into passes of at most `max_clips` clips and `max_segments` segments"""
+    groups, group, segments = [], [], 0
+    for clip in clips:
+        count = len(clip['intervals'])
+        if group and (len(group) >= max_clips or segments + count > max_segments):
+            groups.append(group)
+            group, segments = [], 0
+        group.append(clip)
+        segments += count
+    if group:
+        groups.append(group)
+    return groups
+
+
+def render_clip(source_path, intervals, output_path, poster_path=None,
+                preview_path=None, poster_width=320, preview_seconds=3):
+    """Render a clip with FFmpeg, removing partial outputs on failure"""
+    for path in (output_path, poster_path, preview_path):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    cmd = build_clip_command(source_path, intervals, output_path, poster_path,
+                             preview_path, poster_width, preview_seconds)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+
+    if result.returncode != 0:
+        for path in (output_path, poster_path, preview_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+    return result
+
+
+def render_clip_thumbnails(clip_path, duration, poster_path=None, preview_path=None,
+                           poster_width=320, preview_seconds=3):
+    """Re-render a clip's poster and/or preview, removing partial outputs on failure"""
+    for path in (poster_path, preview_path):
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    cmd = build_thumbnail_command(clip_path, duration, poster_path, preview_path,
+                                  poster_width, preview_seconds)
+    result = subprocess.run(cmd, capture_output=True, text=True)
+
+    if result.returncode != 0:
+        for path in (poster_path, preview_path):
+            if path and os.path.exists(path):
+                os.remove(path)
+    return result
+
+
+def render_clips(source_path, clips, poster_width=320, preview_seconds=3,
+                 max_clips=MAX_CLIPS_PER_PASS, max_segments=MAX_SEGMENTS_PER_PASS, on_pass=None):
+    """Render many clips from one source, decoding it once per pass
+
+    Returns one CompletedProcess per clip (shared by the clips of a pass).
+    A failed pass removes its partial outputs; other passes still run.
+    `on_pass(done, total)` is called after each pass, for progress.
+    """
+    for clip in clips:
+        for path in (clip['output_path'], clip.get('poster_path'), clip.get('preview_path')):
+            if path:
+                Path(path).parent.mkdir(parents=True, exist_ok=True)
+
+    groups = chunk_clips(clips, max_clips, max_segments)
+    results = []
+    for done, group in enumerate(groups, start=1):
+        cmd = build_batch_command(source_path, group, poster_width, preview_seconds)
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            for clip in group:
+                for path in (clip['output_path'], clip.get('poster_path'), clip.get('preview_path')):
+                    if path and os.path.exists(path):
+                        os.remove(path)
+        results += [result] * len(group)
+        if on_pass:
+            on_pass(done, len(groups))
+    return results
+
+
+def _output_args(prefix, output_path, poster_path=None, preview_path=None):
+    """Output options for one clip's labelled streams in a filter graph"""
+    return ['-map', f'[{prefix}outv]', '-map', f'[{prefix}outa]',
+            '-c:v', 'libx264', '-c:a', 'aac', '-y', output_path,
+            *_thumbnail_output_args(prefix, poster_path, preview_path)]
+
+
+def _thumbnail_output_args(prefix, poster_path=None, preview_path=None):
+    """Output options for a poster and preview labelled in a filter graph"""
+    args = []
+    if poster_path:
+        args += ['-map', f'[{prefix}poster]', '-frames:v', '1',
+                 *_image_args(poster_path), '-y', poster_path]
+    if preview_path:
+        args += ['-map', f'[{prefix}preview]', '-an', '-c:v', 'libwebp', '-loop', '0',
+                 '-quality', '60', '-y', preview_path]
+    return args
+
+
+def _poster_filter(source, duration, width, label):
+    """One frame, a second in (or halfway through very short clips), scaled to `width`"""
+    offset = round(min(1.0, duration / 2), 3)
+    return f"{source}trim=start={offset},trim=end_frame=1,scale={width}:-2{label}"
+
+
+def _preview_filter(source, seconds, width, label):
+    """The first `seconds` at 10 fps, scaled to `width`"""
+    return f"{source}trim=duration={seconds},setpts=PTS-STARTPTS,fps=10,scale={width}:-2{label}"
+
+
+def _image_args(path):
+    """Encoder arguments for a still image, chosen from its extension"""
+    fmt = Path(path).suffix.lstrip('.').lower()
+    return THUMBNAIL_FORMATS.get(fmt, THUMBNAIL_FORMATS['jpg'])['args']
@@ -1,16 +1,51 @@
-from tkinter import Tk, filedialog
 from flask import flash, redirect, render_template, url_for, request, session, jsonify, send_file, make_response
 import os
 from pathlib import Path
 import subprocess
 from helper import *
+from jobs import enqueue, job_status
 import time
 import json
 from werkzeug.utils import secure_filename
 import math
-from models.models import db, Video, Clip, ClipSegment
+import uuid
+from models.models import db, Video, Clip, ClipSegment, TrashItem
+from trash import restore_batch, restore_item, trash_clips
+from fragment_cache import cached_fragment
+from events import job_owner
+from segments import normalize_segments, to_segment_dicts
 
 def init_clip_routes(app):
+    def render_clip_list(template='clips_list.html', video_id=None, search=None, cursor=None):
+        """Render one page of clips along with the cursor for the next page"""
+        clips_data, next_cursor = get_clips_page(
+            video_id=video_id,
+            search=search,
+            cursor=cursor,
+            limit=app.config['CLIPS_PAGE_SIZE']
+        )
+        return render_template(template, clips=clips_data, next_cursor=next_cursor,
+                               video_id=video_id, search=search)
+
+    @app.route('/create-clips', methods=['POST'])
+    def create_clips():
+        """Queue many clips of one video, rendered from a single decode"""
+        data = request.get_json(silent=True) or {}
+        clips = data.get('clips') or []
+        error = validate_clip_definitions(clips)
+        if error:
+            return jsonify({'status': 'error', 'message': error}), 400
+
+        video = db.session.get(Video, data.get('video_id'))
+        if video is None:
+            return jsonify({'status': 'error', 'message': 'Video not found'}), 404
+
+        job = enqueue('clip_batch', clip_batch_payload(app.config, video, clips,
+                                                       bool(data.get('snap_keyframes'))),
+                      priority=10, owner=job_owner())
+        db.session.commit()
+        return jsonify({'status': 'success', 'task_id': job.id, 'clips': len(clips)})
+
     @app.route('/create-clip', methods=['POST'])
     def create_clip():
         """Create a new clip from a video"""
@@ -30,77 +65,25 @@ def init_clip_routes(app):
                 }), 400
             
             video = Video.query.get_or_404(video_id)
-            
-            # Create output directory if it doesn't exist
-            output_dir = os.path.join('clips', video_id)
-            os.makedirs(output_dir, exist_ok=True)
-            
-            # Generate output path
-            output_filename = secure_filename(clip_name) if clip_name else 'clippy'
-            if not output_filename.endswith('.mp4'):
-                output_filename += '.mp4'
-            output_path = os.path.join(output_dir, output_filename)
-            
-            # Create FFmpeg filter for trimming
-            filter_parts = []
-            for i, segment in enumerate(segments):
-                start = timeToSeconds(segment['start'])
-                end = timeToSeconds(segment['end'])
-                duration = end - start
-                filter_parts.append(f"[0:v]trim=start={start}:duration={duration},setpts=PTS-STARTPTS[v{i}];")
-                filter_parts.append(f"[0:a]atrim=start={start}:duration={duration},asetpts=PTS-STARTPTS[a{i}];")
-            
-            # Add concat if we have segments
-            n_segments = len(segments)
-            video_inputs = ''.join(f'[v{i}]' for i in range(n_segments))
-            audio_inputs = ''.join(f'[a{i}]' for i in range(n_segments))
-            filter_parts.append(f"{video_inputs}concat=n={n_segments}:v=1[outv];")
-            filter_parts.append(f"{audio_inputs}concat=n={n_segments}:v=0:a=1[outa]")
-            
-            filter_complex = ''.join(filter_parts)
-            
-            # Execute FFmpeg command
-            cmd = [
-                'ffmpeg', '-i', video.file_path,
-                '-filter_complex', filter_complex,
-                '-map', '[outv]', '-map', '[outa]',
-                '-c:v', 'libx264', '-c:a', 'aac',
-                '-y', output_path
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode != 0:
-                print(f"FFmpeg error: {result.stderr}")
+
+            # Sorted and merged, so overlapping ranges are only encoded once
+            try:
+                segments = to_segment_dicts(normalize_segments(segments, video.duration or None))
+            except (AttributeError, TypeError, ValueError) as e:
                 return jsonify({
                     'status': 'error',
-                    'message': f'FFmpeg error: {result.stderr}'
-                }), 500
-
-            # Create new clip
-            clip = Clip(
-                video_id=video_id,
-                clip_name=clip_name,
-                start_time=segments[0]['start'],
-                end_time=segments[-1]['end'],
-                clip_path=output_path
-            )
-            db.session.add(clip)
-            db.session.flush()  # Get the clip ID before committing
-
-            # Create segments
-            for segment in segments:
-                clip_segment = ClipSegment(
-                    clip_id=clip.id,
-                    start_time=segment['start'],
-                    end_time=segment['end']
-                )
-                db.session.add(clip_segment)
+                    'message': str(e)
+                }), 400
 
+            # Rendered by a worker; the page follows it on /events
+            job = enqueue('clip', dict(clip_render_payload(app.config, video, clip_name, segments),
+                                       preview_seconds=app.config['CLIP_PREVIEW_SECONDS'],
+                                       snap_keyframes=segments_data.get('snap_keyframes', False)),
+                          priority=10, owner=job_owner())
             db.session.commit()
             return jsonify({
                 'status': 'success',
-                'clip_id': clip.id
+                'task_id': job.id
             })
 
         except Exception as e:
@@ -113,30 +96,14 @@ def init_clip_routes(app):
 
     @app.route('/clips', methods=['GET'])
     @app.route('/clips/<int:video_id>', methods=['GET'])
+    @cached_fragment
     def get_clips(video_id=None):
         """Get all clips or clips for a specific video"""
         try:
-            if video_id:
-                clips = Clip.query.join(Video).filter(Clip.video_id == video_id)\
-                    .order_by(Clip.created_at.desc()).all()
-            else:
-                clips = Clip.query.join(Video).order_by(Clip.created_at.desc()).all()
-            
-            clips_data = [{
-                'id': clip.id,
-                'name': clip.clip_name,
-                'start_time': clip.start_time,
-                'end_time': clip.end_time,
-                'path': clip.clip_path,
-                'created_at': clip.created_at,
-                'thumbnail_path': clip.thumbnail_path,
-                'video_title': clip.video.title
-            } for clip in clips]
-            
             if request.headers.get('HX-Request'):
-                return render_template('clips_list.html', clips=clips_data)
+                return render_clip_list('clips_list.html', video_id=video_id)
             else:
-                return render_template('clips.html', clips=clips_data)
+                return render_clip_list('clips.html', video_id=video_id)
             
         except Exception as e:
             print(f"Error fetching clips: {str(e)}")
@@ -147,43 +114,41 @@ def init_clip_routes(app):
                 </div>
             """
 
+    @app.route('/clip-progress/<int:task_id>')
+    def clip_progress(task_id):
+        """Report the progress of a queued clip render"""
+        job = job_status(task_id)
+        if job is None or job['kind'] != 'clip':
+            return jsonify({'state': 'FAILURE', 'error': 'Unknown task'}), 404
+
+        if job['state'] == 'succeeded':
+            return jsonify({'state': 'SUCCESS', 'progress': 100, 'clip_id': job['result']['clip_id']})
+        if job['state'] == 'failed':
+            return jsonify({'state': 'FAILURE', 'error': job['error']})
+        return jsonify({
+            'state': 'PROGRESS',
+            'progress': job['progress'],
+            'status': job['status'] if job['state'] == 'running' else 'Waiting for a render worker...'
+        })
+
     @app.route('/clips/delete/<int:clip_id>', methods=['DELETE'])
     def delete_clip(clip_id):
-        """Delete a clip and its file"""
+        """Move a clip to the trash"""
         try:
-            clip = Clip.query.get_or_404(clip_id)
-            
-            # Store clip info for restoration
-            deleted_clips = session.get('deleted_clips', [])
-            deleted_clips.append({
-                'id': clip_id,
-                'path': clip.clip_path
-            })
-            session['deleted_clips'] = deleted_clips
-            
-            # Move file to temporary location instead of deleting
-            if os.path.exists(clip.clip_path):
-                temp_path = clip.clip_path + '.deleted'
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-                os.rename(clip.clip_path, temp_path)
-            
-            db.session.delete(clip)
+            Clip.query.get_or_404(clip_id)
+            batch_id, _ = trash_clips([clip_id], app.config['TRASH_TTL_SECONDS'])
             db.session.commit()
             
-            # Clean up orphaned thumbnails after successful deletion
-            cleanup_orphaned_thumbnails()
-            
             return """
                 <div class="alert alert-success">
                     <i class="bi bi-check-circle me-2"></i>
                     Clip deleted successfully
                     <button class="btn btn-link text-success" 
-                            hx-post="/clips/restore/{}">
+                            onclick="restoreBatchClips('{}')">
                         Undo
                     </button>
                 </div>
-            """.format(clip_id)
+            """.format(batch_id)
             
         except Exception as e:
             print(f"Error deleting clip: {str(e)}")
@@ -197,9 +162,13 @@ def init_clip_routes(app):
 
     @app.route('/clips/batch-delete', methods=['DELETE'])
     def batch_delete_clips():
-        """Delete multiple clips at once"""
+        """Move the selected clips to the trash and return the refreshed list
+
+        The rows go in one transaction; file renames run on the background
+        worker after the commit, so the response does not wait on the disk.
+        """
         try:
-            clip_ids = request.form.getlist('clip-checkbox') or request.args.getlist('clip-checkbox')
+            clip_ids = request.values.getlist('clip-checkbox')
             
             if not clip_ids:
                 return """
@@ -209,45 +178,23 @@ def init_clip_routes(app):
                     </div>
                 """
 
-            deleted_clips = session.get('deleted_clips', [])
-
-            for clip_id in clip_ids:
-                clip = Clip.query.get_or_404(clip_id)
-                
-                # Store clip info for restoration
-                deleted_clips.append({
-                    'id': clip_id,
-                    'path': clip.clip_path,
-                    'batch': True,  # Mark as part of batch deletion
-                    'batch_id': int(time.time())  # Add timestamp as batch ID
-                })
-                
-                # Move file to temporary location
-                if os.path.exists(clip.clip_path):
-                    temp_path = clip.clip_path + '.deleted'
-                    if os.path.exists(temp_path):
-                        os.remove(temp_path)
-                    os.rename(clip.clip_path, temp_path)
-                
-                db.session.delete(clip)
-
-            session['deleted_clips'] = deleted_clips
-            
-            # Clean up orphaned thumbnails
-            cleanup_orphaned_thumbnails()
+            batch_id, deleted_count = trash_clips([int(clip_id) for clip_id in clip_ids],
+                                                  app.config['TRASH_TTL_SECONDS'])
+            db.session.commit()
             
             return """
                 <div class="alert alert-success">
                     <i class="bi bi-check-circle me-2"></i>
                     {} clips deleted successfully
                     <button class="btn btn-link text-success" 
-                            onclick="restoreBatchClips({})">
+                            onclick="restoreBatchClips('{}')">
                         Undo Batch Delete
                     </button>
                 </div>
                 {}
-            """.format(len(clip_ids), deleted_clips[-1]['batch_id'], 
-                      render_template('clips_list.html', clips=get_clips_data()))
+            """.format(deleted_count, batch_id, render_clip_list(
+                video_id=request.values.get('video_id', type=int),
+                search=request.values.get('search') or None))
             
         except Exception as e:
             db.session.rollback()
@@ -258,58 +205,79 @@ def init_clip_routes(app):
                 </div>
             """
 
-    @app.route('/clips/restore-batch/<int:batch_id>', methods=['POST'])
+    @app.route('/clips/restore-batch/<batch_id>', methods=['POST'])
     def restore_batch_clips(batch_id):
-        """Restore a batch of deleted clips"""
+        """Restore a batch of deleted clips from the trash"""
         try:
-            deleted_clips = session.get('deleted_clips', [])
-            batch_clips = [clip for clip in deleted_clips if clip.get('batch_id') == batch_id]
-            
-            if batch_clips:
-                restored_count = 0
-                
-                for clip_info in batch_clips:
-                    try:
-                        # Restore physical file
-                        temp_path = clip_info['path'] + '.deleted'
-                        if os.path.exists(temp_path):
-                            if os.path.exists(clip_info['path']):
-                                os.remove(clip_info['path'])
-                            os.rename(temp_path, clip_info['path'])
-                        
-                        # Restore from database
-                        clip = Clip.query.get_or_404(clip_info['id'])
-                        db.session.delete(clip)
-                        db.session.commit()
-                        restored_count += 1
-                    except Exception as e:
-                        print(f"Error restoring clip {clip_info['id']}: {str(e)}")
-                        continue
-                
-                # Update session
-                session['deleted_clips'] = [c for c in deleted_clips if c.get('batch_id') != batch_id]
-                db.session.commit()
-                
-                return render_template('clips_list.html', clips=get_clips_data())
-                
-            return """
-                <div class="alert alert-danger">
+            restored_count, purged_count = restore_batch(batch_id)
+            db.session.commit()
+            if not restored_count and not purged_count:
+                return """
+                    <div class="alert alert-danger">
+                        <i class="bi bi-exclamation-triangle me-2"></i>
+                        Batch not found in deleted items
+                    </div>
+                """, 404
+
+            purged = """
+                <div class="alert alert-warning">
                     <i class="bi bi-exclamation-triangle me-2"></i>
-                    Batch not found in deleted items
+                    {} clips could not be restored because their video was deleted
                 </div>
-            """
+            """.format(purged_count) if purged_count else ''
+            if not restored_count:
+                return purged, 410
+            return purged + render_clip_list()
+            
         except Exception as e:
+            db.session.rollback()
             return f"""
                 <div class="alert alert-danger">
                     <i class="bi bi-exclamation-triangle me-2"></i>
                     Error restoring batch: {str(e)}
                 </div>
-            """
+            """, 500
+
+    @app.route('/clips/restore/<int:item_id>', methods=['POST'])
+    def restore_trashed_clip(item_id):
+        """Restore one clip from the trash"""
+        try:
+            restored, purged = restore_item(item_id)
+            db.session.commit()
+            if purged:
+                return jsonify({'status': 'error',
+                                'message': 'The clip cannot be restored because its video was deleted'}), 410
+            if not restored:
+                return jsonify({'status': 'error', 'message': 'Item not found in trash'}), 404
+            return jsonify({'status': 'success'})
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': str(e)}), 500
+
+    @app.route('/api/trash', methods=['GET'])
+    def list_trash():
+        """List trashed clips, most recently deleted first"""
+        items = TrashItem.query.order_by(TrashItem.deleted_at.desc(), TrashItem.id.desc())\
+            .limit(min(request.args.get('limit', 100, type=int), 500)).all()
+        return jsonify({
+            'status': 'success',
+            'items': [{
+                'id': item.id,
+                'batch_id': item.batch_id,
+                'clip_id': item.clip_id,
+                'video_id': item.video_id,
+                'name': item.clip_name,
+                'deleted_at': item.deleted_at.isoformat(),
+                'expires_at': item.expires_at.isoformat()
+            } for item in items]
+        })
 
     @app.route('/select-clips-folder')
     def select_clips_folder():
         """Open system folder browser dialog for clips destination"""
         try:
+            # Imported on use: only a desktop session has a display for Tk
+            from tkinter import Tk, filedialog
             root = Tk()
             root.withdraw()
             
@@ -367,40 +335,23 @@ def init_clip_routes(app):
             return jsonify({'status': 'error', 'message': str(e)}), 500
 
     @app.route('/clips/search', methods=['GET'])
+    @cached_fragment
     def search_clips():
         """Search clips by name"""
         query = request.args.get('q', '').strip()
         
-        clips_query = Clip.query.join(Video)
-        
-        if query:
-            clips_query = clips_query.filter(Clip.clip_name.ilike(f'%{query}%'))
-        
-        clips = clips_query.order_by(Clip.created_at.desc()).all()
-        
-        clips_data = [{
-            'id': clip.id,
-            'name': clip.clip_name,
-            'start_time': clip.start_time,
-            'end_time': clip.end_time,
-            'path': clip.clip_path,
-            'created_at': clip.created_at,
-            'thumbnail_path': clip.thumbnail_path,
-            'video_title': clip.video.title
-        } for clip in clips]
-        
-        return render_template('clips_list.html', clips=clips_data)
+        return render_clip_list(search=query or None)
 
-def timeToSeconds(time_str):
-    """Convert time string (MM:SS) to seconds"""
-    try:
-        if ':' not in time_str:
-            return float(time_str)
-        minutes, seconds = map(float, time_str.split(':'))
-        return minutes * 60 + seconds
-    except ValueError as e:
-        print(f"Error converting time: {time_str}")
-        raise e
+    @app.route('/clips/page', methods=['GET'])
+    @cached_fragment
+    def clips_page():
+        """Render the next page of clip cards for infinite scroll"""
+        return render_clip_list(
+            'clips_items.html',
+            video_id=request.args.get('video_id', type=int),
+            search=request.args.get('q') or None,
+            cursor=request.args.get('cursor')
+        )
 
 def create_segment_filter(segments):
     """Create FFmpeg filter complex for keeping selected segments"""
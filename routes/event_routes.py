@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+from flask import request
+from events import event_stream, job_owner
+from jobs import job_events
+
+def init_event_routes(app):
+    @app.route('/events')
+    def events():
+        """Stream progress, completion and error events for the user's jobs"""
+        owner = job_owner()
+        job_id = request.args.get('job', type=int)
+        # Jobs that finished just before the stream opened are still reported
+        since = datetime.now(timezone.utc) - timedelta(seconds=app.config['EVENTS_RECENT_SECONDS'])
+        sent = {}
+
+        def poll():
+            # A fresh app context per poll, so the stream holds no session between polls
+            with app.app_context():
+                return job_events(owner, since, sent, job_id)
+
+        response = app.response_class(event_stream(
+            owner, poll,
+            poll_interval=app.config['EVENTS_POLL_INTERVAL'],
+            keepalive_interval=app.config['EVENTS_KEEPALIVE_SECONDS'],
+            max_seconds=app.config['EVENTS_STREAM_SECONDS']
+        ), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        # Stop proxies such as nginx from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
@@ -3,7 +3,11 @@ from helper import get_db_connection
 import json
 import random
 import colorsys
-from models.models import db, Video, Tag, TagCategory, Folder
+from models.models import db, Video, Tag, TagCategory, Folder, video_folders, video_tags
+from video_filters import facet_counts, filter_videos
+from folder_tree import delete_subtree, move_folder, ordered_tree, subtree_video_counts
+from assignments import assign, count_existing, reorder_folders, unassign
+from fragment_cache import cached_fragment
 
 def generate_distinct_color(existing_colors):
     """Generate a distinct color that's visually different from existing ones"""
@@ -30,13 +34,52 @@ def generate_distinct_color(existing_colors):
     rgb = colorsys.hsv_to_rgb(best_hue, 0.7, 0.95)
     return '#{:02x}{:02x}{:02x}'.format(int(rgb[0]*255), int(rgb[1]*255), int(rgb[2]*255))
 
+def describe_videos(rows):
+    """Format a page of videos with their tag and folder names"""
+    ids = [row.id for row in rows]
+    tag_names = {}
+    for video_id, name in db.session.query(video_tags.c.video_id, Tag.name)\
+            .join(Tag, Tag.id == video_tags.c.tag_id)\
+            .filter(video_tags.c.video_id.in_(ids)).order_by(Tag.name):
+        tag_names.setdefault(video_id, []).append(name)
+    folder_names = {}
+    for video_id, name in db.session.query(video_folders.c.video_id, Folder.name)\
+            .join(Folder, Folder.id == video_folders.c.folder_id)\
+            .filter(video_folders.c.video_id.in_(ids)).order_by(Folder.name):
+        folder_names.setdefault(video_id, []).append(name)
+    
+    return [{
+        'id': row.id,
+        'title': row.title,
+        'thumbnail_path': row.thumbnail_path,
+        'tags': ','.join(tag_names.get(row.id, [])),
+        'folders': ','.join(folder_names.get(row.id, []))
+    } for row in rows]
+
+def parse_filter_arg(value):
+    """Decode the JSON filter spec passed in a query string"""
+    if not value:
+        return {}
+    try:
+        spec = json.loads(value)
+    except ValueError:
+        raise ValueError('filter must be JSON')
+    if not isinstance(spec, dict):
+        raise ValueError('filter must be a JSON object')
+    return spec
+
 def init_organization_routes(app):
     @app.route('/organize')
     def organize():
         """Organization interface for videos, tags, and folders"""
         try:
-            # Get all tag categories with their tags
-            categories = TagCategory.query.all()
+            # Load every tag once; categories and colors are built from it
+            all_tags = Tag.query.order_by(Tag.name).all()
+            tags_by_category = {}
+            for tag in all_tags:
+                tags_by_category.setdefault(tag.category_id, []).append(tag)
+            
+            categories = TagCategory.query.order_by(TagCategory.name).all()
             formatted_categories = [{
                 'id': cat.id,
                 'name': cat.name,
@@ -44,40 +87,91 @@ def init_organization_routes(app):
                     'id': tag.id,
                     'name': tag.name,
                     'color': tag.color
-                } for tag in cat.tags]
+                } for tag in tags_by_category.get(cat.id, [])]
             } for cat in categories]
             
             # Get uncategorized tags
-            uncategorized_tags = Tag.query.filter_by(category_id=None).all()
+            uncategorized_tags = tags_by_category.get(None, [])
             
-            # Get all folders
-            folders = Folder.query.order_by(Folder.position).all()
+            # Get all folders in tree order from one recursive query
+            folders = [dict(row._mapping, level=row.depth) for row in ordered_tree()]
             
-            # Get videos with their tags and folders
-            videos = Video.query.all()
-            videos_data = [{
-                'id': video.id,
-                'title': video.title,
-                'file_path': video.file_path,
-                'thumbnail_path': video.thumbnail_path,
-                'tags': [{'name': tag.name, 'color': tag.color} for tag in video.tags],
-                'folders': [folder.name for folder in video.folders]
-            } for video in videos]
+            # Only the first page of videos; the rest load as the grid scrolls
+            rows, next_cursor = filter_videos({}, limit=app.config['ORGANIZE_PAGE_SIZE'])
+            videos_data = describe_videos(rows)
+            facets = facet_counts({})
             
             # Create tag color mapping
-            tag_colors = {tag.name: tag.color for tag in Tag.query.all()}
+            tag_colors = {tag.name: tag.color for tag in all_tags}
             
             return render_template('organize.html',
                                categories=formatted_categories,
                                tags=uncategorized_tags,
                                folders=folders,
                                videos=videos_data,
+                               next_cursor=next_cursor,
+                               filter_json=None,
+                               facets=facets,
                                tag_colors=tag_colors)
                                
         except Exception as e:
             print(f"Error in organize route: {str(e)}")
             return str(e), 500
 
+    @app.route('/organize/videos')
+    @cached_fragment
+    def organize_videos_page():
+        """Render a page of the organize grid for a filter spec"""
+        try:
+            spec = parse_filter_arg(request.args.get('filter'))
+            rows, next_cursor = filter_videos(spec, request.args.get('cursor'),
+                                              app.config['ORGANIZE_PAGE_SIZE'])
+        except ValueError as e:
+            return str(e), 400
+        
+        tag_colors = dict(db.session.query(Tag.name, Tag.color).all())
+        return render_template('organize_video_items.html',
+                               videos=describe_videos(rows),
+                               next_cursor=next_cursor,
+                               filter_json=request.args.get('filter'),
+                               tag_colors=tag_colors)
+
+    @app.route('/organize/folders/<int:folder_id>/videos')
+    @cached_fragment
+    def folder_videos(folder_id):
+        """Render the videos filed directly in a folder"""
+        rows, next_cursor = filter_videos(
+            {'folder_id': folder_id, 'include_subfolders': False},
+            request.args.get('cursor'),
+            app.config['ORGANIZE_PAGE_SIZE']
+        )
+        return render_template('folder_videos.html', videos=rows,
+                               next_cursor=next_cursor, folder_id=folder_id)
+
+    @app.route('/api/videos/filter', methods=['POST'])
+    def filter_videos_api():
+        """Filter videos by tag expression, folder subtree, clip count and date"""
+        data = request.json or {}
+        try:
+            spec = data.get('filter') or {}
+            if not isinstance(spec, dict):
+                raise ValueError('filter must be an object')
+            limit = data.get('limit', app.config['ORGANIZE_PAGE_SIZE'])
+            if not isinstance(limit, int) or isinstance(limit, bool):
+                raise ValueError('limit must be a whole number')
+            limit = max(1, min(limit, 1000))
+            rows, next_cursor = filter_videos(spec, data.get('cursor'), limit)
+            facets = facet_counts(spec) if data.get('facets', True) else None
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'video_ids': [row.id for row in rows],
+            'next_cursor': next_cursor,
+            'facets': facets
+        })
+
     @app.route('/api/folders', methods=['POST'])
     def create_folder():
         """Create a new folder"""
@@ -217,38 +311,39 @@ def init_organization_routes(app):
 
     @app.route('/api/videos/organize', methods=['POST'])
     def organize_videos():
-        """Organize videos (add to folders and/or tags)"""
+        """Add videos to (or with action 'unassign', remove them from) folders and tags"""
         data = request.json
         video_ids = data.get('video_ids', [])
         folder_ids = data.get('folder_ids', [])
         tag_ids = data.get('tag_ids', [])
+        action = data.get('action', 'assign')
         
         if not video_ids:
             return jsonify({'status': 'error', 'message': 'No videos selected'}), 400
+        if action not in ('assign', 'unassign'):
+            return jsonify({'status': 'error', 'message': 'Unknown action'}), 400
             
         try:
-            videos = Video.query.filter(Video.id.in_(video_ids)).all()
-            if len(videos) != len(video_ids):
+            video_ids = {int(video_id) for video_id in video_ids}
+            tag_ids = {int(tag_id) for tag_id in tag_ids}
+            folder_ids = {int(folder_id) for folder_id in folder_ids}
+            if count_existing('videos', video_ids) != len(video_ids):
                 return jsonify({'status': 'error', 'message': 'Some videos not found'}), 404
+            if tag_ids and count_existing('tags', tag_ids) != len(tag_ids):
+                return jsonify({'status': 'error', 'message': 'Some tags not found'}), 404
+            if folder_ids and count_existing('folders', folder_ids) != len(folder_ids):
+                return jsonify({'status': 'error', 'message': 'Some folders not found'}), 404
             
+            # One set-based statement per association table
+            apply = assign if action == 'assign' else unassign
+            changed = 0
             if tag_ids:
-                tags = Tag.query.filter(Tag.id.in_(tag_ids)).all()
-                if len(tags) != len(tag_ids):
-                    return jsonify({'status': 'error', 'message': 'Some tags not found'}), 404
-                
-                for video in videos:
-                    video.tags.extend([tag for tag in tags if tag not in video.tags])
-            
+                changed += apply('tag', video_ids, tag_ids)
             if folder_ids:
-                folders = Folder.query.filter(Folder.id.in_(folder_ids)).all()
-                if len(folders) != len(folder_ids):
-                    return jsonify({'status': 'error', 'message': 'Some folders not found'}), 404
-                
-                for video in videos:
-                    video.folders.extend([folder for folder in folders if folder not in video.folders])
+                changed += apply('folder', video_ids, folder_ids)
             
             db.session.commit()
-            return jsonify({'status': 'success'})
+            return jsonify({'status': 'success', 'changed': changed})
             
         except Exception as e:
             db.session.rollback()
@@ -277,12 +372,7 @@ def init_organization_routes(app):
             return jsonify({'status': 'error', 'message': 'No positions provided'}), 400
         
         try:
-            for item in folder_positions:
-                folder = Folder.query.get(item['id'])
-                if folder:
-                    folder.position = item['position']
-                    folder.parent_id = item.get('parent_id')
-            
+            reorder_folders(folder_positions)
             db.session.commit()
             return jsonify({'status': 'success'})
         except Exception as e:
@@ -296,21 +386,10 @@ def init_organization_routes(app):
             folder = Folder.query.get_or_404(folder_id)
 
             if request.method == 'DELETE':
-                # Get all descendant folders
-                def get_descendants(f):
-                    descendants = []
-                    for child in f.children:
-                        descendants.append(child)
-                        descendants.extend(get_descendants(child))
-                    return descendants
-
-                folders_to_delete = [folder] + get_descendants(folder)
-                
-                for f in folders_to_delete:
-                    db.session.delete(f)
-                
+                # The closure table gives the whole subtree to one DELETE
+                deleted = delete_subtree(folder.id)
                 db.session.commit()
-                return jsonify({'status': 'success'})
+                return jsonify({'status': 'success', 'deleted': deleted})
                 
             elif request.method == 'PATCH':
                 name = request.json.get('name')
@@ -323,4 +402,26 @@ def init_organization_routes(app):
                 
         except Exception as e:
             db.session.rollback()
-            return jsonify({'status': 'error', 'message': str(e)}), 500 
\ No newline at end of file
+            return jsonify({'status': 'error', 'message': str(e)}), 500 
+
+    @app.route('/api/folders/<int:folder_id>/move', methods=['POST'])
+    def move_folder_route(folder_id):
+        """Move a folder, with its subtree, under a new parent"""
+        data = request.json or {}
+        parent_id = data.get('parent_id')
+        try:
+            Folder.query.get_or_404(folder_id)
+            if parent_id is not None:
+                Folder.query.get_or_404(parent_id)
+            move_folder(folder_id, parent_id, data.get('position'))
+            db.session.commit()
+            return jsonify({'status': 'success'})
+        except ValueError as e:
+            db.session.rollback()
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    @app.route('/api/folders/counts')
+    @cached_fragment
+    def folder_counts():
+        """Number of videos anywhere under each folder"""
+        return jsonify({'status': 'success', 'counts': subtree_video_counts()})
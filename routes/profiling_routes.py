@@ -0,0 +1,31 @@
+from flask import abort, render_template, send_file
+from profiling import is_profiling_admin, list_profiles, load_profile, PROFILE_NAME_PATTERN
+import os
+
+def init_profiling_routes(app):
+    @app.route('/_profiles')
+    def profiles():
+        """List saved request profiles, newest first"""
+        if not is_profiling_admin():
+            abort(404)
+        return render_template('profiles.html', profiles=list_profiles(app.config['PROFILE_DIR']))
+
+    @app.route('/_profiles/<name>')
+    def profile_detail(name):
+        """Show a profile's CPU report and SQL statements"""
+        if not is_profiling_admin():
+            abort(404)
+        profile = load_profile(app.config['PROFILE_DIR'], name)
+        if profile is None:
+            abort(404)
+        return render_template('profile_detail.html', profile=profile)
+
+    @app.route('/_profiles/<name>.prof')
+    def download_profile(name):
+        """Download raw cProfile stats, e.g. for snakeviz or pstats"""
+        if not is_profiling_admin() or not PROFILE_NAME_PATTERN.match(name):
+            abort(404)
+        path = os.path.abspath(os.path.join(app.config['PROFILE_DIR'], f'{name}.prof'))
+        if not os.path.exists(path):
+            abort(404)
+        return send_file(path, as_attachment=True, download_name=f'{name}.prof')
@@ -1,19 +1,34 @@
 from flask import flash, redirect, render_template, url_for, request, session, jsonify, send_file, make_response
 from flask_login import login_required, login_user, logout_user
 from forms import LoginForm
-from models.models import User, db, Video, Clip, Folder, Tag, TagCategory, ClipSegment
+from models.models import User, db, Video, Clip, Folder, Tag, TagCategory, ClipSegment, StorageArtifact, TrashItem
 from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy import delete
 import os
 from pathlib import Path
 import subprocess
-from tkinter import Tk, filedialog
 from datetime import datetime
 import shutil  # If using the copy option
 from helper import *
+from instrumentation import init_query_instrumentation
+from background import register_periodic_task, start_background_worker, start_scheduler, submit_after_commit
+from database import start_writer, submit_write
+from thumbnails import THUMBNAIL_SIZES, compute_fingerprint
+from media_worker import probe_durations
+from search import SEARCH_KINDS, search_all
+from storage import enforce_storage_quota, reconcile_storage, remove_files, storage_usage, video_file_paths
+from trash import purge_expired
+from jobs import collect_queue_metrics, enqueue_unique, prune_jobs
+from metrics import init_request_metrics, register_collector, render_metrics
+from profiling import init_profiling
+from fragment_cache import cached_fragment, init_fragment_cache
 from routes.clip_routes import init_clip_routes
 from routes.auth_routes import init_auth_routes
 from routes.video_routes import init_video_routes
 from routes.organization_routes import init_organization_routes
+from routes.profiling_routes import init_profiling_routes
+from routes.event_routes import init_event_routes
+from routes.segment_routes import init_segment_routes
 
 def init_routes(app):
     """Initialize routes and setup database"""
@@ -22,9 +37,71 @@ def init_routes(app):
     init_auth_routes(app)
     init_video_routes(app)
     init_organization_routes(app)
+    init_profiling_routes(app)
+    init_event_routes(app)
+    init_segment_routes(app)
+    init_query_instrumentation(app)
+    init_request_metrics(app)
+    # After the query counter, so a profile's SQL is complete when it is saved
+    init_profiling(app)
+    init_fragment_cache(app)
+    register_collector(collect_queue_metrics)
     
-    # Clean up orphaned thumbnails on startup
-    cleanup_orphaned_thumbnails()
+    # Reclaim clip thumbnails that no clip references any more
+    register_periodic_task(
+        'clip_thumbnail_gc',
+        app.config['THUMBNAIL_GC_INTERVAL'],
+        lambda: cleanup_orphaned_thumbnails(app.config['CLIP_THUMBNAIL_DIR'],
+                                            app.config['THUMBNAIL_GC_GRACE_SECONDS'])
+    )
+
+    # Keep derived media (previews, posters, thumbnails, proxies) within the storage quota
+    register_periodic_task(
+        'storage_quota',
+        app.config['STORAGE_RECONCILE_INTERVAL'],
+        lambda: enforce_storage_quota(app.config['THUMBNAIL_STORE'],
+                                      app.config['STORAGE_QUOTA_MB'] * 1024 * 1024,
+                                      proxy_root=app.config['PROXY_DIR'],
+                                      clip_thumbnails=clip_thumbnail_settings(app.config))
+    )
+
+    # Permanently remove trashed clips once they expire
+    register_periodic_task(
+        'trash_purge',
+        app.config['TRASH_PURGE_INTERVAL'],
+        purge_expired
+    )
+    # Fill in durations for videos imported before they were stored; the
+    # probing itself runs on a job worker
+    def queue_duration_backfill():
+        enqueue_unique('analysis', {'limit': 64})
+        db.session.commit()
+
+    register_periodic_task(
+        'video_duration_backfill',
+        app.config['DURATION_BACKFILL_INTERVAL'],
+        queue_duration_backfill
+    )
+
+    # Forget finished jobs once nobody will poll them
+    register_periodic_task(
+        'job_prune',
+        app.config['JOB_RETENTION_SECONDS'] / 24,
+        lambda: prune_jobs(app.config['JOB_RETENTION_SECONDS'])
+    )
+
+    if app.config.get('WRITE_QUEUE_ENABLED'):
+        start_writer(app)
+    if app.config.get('BACKGROUND_TASKS_ENABLED'):
+        start_background_worker()
+        start_scheduler(app)
+    if app.config.get('JOB_WORKER_THREADS'):
+        # Imported here so web processes without render threads never load it
+        from worker import start_worker_threads
+        start_worker_threads(app, app.config['JOB_WORKER_THREADS'])
+    elif app.config.get('BACKGROUND_TASKS_ENABLED'):
+        app.logger.warning('JOB_WORKER_THREADS is 0: clip renders and scans wait until '
+                           'a `python -m worker` process runs against this database')
     
     # Clean up all thumbnails on startup
     # cleanup_thumbnails('all')
@@ -40,31 +117,88 @@ def init_routes(app):
                 return value
         return value.strftime('%Y-%m-%d %H:%M')
 
-    @app.template_filter('duration')
-    def video_duration_filter(file_path):
-        return get_video_duration(file_path)
+    @app.template_global()
+    def thumbnail_url(fingerprint, size='md'):
+        """URL of a lazily generated, immutable video thumbnail"""
+        return url_for('video_thumbnail',
+                       fingerprint=fingerprint,
+                       timestamp_ms=app.config['THUMBNAIL_TIMESTAMP_MS'],
+                       size=size,
+                       fmt=app.config['THUMBNAIL_FORMAT'])
 
-    # Initialize database tables
-    with app.app_context():
-        db.create_all()
+    @app.template_global()
+    def thumbnail_srcset(fingerprint):
+        """srcset listing every stored rendition of a video thumbnail"""
+        return ', '.join(f"{thumbnail_url(fingerprint, size)} {width}w"
+                         for size, width in THUMBNAIL_SIZES.items())
+
+    @app.template_filter('duration')
+    def video_duration_filter(seconds):
+        return format_duration(seconds)
 
     @app.route('/')
+    @cached_fragment
     def index():
         """Render the main page with video library"""
-        videos = Video.query.order_by(Video.title.asc()).all()
+        videos_data, next_cursor = get_library_page(limit=app.config['LIBRARY_PAGE_SIZE'])
         
-        videos_data = [{
-            'id': video.id,
-            'title': video.title,
-            'file_path': video.file_path,
-            'thumbnail_path': video.thumbnail_path,
-            'clip_count': len(video.clips)
-        } for video in videos]
-        
-        response = make_response(render_template('index.html', videos=videos_data))
+        response = make_response(render_template('index.html', videos=videos_data,
+                                                 next_cursor=next_cursor))
         response.headers['X-Content-Type-Options'] = 'nosniff'
         return response
 
+    @app.route('/videos/page')
+    @cached_fragment
+    def library_page():
+        """Render the next page of library items for infinite scroll"""
+        videos_data, next_cursor = get_library_page(
+            cursor=request.args.get('cursor'),
+            limit=app.config['LIBRARY_PAGE_SIZE']
+        )
+        return render_template('video_items.html', videos=videos_data,
+                               next_cursor=next_cursor)
+
+    @app.route('/videos/list')
+    @cached_fragment
+    def library_list():
+        """Render the first page of the library list, e.g. after a scan"""
+        videos_data, next_cursor = get_library_page(limit=app.config['LIBRARY_PAGE_SIZE'])
+        return render_template('video_list.html', videos=videos_data, next_cursor=next_cursor)
+
+    @app.route('/search')
+    @cached_fragment
+    def search():
+        """Search clips, videos, tags and folders by name, best match first"""
+        query = request.args.get('q', '').strip()
+        kinds = [kind for kind in request.args.getlist('kind') if kind in SEARCH_KINDS]
+        results = search_all(query, kinds=kinds or None,
+                             limit=max(1, min(request.args.get('limit', 20, type=int), 100)))
+        
+        if request.headers.get('HX-Request'):
+            return render_template('search_results.html', results=results, query=query)
+        return jsonify({
+            'status': 'success',
+            'results': [dict(result, snippet=str(result['snippet'])) for result in results]
+        })
+
+    @app.route('/metrics')
+    def metrics():
+        """Request, job queue, FFmpeg and cache metrics in Prometheus text format"""
+        response = make_response(render_metrics())
+        response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return response
+
+    @app.route('/api/storage')
+    def storage_report():
+        """Disk used by clips and derived media, per kind and per video"""
+        if request.args.get('refresh'):
+            reconcile_storage(app.config['THUMBNAIL_STORE'], proxy_root=app.config['PROXY_DIR'])
+        return jsonify({
+            'status': 'success',
+            'usage': storage_usage(app.config['STORAGE_QUOTA_MB'] * 1024 * 1024,
+                                   top_videos=min(request.args.get('videos', 20, type=int), 100))
+        })
+
     @app.route('/scan-folder', methods=['POST'])
     def scan_folder():
         """Scan a folder for video files and add them to the database"""
@@ -73,26 +207,18 @@ def init_routes(app):
         if not os.path.isdir(folder_path):
             return "Invalid folder path", 400
             
-        videos = []
-        for file_path in Path(folder_path).glob('*'):
-            if is_video_file(str(file_path)):
-                video_info = {
-                    'title': file_path.stem,
-                    'file_path': str(file_path),
-                    'size_mb': round(os.path.getsize(file_path) / (1024 * 1024), 2),
-                    'duration': get_video_duration(str(file_path))
-                }
-                videos.append(video_info)
-                
-                # Store in database using SQLAlchemy
-                video = Video(
-                    title=video_info['title'],
-                    file_path=str(file_path)
-                )
-                db.session.merge(video)  # merge instead of add to handle duplicates
+        files = [file_path for file_path in Path(folder_path).glob('*') if is_video_file(str(file_path))]
+        probes = probe_durations([str(file_path) for file_path in files])
+        rows = [{
+            'title': file_path.stem,
+            'file_path': str(file_path),
+            'fingerprint': compute_fingerprint(str(file_path)),
+            'duration': probe.get('duration')
+        } for file_path, probe in zip(files, probes)]
         
-        db.session.commit()
-        return render_template('video_list.html', videos=videos)
+        submit_write(upsert_videos, rows).result()
+        videos, next_cursor = get_library_page(limit=app.config['LIBRARY_PAGE_SIZE'])
+        return render_template('video_list.html', videos=videos, next_cursor=next_cursor)
 
     @app.route('/delete-videos', methods=['POST'])
     def delete_videos():
@@ -104,9 +230,15 @@ def init_routes(app):
         
         try:
             videos = Video.query.filter(Video.id.in_(video_ids)).all()
+            ids = [video.id for video in videos]
+            # Clip files, posters and trashed clips go too, once the rows are gone
+            paths = video_file_paths(ids)
+            db.session.execute(delete(TrashItem).where(TrashItem.video_id.in_(ids)))
+            db.session.execute(delete(StorageArtifact).where(StorageArtifact.video_id.in_(ids)))
             for video in videos:
                 db.session.delete(video)
             
+            submit_after_commit(db.session, remove_files, paths)
             db.session.commit()
             
             return jsonify({
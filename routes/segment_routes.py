@@ -0,0 +1,78 @@
+import os
+from flask import request, jsonify
+from models.models import db, Video, Clip
+from segments import (SEGMENT_FORMATS, export_segments, import_segments, normalize_segments,
+                      parse_fps, to_segment_dicts)
+from werkzeug.utils import secure_filename
+
+def init_segment_routes(app):
+    def segment_file(intervals, fmt, name, fps):
+        """Download response for a segment list"""
+        body = export_segments(intervals, fmt, fps=fps, title=name)
+        response = app.response_class(body, mimetype=SEGMENT_FORMATS[fmt])
+        filename = f"{secure_filename(name) or 'segments'}.{fmt}"
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    @app.route('/segments/import', methods=['POST'])
+    def import_segment_list():
+        """Normalize a JSON, CSV or EDL segment list from an upload or pasted text"""
+        upload = request.files.get('file')
+        fmt = request.form.get('format')
+        if upload and upload.filename:
+            text = upload.read().decode('utf-8-sig', errors='replace')
+            fmt = fmt or os.path.splitext(upload.filename)[1].lstrip('.').lower()
+        else:
+            text = request.form.get('text', '')
+        fmt = fmt or 'json'
+        if fmt not in SEGMENT_FORMATS:
+            return jsonify({'status': 'error', 'message': f'Unsupported format: {fmt}'}), 400
+
+        duration = None
+        video_id = request.form.get('video_id', type=int)
+        if video_id is not None:
+            video = db.session.get(Video, video_id)
+            if video is None:
+                return jsonify({'status': 'error', 'message': 'Video not found'}), 404
+            duration = video.duration or None
+
+        try:
+            segments = import_segments(text, fmt, fps=parse_fps(request.form.get('fps')))
+            intervals = normalize_segments(segments, duration)
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+
+        return jsonify({
+            'status': 'success',
+            'segments': to_segment_dicts(intervals),
+            'imported': len(segments),
+            'merged': len(segments) - len(intervals)
+        })
+
+    @app.route('/segments/export', methods=['POST'])
+    def export_segment_list():
+        """Download posted segments as JSON, CSV or EDL"""
+        data = request.get_json(silent=True) or {}
+        fmt = data.get('format', 'json')
+        if fmt not in SEGMENT_FORMATS:
+            return jsonify({'status': 'error', 'message': f'Unsupported format: {fmt}'}), 400
+        try:
+            fps = parse_fps(data.get('fps'))
+            intervals = normalize_segments(data.get('segments') or [])
+        except (AttributeError, TypeError, ValueError) as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        return segment_file(intervals, fmt, data.get('name') or 'segments', fps)
+
+    @app.route('/clips/<int:clip_id>/segments.<fmt>')
+    def export_clip_segments(clip_id, fmt):
+        """Download a clip's segments as JSON, CSV or EDL"""
+        if fmt not in SEGMENT_FORMATS:
+            return jsonify({'status': 'error', 'message': f'Unsupported format: {fmt}'}), 404
+        try:
+            fps = parse_fps(request.args.get('fps'))
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        clip = db.get_or_404(Clip, clip_id)
+        intervals = normalize_segments([{'start': segment.start_time, 'end': segment.end_time}
+                                        for segment in clip.segments])
+        return segment_file(intervals, fmt, clip.clip_name, fps)
@@ -1,37 +1,66 @@
 import json
-from flask import flash, redirect, render_template, send_from_directory, url_for, request, session, jsonify, send_file, make_response
+from flask import abort, flash, redirect, render_template, send_from_directory, url_for, request, session, jsonify, send_file, make_response
 import os
 from pathlib import Path
 import subprocess
-from tkinter import Tk, filedialog
-
-from gradio import Video
 from helper import *
 from werkzeug.utils import secure_filename
 from models.models import db, Video
+from thumbnails import THUMBNAIL_FORMATS, compute_fingerprint, get_or_create_thumbnail, is_valid_key, store_path
+from media_worker import probe_durations
+from jobs import enqueue, enqueue_unique
+from events import job_owner
+from metrics import CACHE_REQUESTS, STREAM_BYTES
+from database import submit_write
+from proxies import find_proxy, proxy_failed, proxy_settings
 
 def init_video_routes(app):
     @app.route('/stream_video/<int:video_id>')
     def stream_video(video_id):
-        """Stream video file"""
+        """Stream a video, or with ?proxy=1 its editing proxy once rendered
+
+        Range requests get 206 partial responses, so players seek without
+        downloading the file up to the seek point.
+        """
         video = Video.query.get_or_404(video_id)
-        
-        if not os.path.exists(video.file_path):
+
+        path = None
+        if request.args.get('proxy'):
+            path = find_proxy(app.config['PROXY_DIR'], video.fingerprint, app.config['PROXY_HEIGHT'])
+        path = str(path or video.file_path)
+        if not os.path.exists(path):
             return "Video file not found", 404
 
-        def generate():
-            with open(video.file_path, 'rb') as video_file:
-                while True:
-                    chunk = video_file.read(8192)
-                    if not chunk:
-                        break
-                    yield chunk
-
-        response = app.response_class(
-            generate(),
-            mimetype='video/mp4'
-        )
-        response.headers['Accept-Ranges'] = 'bytes'
+        response = send_file(os.path.abspath(path), mimetype='video/mp4', conditional=True)
+        if response.status_code in (200, 206):
+            STREAM_BYTES.inc(response.content_length or 0)
+        return response
+
+    @app.route('/thumbnails/<fingerprint>/<int:timestamp_ms>/<size>.<fmt>')
+    def video_thumbnail(fingerprint, timestamp_ms, size, fmt):
+        """Serve a video thumbnail, rendering it on first request"""
+        # Only the configured frame is ever linked, so other timestamps would
+        # just be unbounded renders and disk use driven by a GET
+        if not is_valid_key(fingerprint, size, fmt) or timestamp_ms != app.config['THUMBNAIL_TIMESTAMP_MS']:
+            abort(404)
+
+        store = app.config['THUMBNAIL_STORE']
+        source_path = None
+        if not store_path(store, fingerprint, timestamp_ms, size, fmt).exists():
+            video = Video.query.filter_by(fingerprint=fingerprint).first_or_404()
+            if not os.path.exists(video.file_path):
+                abort(404)
+            source_path = video.file_path
+
+        CACHE_REQUESTS.inc(cache='thumbnail_store', result='miss' if source_path else 'hit')
+        path = get_or_create_thumbnail(store, source_path, fingerprint, timestamp_ms, size, fmt)
+        if path is None:
+            abort(404)
+
+        # The URL embeds the source fingerprint, so its content never changes
+        response = send_file(os.path.abspath(path), mimetype=THUMBNAIL_FORMATS[fmt]['mimetype'],
+                             conditional=True, max_age=31536000)
+        response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
         return response
 
     @app.route('/edit-video/<int:video_id>')
@@ -44,8 +73,21 @@ def init_video_routes(app):
             'title': video.title,
             'file_path': video.file_path,
             'thumbnail_path': video.thumbnail_path,
-            'video_url': url_for('stream_video', video_id=video.id)
+            'video_url': url_for('stream_video', video_id=video.id),
+            'proxy': False
         }
+
+        # Play the proxy when there is one; otherwise have it rendered for next
+        # time, unless rendering it has already failed
+        settings = proxy_settings(app.config)
+        if settings and video.fingerprint:
+            if find_proxy(settings['root'], video.fingerprint, settings['height']):
+                video_data.update(video_url=url_for('stream_video', video_id=video.id, proxy=1), proxy=True)
+            elif (os.path.exists(video.file_path)
+                  and not proxy_failed(settings['root'], video.fingerprint, settings['height'])):
+                enqueue_unique('proxy', dict(settings, sources=[[video.file_path, video.fingerprint]]),
+                               priority=5, same_payload=True)
+                db.session.commit()
         
         return render_template('edit_video.html', video=video_data)
 
@@ -53,6 +95,8 @@ def init_video_routes(app):
     def browse_folder():
         """Open system folder browser dialog and return selected path"""
         try:
+            # Imported on use: only a desktop session has a display for Tk
+            from tkinter import Tk, filedialog
             root = Tk()
             root.withdraw()
             root.attributes('-topmost', True)
@@ -90,9 +134,6 @@ def init_video_routes(app):
                 "error": "No folder selected or invalid folder path."
             })
         
-        # Clean up thumbnails before scanning
-        cleanup_thumbnails('videos')
-        
         # Count total videos for progress
         total_videos = sum(1 for file in Path(folder_path).glob('*') if is_video_file(str(file)))
         
@@ -105,6 +146,33 @@ def init_video_routes(app):
             "total": total_videos
         })
 
+    @app.route('/scan', methods=['POST'])
+    def start_scan():
+        """Queue a scan of the selected folder; progress arrives on /events"""
+        folder_path = session.get('selected_folder')
+        if not folder_path or not os.path.isdir(folder_path):
+            return jsonify({
+                'status': 'error',
+                'message': 'No folder selected or invalid folder path.'
+            }), 400
+
+        total = sum(1 for file in Path(folder_path).glob('*') if is_video_file(str(file)))
+        if total == 0:
+            return jsonify({'status': 'success', 'total': 0})
+
+        job = enqueue('scan', {
+            'folder': folder_path,
+            'batch_size': app.config['SCAN_BATCH_SIZE'],
+            'thumbnails': {
+                'root': app.config['THUMBNAIL_STORE'],
+                'timestamp_ms': app.config['THUMBNAIL_TIMESTAMP_MS'],
+                'fmt': app.config['THUMBNAIL_FORMAT']
+            },
+            'proxies': proxy_settings(app.config)
+        }, priority=5, owner=job_owner())
+        db.session.commit()
+        return jsonify({'status': 'success', 'task_id': job.id, 'total': total})
+
     @app.route('/scan-progress', methods=['POST'])
     def scan_progress():
         """Process videos in chunks and report progress"""
@@ -115,54 +183,33 @@ def init_video_routes(app):
         
         try:
             files = [f for f in Path(folder_path).glob('*') if is_video_file(str(f))]
-            chunk_size = 2  # Process 2 files at a time
+            chunk_size = app.config['SCAN_BATCH_SIZE']
             
             current_files = files[processed:processed + chunk_size]
-            for file in current_files:
-                absolute_path = str(file.absolute())
-                
-                # Generate thumbnail
-                thumbnail_filename = secure_filename(f"{file.stem}_thumb.jpg")
-                thumbnail_path = Path('static/thumbnails/videos') / thumbnail_filename
-                relative_thumbnail_path = f'thumbnails/videos/{thumbnail_filename}'
-                
-                # Ensure thumbnail directory exists
-                thumbnail_path.parent.mkdir(parents=True, exist_ok=True)
-                
-                # Generate thumbnail using FFmpeg
-                try:
-                    cmd = [
-                        'ffmpeg', '-y',
-                        '-ss', '00:00:01',
-                        '-i', absolute_path,
-                        '-vframes', '1',
-                        '-q:v', '2',
-                        str(thumbnail_path)
-                    ]
-                    subprocess.run(cmd, capture_output=True, check=True)
-                    has_thumbnail = True
-                except subprocess.CalledProcessError as e:
-                    print(f"Failed to generate thumbnail for {file}: {e}")
-                    has_thumbnail = False
-                    relative_thumbnail_path = None
-                
-                # Store in database using SQLAlchemy
-                video = Video(
-                    title=file.stem,
-                    file_path=absolute_path,
-                    thumbnail_path=relative_thumbnail_path if has_thumbnail else None
-                )
-                db.session.merge(video)  # Use merge to handle duplicates
-                db.session.commit()
-                
-                processed += 1
+            
+            # Probe the whole chunk with a handful of FFmpeg launches
+            sources = ingest_video_files([str(file.absolute()) for file in current_files])
+            processed += len(current_files)
+            
+            # Warm the grid rendition on a worker so the library does not
+            # render it lazily and the scan does not wait on FFmpeg
+            enqueue('thumbnail', {
+                'root': app.config['THUMBNAIL_STORE'],
+                'sources': sources,
+                'timestamp_ms': app.config['THUMBNAIL_TIMESTAMP_MS'],
+                'fmt': app.config['THUMBNAIL_FORMAT']
+            })
+            proxies = proxy_settings(app.config)
+            if proxies:
+                enqueue('proxy', dict(proxies, sources=sources), priority=-5)
+            db.session.commit()
             
             progress = int((processed / total) * 100)
             
             if processed >= total:
                 # Scan complete, return the video list HTML
-                videos = Video.query.order_by(Video.title).all()
-                html = render_template('video_list.html', videos=videos)
+                videos, next_cursor = get_library_page(limit=app.config['LIBRARY_PAGE_SIZE'])
+                html = render_template('video_list.html', videos=videos, next_cursor=next_cursor)
                 return jsonify({
                     "progress": 100,
                     "processed": processed,
@@ -200,36 +247,30 @@ def init_video_routes(app):
             imported_count = 0
             skipped_count = 0
             
-            for file in Path(folder_path).glob('*'):
-                if is_video_file(str(file)):
-                    # Check if video already exists
-                    existing = Video.query.filter_by(file_path=str(file)).first()
-                    
-                    if existing:
-                        skipped_count += 1
-                        continue
+            files = [file for file in Path(folder_path).glob('*') if is_video_file(str(file))]
+            existing = {video.file_path for video in
+                        Video.query.filter(Video.file_path.in_([str(f) for f in files]))
+                        .with_entities(Video.file_path).all()}
+            new_files = [file for file in files if str(file) not in existing]
+            skipped_count = len(files) - len(new_files)
+            
+            probes = probe_durations([str(file) for file in new_files])
+            rows = []
+            for file, probe in zip(new_files, probes):
+                try:
+                    rows.append({
+                        'title': file.stem,
+                        'file_path': str(file),
+                        'fingerprint': compute_fingerprint(str(file)),
+                        'duration': probe.get('duration')
+                    })
+                    imported_count += 1
                     
-                    try:
-                        thumbnail_filename = f"{file.stem}_thumb.jpg"
-                        thumbnail_path = f"static/thumbnails/videos/{thumbnail_filename}"
-                        if generate_thumbnail(str(file), thumbnail_path):
-                            relative_thumbnail_path = f"thumbnails/videos/{thumbnail_filename}"
-                        else:
-                            relative_thumbnail_path = None
-                        
-                        video = Video(
-                            title=file.stem,
-                            file_path=str(file),
-                            thumbnail_path=relative_thumbnail_path
-                        )
-                        db.session.add(video)
-                        imported_count += 1
-                        
-                    except Exception as e:
-                        print(f"Error processing {file}: {str(e)}")
-                        continue
+                except Exception as e:
+                    print(f"Error processing {file}: {str(e)}")
+                    continue
             
-            db.session.commit()
+            submit_write(upsert_videos, rows).result()
             return f"""
                 <div class="alert alert-success">
                     <i class="bi bi-check-circle me-2"></i>
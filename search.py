@@ -0,0 +1,119 @@
+import re
+from markupsafe import Markup, escape
+from sqlalchemy import Integer, event, text
+from models.models import db
+
+# One FTS5 table indexes every searchable entity. The rowid encodes the
+# entity as id * 4 + kind, so triggers can update a row by rowid lookup.
+SEARCH_KINDS = {'video': 0, 'clip': 1, 'tag': 2, 'folder': 3}
+
+# Source table and indexed column for each kind
+SEARCH_SOURCES = {
+    'video': ('videos', 'title'),
+    'clip': ('clips', 'clip_name'),
+    'tag': ('tags', 'name'),
+    'folder': ('folders', 'name'),
+}
+
+# Highlight markers that cannot appear in user text; swapped for <mark> after escaping
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_TOKEN_PATTERN = re.compile(r'\w+', re.UNICODE)
+
+
+def search_ddl():
+    """SQL statements that create the search index and its sync triggers"""
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "name, kind UNINDEXED, tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+    ]
+    for kind, (table, column) in SEARCH_SOURCES.items():
+        code = SEARCH_KINDS[kind]
+        rowid = f"{{row}}.id * 4 + {code}"
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO search_index(rowid, name, kind) VALUES ({rowid.format(row='new')}, new.{column}, '{kind}'); "
+            f"END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update AFTER UPDATE OF {column} ON {table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = {rowid.format(row='old')}; "
+            f"INSERT INTO search_index(rowid, name, kind) VALUES ({rowid.format(row='new')}, new.{column}, '{kind}'); "
+            f"END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM search_index WHERE rowid = {rowid.format(row='old')}; "
+            f"END",
+        ]
+    return statements
+
+
+def install_search_index(connection):
+    """Create the search index and triggers, backfilling it when empty"""
+    for statement in search_ddl():
+        connection.exec_driver_sql(statement)
+    if connection.exec_driver_sql("SELECT 1 FROM search_index LIMIT 1").first() is None:
+        rebuild_search_index(connection)
+
+
+def rebuild_search_index(connection):
+    """Re-index every searchable row from its source table"""
+    connection.exec_driver_sql("DELETE FROM search_index")
+    for kind, (table, column) in SEARCH_SOURCES.items():
+        connection.exec_driver_sql(
+            f"INSERT INTO search_index(rowid, name, kind) "
+            f"SELECT id * 4 + {SEARCH_KINDS[kind]}, {column}, '{kind}' FROM {table}"
+        )
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.exec_driver_sql("DROP TABLE IF EXISTS search_index")
+
+
+def build_match_query(query):
+    """Turn free text into an FTS5 query matching every word as a prefix"""
+    tokens = _TOKEN_PATTERN.findall(query or '')
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def matching_ids(kind, query):
+    """Subquery of ids of one kind whose name matches `query`"""
+    return text(
+        "SELECT rowid / 4 AS id FROM search_index WHERE search_index MATCH :match AND rowid % 4 = :code"
+    ).bindparams(match=build_match_query(query), code=SEARCH_KINDS[kind]).columns(id=Integer)
+
+
+def search_all(query, kinds=None, limit=20):
+    """Rank matches across clips, videos, tags and folders
+
+    Returns a list of dicts with `kind`, `id`, `name` and an HTML-safe
+    `snippet` with matched words wrapped in <mark>, best match first.
+    """
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    sql = (
+        "SELECT rowid / 4 AS id, kind, name, "
+        "snippet(search_index, 0, :start, :end, '…', 16) AS snippet "
+        "FROM search_index WHERE search_index MATCH :match"
+    )
+    params = {'match': match, 'start': _MARK_START, 'end': _MARK_END, 'limit': limit}
+    if kinds:
+        codes = [str(SEARCH_KINDS[kind]) for kind in kinds]
+        sql += f" AND rowid % 4 IN ({', '.join(codes)})"
+    sql += " ORDER BY rank LIMIT :limit"
+
+    rows = db.session.execute(text(sql), params)
+    return [{
+        'kind': row.kind,
+        'id': row.id,
+        'name': row.name,
+        'snippet': _highlight(row.snippet)
+    } for row in rows]
+
+
+def _highlight(snippet):
+    """Escape a snippet and turn the match markers into <mark> tags"""
+    escaped = str(escape(snippet))
+    return Markup(escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
@@ -0,0 +1,206 @@
+import bisect
+import csv
+import io
+import json
+import re
+
+# Import/export formats and their download mimetypes
+SEGMENT_FORMATS = {
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'edl': 'text/plain',
+}
+
+# Frame rate assumed for EDL timecodes when none is given, and the highest accepted
+DEFAULT_EDL_FPS = 30
+MAX_EDL_FPS = 240
+
+_EDL_EVENT = re.compile(
+    r'^\s*(\d+)\s+(\S+)\s+(\S+)\s+(\S+)(?:\s+\d+)?\s+'
+    r'(\d{2}:\d{2}:\d{2}[:;]\d{2})\s+(\d{2}:\d{2}:\d{2}[:;]\d{2})\s+'
+    r'(\d{2}:\d{2}:\d{2}[:;]\d{2})\s+(\d{2}:\d{2}:\d{2}[:;]\d{2})\s*$'
+)
+_EDL_CLIP_NAME = re.compile(r'^\s*\*\s*FROM CLIP NAME:\s*(.*)$', re.IGNORECASE)
+
+
+def parse_fps(value):
+    """Whole EDL frame rate from 1 to MAX_EDL_FPS; empty values get the default"""
+    if value is None or value == '':
+        return DEFAULT_EDL_FPS
+    if isinstance(value, str) and value.strip().isdigit():
+        value = int(value)
+    if not isinstance(value, int) or isinstance(value, bool) or not 1 <= value <= MAX_EDL_FPS:
+        raise ValueError(f"fps must be a whole number from 1 to {MAX_EDL_FPS}")
+    return value
+
+
+def parse_time(value):
+    """Seconds from a number, 'SS', 'MM:SS' or 'HH:MM:SS' (fractions allowed)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        seconds = float(value)
+    elif isinstance(value, str) and value.strip():
+        parts = value.strip().split(':')
+        if len(parts) > 3:
+            raise ValueError(f"Invalid time: {value!r}")
+        seconds = 0.0
+        for part in parts:
+            seconds = seconds * 60 + float(part)
+    else:
+        raise ValueError(f"Invalid time: {value!r}")
+    if seconds != seconds or seconds < 0 or seconds == float('inf'):
+        raise ValueError(f"Invalid time: {value!r}")
+    return seconds
+
+
+def format_time(seconds):
+    """'MM:SS' (with milliseconds when needed), the editor's segment format"""
+    minutes, rest = divmod(round(seconds, 3), 60)
+    if rest == int(rest):
+        return f"{int(minutes):02d}:{int(rest):02d}"
+    return f"{int(minutes):02d}:{rest:06.3f}"
+
+
+def normalize_segments(segments, duration=None, merge_gap=0.0):
+    """Validate, sort and merge segments into disjoint (start, end, label) intervals
+
+    `segments` are dicts with `start` and `end` (any parse_time format) and
+    an optional `label`. Segments are clamped to `duration` when it is known.
+    Overlapping segments, and ones less than `merge_gap` seconds apart, are
+    merged so no part of the source is decoded or encoded twice; a merged
+    interval keeps the first segment's label. Raises ValueError for a
+    malformed or empty segment.
+    """
+    intervals = []
+    for index, segment in enumerate(segments):
+        try:
+            start, end = parse_time(segment['start']), parse_time(segment['end'])
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Segment {index + 1}: {e}") from None
+        if duration is not None:
+            start, end = min(start, duration), min(end, duration)
+        if end <= start:
+            raise ValueError(f"Segment {index + 1}: end must be after start")
+        intervals.append((start, end, segment.get('label') or None))
+
+    # Sort by start, then sweep: each interval either extends the last
+    # merged one or starts a new one
+    merged = []
+    for start, end, label in sorted(intervals, key=lambda interval: (interval[0], interval[1])):
+        if merged and start <= merged[-1][1] + merge_gap:
+            last_start, last_end, last_label = merged[-1]
+            merged[-1] = (last_start, max(last_end, end), last_label)
+        else:
+            merged.append((start, end, label))
+    return merged
+
+
+def snap_to_keyframes(intervals, keyframes):
+    """Move each start back to the keyframe at or before it
+
+    This only adjusts cut points, so each segment opens on a keyframe (and
+    lines up with the cut points of a stream copy). It does not make renders
+    faster: they decode the source from the beginning either way, and each
+    segment gains up to one GOP of footage. Ends are kept, and intervals
+    that now overlap are merged again.
+    """
+    if not keyframes:
+        return list(intervals)
+    keyframes = sorted(keyframes)
+    snapped = []
+    for start, end, label in intervals:
+        index = bisect.bisect_right(keyframes, start + 1e-6) - 1
+        snapped.append((keyframes[index] if index >= 0 else start, end, label))
+    return normalize_segments([{'start': start, 'end': end, 'label': label}
+                               for start, end, label in snapped])
+
+
+def to_segment_dicts(intervals):
+    """Intervals as the {start, end} dicts stored on clips and sent by the editor"""
+    segments = []
+    for start, end, label in intervals:
+        segment = {'start': format_time(start), 'end': format_time(end)}
+        if label:
+            segment['label'] = label
+        segments.append(segment)
+    return segments
+
+
+def import_segments(text, fmt, fps=DEFAULT_EDL_FPS):
+    """Parse a JSON, CSV or EDL segment list into {start, end, label} dicts
+
+    JSON is a list of segments or {"segments": [...]}; CSV needs `start` and
+    `end` columns (and may have `label`); EDL is CMX 3600, where each event's
+    source in/out become a segment, named by its FROM CLIP NAME comment.
+    """
+    if fmt == 'json':
+        data = json.loads(text)
+        segments = data.get('segments') if isinstance(data, dict) else data
+        if not isinstance(segments, list):
+            raise ValueError('JSON must be a list of segments or {"segments": [...]}')
+        return segments
+    if fmt == 'csv':
+        reader = csv.DictReader(io.StringIO(text))
+        fields = {name.strip().lower() for name in reader.fieldnames or []}
+        if not {'start', 'end'} <= fields:
+            raise ValueError('CSV needs start and end columns')
+        return [{key.strip().lower(): value.strip() for key, value in row.items() if key}
+                for row in reader if any((value or '').strip() for value in row.values())]
+    if fmt == 'edl':
+        return _parse_edl(text, fps)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def export_segments(intervals, fmt, fps=DEFAULT_EDL_FPS, title='Segments', source='AX'):
+    """Serialize (start, end, label) intervals as JSON, CSV or EDL text"""
+    if fmt == 'json':
+        return json.dumps({'segments': to_segment_dicts(intervals)}, indent=2)
+    if fmt == 'csv':
+        output = io.StringIO()
+        writer = csv.writer(output, lineterminator='\n')
+        writer.writerow(['start', 'end', 'label'])
+        for start, end, label in intervals:
+            writer.writerow([format_time(start), format_time(end), label or ''])
+        return output.getvalue()
+    if fmt == 'edl':
+        lines = [f'TITLE: {title}', 'FCM: NON-DROP FRAME', '']
+        record = 0.0
+        for number, (start, end, label) in enumerate(intervals, start=1):
+            record_end = record + (end - start)
+            lines.append(f"{number:03d}  {source:<8} V     C        "
+                         f"{_timecode(start, fps)} {_timecode(end, fps)} "
+                         f"{_timecode(record, fps)} {_timecode(record_end, fps)}")
+            if label:
+                lines.append(f'* FROM CLIP NAME: {label}')
+            lines.append('')
+            record = record_end
+        return '\n'.join(lines)
+    raise ValueError(f"Unsupported format: {fmt}")
+
+
+def _parse_edl(text, fps):
+    segments = []
+    for line in text.splitlines():
+        event = _EDL_EVENT.match(line)
+        if event:
+            segments.append({'start': _from_timecode(event.group(5), fps),
+                             'end': _from_timecode(event.group(6), fps)})
+            continue
+        name = _EDL_CLIP_NAME.match(line)
+        if name and segments:
+            segments[-1]['label'] = name.group(1).strip()
+    if not segments:
+        raise ValueError('No EDL events found')
+    return segments
+
+
+def _timecode(seconds, fps):
+    frames = round(seconds * fps)
+    hours, frames = divmod(frames, 3600 * fps)
+    minutes, frames = divmod(frames, 60 * fps)
+    secs, frames = divmod(frames, fps)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}:{frames:02d}"
+
+
+def _from_timecode(timecode, fps):
+    hours, minutes, seconds, frames = (int(part) for part in re.split('[:;]', timecode))
+    return hours * 3600 + minutes * 60 + seconds + frames / fps
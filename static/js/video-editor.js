@@ -389,7 +389,7 @@ class VideoEditor {
             const result = await response.json();
             
             if (result.status === 'success' && result.task_id) {
-                this.pollProgress(result.task_id);
+                this.watchProgress(result.task_id);
             } else {
                 throw new Error(result.message || 'Error creating clip');
             }
@@ -401,42 +401,44 @@ class VideoEditor {
         }
     }
 
-    pollProgress = async (taskId) => {
+    watchProgress = (taskId) => {
         const progressBar = document.querySelector('#clipProgress .progress-bar');
         const progressText = document.querySelector('#clipProgress .progress-text');
         const statusText = document.querySelector('#clipProgress .progress-status');
         const submitButton = document.getElementById('createClipBtn');
 
-        const updateProgress = async () => {
-            try {
-                const response = await fetch(`/clip-progress/${taskId}`);
-                const data = await response.json();
-
-                if (data.state === 'PROGRESS') {
-                    progressBar.style.width = `${data.progress}%`;
-                    progressBar.setAttribute('aria-valuenow', data.progress);
-                    progressText.textContent = `${data.progress}%`;
-                    statusText.textContent = data.status;
-                    setTimeout(updateProgress, 500);
-                } else if (data.state === 'SUCCESS') {
-                    progressBar.style.width = '100%';
-                    progressBar.setAttribute('aria-valuenow', 100);
-                    progressText.textContent = '100%';
-                    statusText.textContent = 'Clip created successfully!';
-                    this.showAlert('Clip created successfully!', 'success');
-                    setTimeout(() => window.location.reload(), 1500);
-                } else if (data.state === 'FAILURE') {
-                    throw new Error(data.error || 'Failed to create clip');
-                }
-            } catch (error) {
-                console.error('Error checking progress:', error);
-                this.showAlert('Error creating clip', 'error');
-                progressBar.style.display = 'none';
-                submitButton.disabled = false;
-            }
-        };
+        // One open stream instead of polling /clip-progress
+        const events = new EventSource(`/events?job=${taskId}`);
+
+        events.addEventListener('progress', (e) => {
+            const data = JSON.parse(e.data);
+            progressBar.style.width = `${data.progress}%`;
+            progressBar.setAttribute('aria-valuenow', data.progress);
+            progressText.textContent = `${data.progress}%`;
+            statusText.textContent = data.state === 'queued' ? 'Waiting for a render worker...' : data.status;
+        });
+
+        events.addEventListener('complete', () => {
+            events.close();
+            progressBar.style.width = '100%';
+            progressBar.setAttribute('aria-valuenow', 100);
+            progressText.textContent = '100%';
+            statusText.textContent = 'Clip created successfully!';
+            this.showAlert('Clip created successfully!', 'success');
+            setTimeout(() => window.location.reload(), 1500);
+        });
 
-        updateProgress();
+        events.addEventListener('error', (e) => {
+            // Connection drops fire 'error' without data; EventSource reconnects itself
+            if (!e.data) {
+                return;
+            }
+            events.close();
+            console.error('Error creating clip:', JSON.parse(e.data).error);
+            this.showAlert('Error creating clip', 'error');
+            progressBar.style.display = 'none';
+            submitButton.disabled = false;
+        });
     }
 
     formatTime(seconds) {
@@ -49,14 +49,17 @@ document.addEventListener('DOMContentLoaded', function() {
             </div>
         `;
 
-        // Start the scan
-        fetch('/select-folder', {
+        // Queue the scan; a worker runs it and reports on /events
+        fetch('/scan', {
             method: 'POST'
         })
         .then(response => response.json())
         .then(data => {
+            if (data.status === 'error') {
+                throw new Error(data.message);
+            }
             if (data.total > 0) {
-                startProgressUpdates(data.total);
+                watchScan(data.task_id);
             } else {
                 videoList.innerHTML = `
                     <div class="alert alert-warning">
@@ -75,53 +78,47 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    function startProgressUpdates(total) {
-        let processed = 0;
-        
-        function updateProgress() {
-            fetch('/scan-progress', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json'
-                },
-                body: JSON.stringify({ processed, total })
-            })
-            .then(response => response.json())
-            .then(data => {
-                if (data.error) {
-                    throw new Error(data.error);
-                }
-                
-                const progressBar = document.querySelector('.progress-bar');
-                const progressText = document.querySelector('.progress-text');
-                const statusText = document.querySelector('.progress-status');
-                
-                if (data.html) {
-                    // Scan complete, update the video list
-                    document.getElementById('video-list').innerHTML = data.html;
-                    return;
-                }
-                
-                progressBar.style.width = data.progress + '%';
-                progressBar.setAttribute('aria-valuenow', data.progress);
-                progressText.textContent = data.progress + '%';
-                statusText.textContent = data.status;
-                
-                processed = data.processed;
-                if (processed < total) {
-                    setTimeout(updateProgress, 500);
-                }
-            })
-            .catch(error => {
-                console.error('Error during progress update:', error);
-                document.getElementById('video-list').innerHTML = `
-                    <div class="alert alert-danger">
-                        Error scanning videos. Please try again.
-                    </div>
-                `;
-            });
+    function watchScan(taskId) {
+        const events = new EventSource(`/events?job=${taskId}`);
+
+        function showError(error) {
+            events.close();
+            console.error('Error during scan:', error);
+            document.getElementById('video-list').innerHTML = `
+                <div class="alert alert-danger">
+                    Error scanning videos. Please try again.
+                </div>
+            `;
         }
-        
-        updateProgress();
+
+        events.addEventListener('progress', function(e) {
+            const data = JSON.parse(e.data);
+            const progressBar = document.querySelector('.progress-bar');
+            progressBar.style.width = data.progress + '%';
+            progressBar.setAttribute('aria-valuenow', data.progress);
+            document.querySelector('.progress-text').textContent = data.progress + '%';
+            document.querySelector('.progress-status').textContent =
+                data.state === 'queued' ? 'Waiting for a worker...' : data.status;
+        });
+
+        events.addEventListener('complete', function() {
+            events.close();
+            // Scan complete, update the video list
+            fetch('/videos/list')
+                .then(response => response.text())
+                .then(html => {
+                    const videoList = document.getElementById('video-list');
+                    videoList.innerHTML = html;
+                    htmx.process(videoList);
+                })
+                .catch(showError);
+        });
+
+        events.addEventListener('error', function(e) {
+            // Connection drops fire 'error' without data; EventSource reconnects itself
+            if (e.data) {
+                showError(JSON.parse(e.data).error);
+            }
+        });
     }
 }); 
\ No newline at end of file
@@ -0,0 +1,244 @@
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects.sqlite import insert
+from jobs import enqueue
+from models.models import db, Clip, StorageArtifact, TrashItem, Video
+
+# Artifact kinds and whether they can be regenerated, and so evicted.
+# Store thumbnails and proxies are rendered again on demand; clip posters
+# and previews by a clip_thumbnail job that eviction queues.
+# User clips (and trashed clips awaiting restore) are never evicted.
+ARTIFACT_KINDS = {
+    'clip': False,
+    'trash': False,
+    'clip_poster': True,
+    'clip_preview': True,
+    'video_thumbnail': True,
+    'thumbnail': True,
+    'proxy': True,
+}
+
+# Columns cleared when their artifact is evicted, so the UI falls back to
+# the placeholder (or the thumbnail store) instead of a broken image
+_PATH_COLUMNS = {
+    'clip_poster': (Clip.thumbnail_path, 'clip_id'),
+    'clip_preview': (Clip.preview_path, 'clip_id'),
+    'video_thumbnail': (Video.thumbnail_path, 'video_id'),
+}
+
+
+def record_artifacts(entries):
+    """Upsert ledger rows for files that were just written
+
+    Each entry is a dict with `path` and `kind`, and optionally `video_id`
+    and `clip_id`. Missing files are skipped. Returns the rows recorded.
+    Uses SQLite's upsert; migrate() refuses to start on other databases.
+    """
+    rows = []
+    for entry in entries:
+        try:
+            stat = os.stat(entry['path'])
+        except OSError:
+            continue
+        rows.append({
+            'path': str(entry['path']),
+            'kind': entry['kind'],
+            'video_id': entry.get('video_id'),
+            'clip_id': entry.get('clip_id'),
+            'size_bytes': stat.st_size,
+            'regenerable': ARTIFACT_KINDS[entry['kind']],
+            'last_used_at': datetime.fromtimestamp(stat.st_mtime, timezone.utc),
+            'recorded_at': datetime.now(timezone.utc),
+        })
+    if not rows:
+        return 0
+
+    statement = insert(StorageArtifact)
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=[StorageArtifact.path],
+        set_={column: statement.excluded[column]
+              for column in ('kind', 'video_id', 'clip_id', 'size_bytes', 'regenerable', 'last_used_at')}
+    ), rows)
+    return len(rows)
+
+
+def reconcile_storage(thumbnail_store, static_root='static', proxy_root=None):
+    """Rebuild the ledger from the clip, trash and video tables, the thumbnail store and proxies
+
+    Sizes and last-used times come from the files themselves (the store
+    touches a rendition whenever it is served). Rows for files that no
+    longer exist are dropped. Returns the number of artifacts recorded.
+    """
+    entries = []
+    for clip in db.session.execute(select(
+            Clip.id, Clip.video_id, Clip.clip_path, Clip.thumbnail_path, Clip.preview_path)):
+        entries.append({'path': clip.clip_path, 'kind': 'clip',
+                        'video_id': clip.video_id, 'clip_id': clip.id})
+        for kind, path in (('clip_poster', clip.thumbnail_path), ('clip_preview', clip.preview_path)):
+            if path:
+                entries.append({'path': static_path(path, static_root), 'kind': kind,
+                                'video_id': clip.video_id, 'clip_id': clip.id})
+
+    for item in db.session.execute(select(
+            TrashItem.clip_id, TrashItem.video_id, TrashItem.trashed_path)
+            .where(TrashItem.trashed_path.isnot(None))):
+        entries.append({'path': item.trashed_path, 'kind': 'trash',
+                        'video_id': item.video_id, 'clip_id': item.clip_id})
+
+    # Store renditions are named after the fingerprint of their source video
+    video_ids = {}
+    for video in db.session.execute(select(Video.id, Video.fingerprint, Video.thumbnail_path)):
+        if video.fingerprint:
+            video_ids.setdefault(video.fingerprint, video.id)
+        if video.thumbnail_path:
+            entries.append({'path': static_path(video.thumbnail_path, static_root),
+                            'kind': 'video_thumbnail', 'video_id': video.id})
+    store = Path(thumbnail_store)
+    if store.exists():
+        for path in store.glob('*/*'):
+            if path.is_file() and not path.name.startswith('.'):
+                entries.append({'path': str(path), 'kind': 'thumbnail',
+                                'video_id': video_ids.get(path.name.split('_', 1)[0])})
+    if proxy_root and Path(proxy_root).exists():
+        for path in Path(proxy_root).glob('*/*.mp4'):
+            if path.is_file() and not path.name.startswith('.'):
+                entries.append({'path': str(path), 'kind': 'proxy',
+                                'video_id': video_ids.get(path.name.split('_', 1)[0])})
+
+    recorded = record_artifacts(entries)
+    seen = {str(entry['path']) for entry in entries if os.path.exists(entry['path'])}
+    stale = [row.id for row in db.session.execute(select(StorageArtifact.id, StorageArtifact.path))
+             if row.path not in seen]
+    if stale:
+        db.session.execute(delete(StorageArtifact).where(StorageArtifact.id.in_(stale)))
+    db.session.commit()
+    return recorded
+
+
+def storage_usage(quota_bytes=None, top_videos=20):
+    """Bytes used per artifact kind and by the largest videos"""
+    by_kind = {kind: {'count': count, 'bytes': size or 0} for kind, count, size in db.session.execute(
+        select(StorageArtifact.kind, func.count(), func.sum(StorageArtifact.size_bytes))
+        .group_by(StorageArtifact.kind)
+    )}
+    videos = db.session.execute(
+        select(StorageArtifact.video_id, Video.title, func.sum(StorageArtifact.size_bytes).label('bytes'))
+        .outerjoin(Video, Video.id == StorageArtifact.video_id)
+        .where(StorageArtifact.video_id.isnot(None))
+        .group_by(StorageArtifact.video_id)
+        .order_by(func.sum(StorageArtifact.size_bytes).desc())
+        .limit(top_videos)
+    ).all()
+
+    total = sum(kind['bytes'] for kind in by_kind.values())
+    return {
+        'total_bytes': total,
+        'evictable_bytes': sum(usage['bytes'] for kind, usage in by_kind.items() if ARTIFACT_KINDS.get(kind)),
+        'quota_bytes': quota_bytes,
+        'by_kind': by_kind,
+        'videos': [{'video_id': row.video_id, 'title': row.title, 'bytes': row.bytes} for row in videos],
+    }
+
+
+def evict_to_quota(quota_bytes, low_watermark=0.9, clip_thumbnails=None):
+    """Delete least recently used regenerable artifacts until usage fits the quota
+
+    Eviction stops at `low_watermark` of the quota so it does not run again
+    on the next render. With `clip_thumbnails` settings (see
+    helper.clip_thumbnail_settings), clips that lost a poster or preview
+    get one clip_thumbnail job to render them again. Returns the number of
+    bytes freed.
+    """
+    total = db.session.execute(select(func.coalesce(func.sum(StorageArtifact.size_bytes), 0))).scalar()
+    if total <= quota_bytes:
+        return 0
+
+    target = quota_bytes * low_watermark
+    evicted = []
+    freed = 0
+    for row in db.session.execute(
+            select(StorageArtifact.id, StorageArtifact.path, StorageArtifact.kind,
+                   StorageArtifact.video_id, StorageArtifact.clip_id, StorageArtifact.size_bytes)
+            .where(StorageArtifact.regenerable.is_(True))
+            .order_by(StorageArtifact.last_used_at, StorageArtifact.id)
+    ).all():
+        if total - freed <= target:
+            break
+        evicted.append(row)
+        freed += row.size_bytes
+
+    if not evicted:
+        return 0
+    for kind, (column, owner) in _PATH_COLUMNS.items():
+        owner_ids = [getattr(row, owner) for row in evicted if row.kind == kind and getattr(row, owner)]
+        if owner_ids:
+            db.session.execute(update(column.class_).where(column.class_.id.in_(owner_ids))
+                               .values({column: None}),
+                               execution_options={'synchronize_session': False})
+    db.session.execute(delete(StorageArtifact).where(StorageArtifact.id.in_([row.id for row in evicted])))
+    clip_ids = sorted({row.clip_id for row in evicted if row.kind in ('clip_poster', 'clip_preview')
+                       and row.clip_id})
+    if clip_thumbnails and clip_ids:
+        enqueue('clip_thumbnail', dict(clip_thumbnails, clip_ids=clip_ids), priority=-10)
+    db.session.commit()
+    remove_files([row.path for row in evicted])
+    return freed
+
+
+def enforce_storage_quota(thumbnail_store, quota_bytes, static_root='static', proxy_root=None,
+                          clip_thumbnails=None):
+    """Reconcile the ledger with disk, then evict down to the quota (periodic task)"""
+    reconcile_storage(thumbnail_store, static_root, proxy_root)
+    return evict_to_quota(quota_bytes, clip_thumbnails=clip_thumbnails)
+
+
+def video_file_paths(video_ids, static_root='static'):
+    """Every file on disk belonging to the given videos' clips, trashed clips and thumbnails"""
+    paths = []
+    for clip in db.session.execute(select(Clip.clip_path, Clip.thumbnail_path, Clip.preview_path)
+                                   .where(Clip.video_id.in_(video_ids))):
+        paths.append(clip.clip_path)
+        paths.extend(static_path(path, static_root)
+                     for path in (clip.thumbnail_path, clip.preview_path) if path)
+    for item in db.session.execute(select(TrashItem.trashed_path, TrashItem.thumbnail_path,
+                                          TrashItem.preview_path)
+                                   .where(TrashItem.video_id.in_(video_ids))):
+        if item.trashed_path:
+            paths.append(item.trashed_path)
+        paths.extend(static_path(path, static_root)
+                     for path in (item.thumbnail_path, item.preview_path) if path)
+    for (thumbnail_path,) in db.session.execute(select(Video.thumbnail_path)
+                                                .where(Video.id.in_(video_ids))):
+        if thumbnail_path:
+            paths.append(static_path(thumbnail_path, static_root))
+    return paths
+
+
+def static_path(path, static_root='static'):
+    """Filesystem path of a file stored relative to the static folder"""
+    relative = path[len('static/'):] if path.startswith('static/') else path
+    return os.path.join(static_root, relative)
+
+
+def move_files(moves):
+    """Rename (source, destination) pairs, skipping sources that are gone"""
+    for source, destination in moves:
+        try:
+            os.replace(source, destination)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error moving {source}: {str(e)}")
+
+
+def remove_files(paths):
+    """Delete files, ignoring ones that are already gone"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing {path}: {str(e)}")
@@ -3,38 +3,23 @@
 import pytest
 import sys
 import os
-import sqlite3
 
 # Add the project root directory to Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from app import app as flask_app
+from app import create_app
 from models.models import db, User, Video, Clip, Folder, Tag, TagCategory, ClipSegment
 from config import TestingConfig
+from migrations import migrate
+
+# One app per test session, built from TestingConfig so it never touches
+# the development database or starts background threads
+flask_app = create_app(TestingConfig)
 
 @pytest.fixture
 def app():
-    # Configure the app for testing
-    flask_app.config.from_object(TestingConfig)
-    
-    # Enable SQLite to handle timezone-aware datetime
-    flask_app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'connect_args': {
-            'detect_types': sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES,
-            'isolation_level': None
-        }
-    }
-    
-    def _fk_pragma_on_connect(dbapi_con, con_record):
-        dbapi_con.execute('PRAGMA foreign_keys=ON')
-        dbapi_con.execute('PRAGMA timezone=UTC')
-    
     with flask_app.app_context():
-        from sqlalchemy import event
-        engine = db.engine
-        event.listen(engine, 'connect', _fk_pragma_on_connect)
-        
-        db.create_all()
+        migrate(db.engine)
         yield flask_app
         db.session.remove()
         db.drop_all()
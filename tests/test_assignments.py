@@ -0,0 +1,71 @@
+import pytest
+from sqlalchemy import func, insert, select
+from assignments import assign, reorder_folders, unassign
+from instrumentation import QueryCounter
+from models.models import db, Folder, Tag, Video, video_folders, video_tags
+
+
+@pytest.fixture
+def library(app):
+    db.session.execute(insert(Video), [
+        {'title': f'video {i}', 'file_path': f'/videos/{i}.mp4'} for i in range(10000)
+    ])
+    tags = [Tag(name=f'tag {i}') for i in range(3)]
+    folders = [Folder(name=f'folder {i}', position=i) for i in range(3)]
+    db.session.add_all(tags + folders)
+    db.session.commit()
+    video_ids = db.session.execute(select(Video.id)).scalars().all()
+    return video_ids, [tag.id for tag in tags], [folder.id for folder in folders]
+
+def link_count(table):
+    return db.session.execute(select(func.count()).select_from(table)).scalar()
+
+def test_assign_ten_thousand_videos_in_one_statement(library):
+    """Test tagging 10k videos with one INSERT per association table"""
+    video_ids, tag_ids, _ = library
+    with QueryCounter() as counter:
+        assert assign('tag', video_ids, tag_ids) == 30000
+    db.session.commit()
+    assert counter.count == 1
+    assert link_count(video_tags) == 30000
+
+def test_assign_skips_existing_links(library):
+    """Test reassigning only inserts links that are missing"""
+    video_ids, _, folder_ids = library
+    assign('folder', video_ids[:10], folder_ids[:1])
+    assert assign('folder', [str(video_id) for video_id in video_ids[:20]], folder_ids[:1]) == 10
+    assert link_count(video_folders) == 20
+
+def test_unassign(library):
+    """Test removing one tag from a selection leaves other links alone"""
+    video_ids, tag_ids, _ = library
+    assign('tag', video_ids[:100], tag_ids)
+    assert unassign('tag', video_ids[:50], tag_ids[:1]) == 50
+    assert link_count(video_tags) == 250
+
+def test_reorder_in_one_update(library):
+    """Test repositioning and re-parenting folders with one UPDATE"""
+    _, _, (a, b, c) = library
+    with QueryCounter() as counter:
+        reorder_folders([{'id': a, 'position': 2, 'parent_id': None},
+                         {'id': b, 'position': 0, 'parent_id': a},
+                         {'id': c, 'position': 1, 'parent_id': None}])
+    db.session.commit()
+    assert counter.count == 1
+    folders = {folder.id: folder for folder in Folder.query.all()}
+    assert [folders[i].position for i in (a, b, c)] == [2, 0, 1]
+    assert folders[b].parent_id == a and folders[b].depth == 1
+
+def test_organize_endpoint(client, library):
+    """Test bulk assign and unassign through the organize API"""
+    video_ids, tag_ids, folder_ids = library
+    response = client.post('/api/videos/organize', json={
+        'video_ids': video_ids, 'tag_ids': tag_ids[:2], 'folder_ids': folder_ids[:1]})
+    assert response.get_json() == {'status': 'success', 'changed': 30000}
+
+    response = client.post('/api/videos/organize', json={
+        'video_ids': video_ids[:5], 'tag_ids': tag_ids[:2], 'action': 'unassign'})
+    assert response.get_json()['changed'] == 10
+
+    response = client.post('/api/videos/organize', json={'video_ids': [0], 'tag_ids': tag_ids})
+    assert response.status_code == 404
@@ -0,0 +1,80 @@
+import shutil
+import subprocess
+import pytest
+import benchmarks.media as media
+from benchmarks.media import bench_library, bench_stream, compare_results, make_fixture, spread_intervals
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+
+
+def _document(**medians):
+    return {'results': {name.replace('_', '/', 1): {'median': median} for name, median in medians.items()}}
+
+def test_compare_flags_regressions_beyond_threshold():
+    """Test only slowdowns past both the relative and absolute floor are regressions"""
+    baseline = _document(render_a=1.0, render_b=1.0, library_c=0.001, stream_d=1.0, scan_e=1.0)
+    current = _document(render_a=1.3, render_b=1.1, library_c=0.002, stream_d=0.5, thumbnail_f=0.2)
+    statuses = {row[0]: row[4] for row in compare_results(baseline, current)}
+    assert statuses == {
+        'render/a': 'regression',
+        'render/b': 'ok',
+        # Doubled, but by a millisecond: noise, not a regression
+        'library/c': 'ok',
+        'stream/d': 'improvement',
+        'scan/e': 'missing',
+        'thumbnail/f': 'new',
+    }
+
+def test_spread_intervals_fit_the_source():
+    """Test benchmark segments are disjoint and inside the source"""
+    intervals = spread_intervals(30, 20)
+    assert len(intervals) == 20
+    assert all(start < end <= next_start for (start, end), (next_start, _) in zip(intervals, intervals[1:]))
+    assert intervals[-1][1] <= 30
+
+def test_library_benchmark_runs(app, tmp_path):
+    """Test the library benchmark seeds rows and times the pages"""
+    results = bench_library(app, str(tmp_path), repeat=1, sizes=(50,))
+    assert set(results) == {'library/index_50_rows', 'library/search_50_rows',
+                            'library/index_50_rows_cached', 'library/search_50_rows_cached'}
+    assert all(stats['median'] > 0 and stats['runs'] == 1 for stats in results.values())
+
+def test_library_benchmark_times_rendering_not_cache_hits(app, tmp_path, monkeypatch):
+    """Test the uncached library entries render every timed request"""
+    import routes.routes as routes_module
+    calls = []
+    get_library_page = routes_module.get_library_page
+    monkeypatch.setattr(routes_module, 'get_library_page',
+                        lambda *args, **kwargs: calls.append(1) or get_library_page(*args, **kwargs))
+    bench_library(app, str(tmp_path), repeat=2, sizes=(10,))
+    # Warm-up and both timed runs of the uncached index, then only the
+    # cached entries' warm-up misses the cache
+    assert len(calls) == 4
+
+def test_stream_benchmark_checks_ranges(app, tmp_path, monkeypatch):
+    """Test stream seeks are real 206 range reads, and fail loudly when they are not"""
+    source = tmp_path / 'sd.mp4'
+    source.write_bytes(b'v' * 300000)
+    monkeypatch.setattr(media, 'FIXTURES', {'sd': media.FIXTURES['sd']})
+    monkeypatch.setattr(media, 'make_fixture', lambda workdir, name: str(source))
+    results = bench_stream(app, str(tmp_path), repeat=1)
+    assert set(results) == {'stream/full_sd', f'stream/{media.STREAM_SEEKS}_seeks_sd'}
+
+    # A server sending the whole file from byte 0 is an error, not a timing
+    monkeypatch.setattr(app, 'process_response', lambda response: _drop_range(response))
+    with pytest.raises(RuntimeError, match='ignored Range'):
+        bench_stream(app, str(tmp_path), repeat=1)
+
+def _drop_range(response):
+    response.status_code = 200
+    del response.headers['Content-Range']
+    return response
+
+@requires_ffmpeg
+def test_fixture_is_generated_once(tmp_path):
+    """Test lavfi fixtures have video and audio and are cached"""
+    path = make_fixture(str(tmp_path), 'sd')
+    probe = subprocess.run(['ffprobe', '-v', 'error', '-show_entries', 'stream=codec_type',
+                            '-of', 'csv=p=0', path], capture_output=True, text=True)
+    assert sorted(probe.stdout.split()) == ['audio', 'video']
+    assert make_fixture(str(tmp_path), 'sd') == path
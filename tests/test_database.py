@@ -0,0 +1,89 @@
+import threading
+import pytest
+from database import WriteQueue, submit_write
+from helper import upsert_videos
+from models.models import db, Video
+
+
+def add_video(name):
+    video = Video(title=name, file_path=f'/videos/{name}.mp4')
+    db.session.add(video)
+    db.session.flush()
+    return video.id
+
+def fail():
+    raise ValueError('bad job')
+
+@pytest.fixture
+def writer(app):
+    write_queue = WriteQueue(app, batch_size=64, max_delay=0.2).start()
+    yield write_queue
+    write_queue.stop(timeout=5)
+
+def test_connections_get_configured_pragmas(app):
+    """Test every new connection runs in WAL with the tuned pragmas"""
+    with db.engine.connect() as connection:
+        pragma = lambda name: connection.exec_driver_sql(f'PRAGMA {name}').scalar()
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1
+        assert pragma('foreign_keys') == 1
+        assert pragma('busy_timeout') == app.config['SQLITE_PRAGMAS']['busy_timeout']
+        assert pragma('mmap_size') == app.config['SQLITE_PRAGMAS']['mmap_size']
+
+def test_writer_batches_queued_jobs(writer):
+    """Test that jobs submitted together are committed in one transaction"""
+    futures = [writer.submit(add_video, f'video{i}') for i in range(20)]
+    ids = [future.result(timeout=5) for future in futures]
+
+    assert len(set(ids)) == 20
+    assert writer.batches == 1
+    assert Video.query.count() == 20
+
+def test_failed_job_does_not_fail_its_batch(writer):
+    """Test a failing job only fails its own future"""
+    first = writer.submit(add_video, 'first')
+    failing = writer.submit(fail)
+    last = writer.submit(add_video, 'last')
+
+    assert first.result(timeout=5) and last.result(timeout=5)
+    with pytest.raises(ValueError):
+        failing.result(timeout=5)
+    assert {video.title for video in Video.query.all()} == {'first', 'last'}
+
+def test_submit_write_runs_inline_without_writer(app):
+    """Test writes commit in the caller when no writer thread is running"""
+    rows = [{'title': 'a', 'file_path': '/videos/a.mp4', 'fingerprint': None, 'duration': 1.5}]
+    assert submit_write(upsert_videos, rows).result() == 1
+    rows[0]['duration'] = 2.0
+    submit_write(upsert_videos, rows).result()
+    assert [(v.title, v.duration) for v in Video.query.all()] == [('a', 2.0)]
+
+def test_reads_do_not_wait_for_open_write_transaction(app):
+    """Test readers see the last commit while a long write is in progress"""
+    submit_write(add_video, 'committed').result()
+    engine = db.engine
+    writing = threading.Event()
+    finish = threading.Event()
+
+    def long_write():
+        with engine.connect() as connection:
+            connection.exec_driver_sql('BEGIN IMMEDIATE')
+            for i in range(500):
+                connection.exec_driver_sql(
+                    'INSERT INTO videos (title, file_path) VALUES (?, ?)', (f'v{i}', f'/v/{i}.mp4'))
+            writing.set()
+            finish.wait(5)
+            connection.exec_driver_sql('COMMIT')
+
+    thread = threading.Thread(target=long_write)
+    thread.start()
+    try:
+        assert writing.wait(5)
+        with engine.connect() as connection:
+            connection.exec_driver_sql('PRAGMA busy_timeout = 0')
+            assert connection.exec_driver_sql('SELECT COUNT(*) FROM videos').scalar() == 1
+            connection.exec_driver_sql(
+                f"PRAGMA busy_timeout = {app.config['SQLITE_PRAGMAS']['busy_timeout']}")
+    finally:
+        finish.set()
+        thread.join()
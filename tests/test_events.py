@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+import worker as worker_module
+from jobs import claim_job, complete_job, enqueue, fail_job, heartbeat, job_events
+from models.models import db, Job
+from worker import Worker
+
+
+def test_job_events_report_changes_once(app):
+    """Test each job state change is reported once, and only to its owner"""
+    since = datetime.now(timezone.utc)
+    ok = enqueue('echo', {}, owner='user:1').id
+    bad = enqueue('echo', {}, owner='user:1', max_attempts=1).id
+    enqueue('echo', {}, owner='user:2')
+    db.session.commit()
+    sent = {}
+
+    assert [(event, data['id']) for event, data in job_events('user:1', since, sent)] == \
+        [('progress', ok), ('progress', bad)]
+    assert job_events('user:1', since, sent) == []
+
+    claim_job('w', ['echo'])
+    heartbeat(ok, 'w', progress=40, status='Rendering')
+    events = job_events('user:1', since, sent)
+    assert events == [('progress', {'id': ok, 'kind': 'echo', 'state': 'running',
+                                    'progress': 40, 'status': 'Rendering'})]
+
+    complete_job(ok, 'w', {'clip_id': 7})
+    claim_job('w', ['echo'])
+    fail_job(bad, 'w', 'boom')
+    events = dict(job_events('user:1', since, sent))
+    assert events['complete']['result'] == {'clip_id': 7}
+    assert events['error']['error'] == 'boom'
+
+def test_stream_pushes_updates_without_polling(app, client, monkeypatch):
+    """Test an update in this process reaches an open stream at once"""
+    monkeypatch.setitem(app.config, 'EVENTS_POLL_INTERVAL', 60)
+    with client.session_transaction() as session:
+        session['job_owner'] = 'abc'
+    job_id = enqueue('echo', {}, owner='session:abc').id
+    db.session.commit()
+
+    response = client.get(f'/events?job={job_id}', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    stream = (chunk.decode() for chunk in response.response)
+    assert next(stream).startswith('retry:')
+    assert 'event: progress' in next(stream)
+
+    claim_job('w', ['echo'])
+    heartbeat(job_id, 'w', progress=50, status='Halfway')
+    assert '"progress": 50' in next(stream)
+    complete_job(job_id, 'w', {'done': True})
+    assert 'event: complete' in next(stream)
+    response.close()
+
+def test_scan_runs_as_owned_job(app, client, monkeypatch, tmp_path):
+    """Test /scan queues a job that ingests the folder in batches"""
+    for name in ('a.mp4', 'b.mp4', 'c.mkv', 'notes.txt'):
+        (tmp_path / name).write_bytes(b'')
+    with client.session_transaction() as session:
+        session['selected_folder'] = str(tmp_path)
+        session['job_owner'] = 'abc'
+    monkeypatch.setitem(app.config, 'SCAN_BATCH_SIZE', 2)
+    batches = []
+    monkeypatch.setattr(worker_module, 'ingest_video_files',
+                        lambda paths: batches.append(paths) or [(path, 'f' * 20) for path in paths])
+
+    response = client.post('/scan').get_json()
+    assert response['total'] == 3
+    assert db.session.get(Job, response['task_id']).owner == 'session:abc'
+
+    assert Worker(app, ['scan']).run_once()
+    assert [len(batch) for batch in batches] == [2, 1]
+    assert Job.query.filter_by(kind='thumbnail').count() == 2
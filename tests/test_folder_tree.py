@@ -0,0 +1,94 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from folder_tree import (delete_subtree, move_folder, ordered_tree, rebuild_folder_tree,
+                         subtree_ids, subtree_video_counts, videos_under)
+from models.models import db, Folder, Video, folder_closure, video_folders
+
+
+@pytest.fixture
+def tree(app):
+    """root > (a > a1 > a2, b), other"""
+    root = Folder(name='root', position=0)
+    a = Folder(name='a', parent=root, position=1)
+    a1 = Folder(name='a1', parent=a, position=0)
+    a2 = Folder(name='a2', parent=a1, position=0)
+    b = Folder(name='b', parent=root, position=0)
+    other = Folder(name='other', position=1)
+    db.session.add_all([root, a, a1, a2, b, other])
+    db.session.flush()
+    db.session.add_all([
+        Video(title='v1', file_path='/v1.mp4', folders=[a2]),
+        Video(title='v2', file_path='/v2.mp4', folders=[a1, b]),
+        Video(title='v3', file_path='/v3.mp4', folders=[other]),
+    ])
+    db.session.commit()
+    return {folder.name: folder.id for folder in [root, a, a1, a2, b, other]}
+
+def closure():
+    return set(db.session.execute(select(folder_closure)).all())
+
+def names(ids_select):
+    ids = db.session.execute(ids_select).scalars().all()
+    return sorted(db.session.get(Folder, folder_id).name for folder_id in ids)
+
+def test_inserts_maintain_closure_and_depth(tree):
+    """Test new folders get closure rows and depth from their parent"""
+    assert names(subtree_ids(tree['a'])) == ['a', 'a1', 'a2']
+    assert {row.name: row.depth for row in ordered_tree()} == {
+        'root': 0, 'a': 1, 'a1': 2, 'a2': 3, 'b': 1, 'other': 0}
+
+def test_tree_renders_depth_first_by_position(tree):
+    """Test the display order of the whole tree from one query"""
+    rows = ordered_tree()
+    assert [row.name for row in rows] == ['root', 'b', 'a', 'a1', 'a2', 'other']
+    assert {row.name for row in rows if row.has_children} == {'root', 'a', 'a1'}
+
+def test_move_carries_subtree(tree):
+    """Test moving a folder re-links and re-depths its whole subtree"""
+    move_folder(tree['a1'], tree['other'])
+    db.session.commit()
+    assert names(subtree_ids(tree['other'])) == ['a1', 'a2', 'other']
+    assert names(subtree_ids(tree['root'])) == ['a', 'b', 'root']
+    assert {row.name: row.depth for row in ordered_tree()}['a2'] == 2
+
+    before = closure()
+    with db.engine.begin() as connection:
+        rebuild_folder_tree(connection)
+    db.session.expire_all()
+    assert closure() == before
+
+def test_move_into_own_subtree_is_rejected(tree):
+    """Test cycles are refused by the API and by the database itself"""
+    with pytest.raises(ValueError):
+        move_folder(tree['a'], tree['a2'])
+    with pytest.raises(IntegrityError):
+        db.session.execute(Folder.__table__.update()
+                           .where(Folder.id == tree['root']).values(parent_id=tree['a1']))
+    db.session.rollback()
+
+def test_subtree_membership_queries(tree):
+    """Test counting and listing videos anywhere under a folder"""
+    counts = subtree_video_counts()
+    assert counts[tree['root']] == 2
+    assert counts[tree['a']] == 2
+    assert counts[tree['b']] == 1
+    assert len(db.session.execute(videos_under(tree['a1'])).all()) == 2
+
+def test_delete_subtree(tree):
+    """Test deleting a subtree and its memberships in one statement"""
+    assert delete_subtree(tree['a']) == 3
+    db.session.commit()
+    assert sorted(folder.name for folder in Folder.query.all()) == ['b', 'other', 'root']
+    assert {row.descendant_id for row in closure()} == {tree['root'], tree['b'], tree['other']}
+    assert db.session.execute(select(video_folders.c.folder_id)).scalars().all().count(tree['a1']) == 0
+
+def test_folder_routes(client, tree):
+    """Test the move and delete endpoints"""
+    response = client.post(f"/api/folders/{tree['b']}/move", json={'parent_id': tree['b']})
+    assert response.status_code == 400
+    response = client.post(f"/api/folders/{tree['b']}/move", json={'parent_id': None, 'position': 5})
+    assert response.get_json()['status'] == 'success'
+
+    assert client.delete(f"/api/folders/{tree['root']}").get_json()['deleted'] == 4
+    assert client.get('/api/folders/counts').get_json()['counts'] == {str(tree['b']): 1, str(tree['other']): 1}
@@ -0,0 +1,66 @@
+from fragment_cache import current_data_version
+from models.models import db, Clip, Tag, Video
+
+
+def _seed():
+    video = Video(title='Final', file_path='/videos/final.mp4')
+    video.clips = [Clip(clip_name='Opening goal', start_time='00:01', end_time='00:05',
+                        clip_path='clips/opening.mp4')]
+    db.session.add(video)
+    db.session.commit()
+    return video
+
+def _version(app):
+    with app.test_request_context():
+        return current_data_version()
+
+def test_writes_bump_data_version(app):
+    """Test inserts, updates, deletes and tag assignments each move the version"""
+    versions = [_version(app)]
+    video = _seed()
+    versions.append(_version(app))
+    video.title = 'Cup final'
+    db.session.commit()
+    versions.append(_version(app))
+    video.tags.append(Tag(name='Cup'))
+    db.session.commit()
+    versions.append(_version(app))
+    db.session.delete(video.clips[0])
+    db.session.commit()
+    versions.append(_version(app))
+
+    assert versions == sorted(set(versions))
+
+def test_unchanged_listing_is_not_modified(app, client):
+    """Test a revalidation answers 304 after a single version read"""
+    _seed()
+    first = client.get('/clips', headers={'HX-Request': 'true'})
+    etag = first.headers['ETag']
+
+    repeat = client.get('/clips', headers={'HX-Request': 'true', 'If-None-Match': etag})
+    assert repeat.status_code == 304 and repeat.headers['ETag'] == etag
+    assert repeat.headers['X-Query-Count'] == '1'
+    # The full page is a different representation from the fragment
+    assert client.get('/clips').headers['ETag'] != etag
+
+def test_fragment_cache_serves_repeat_views(app, client):
+    """Test a repeat view without a validator is served from memory"""
+    _seed()
+    first = client.get('/clips/search?q=goal')
+    repeat = client.get('/clips/search?q=goal')
+
+    assert repeat.data == first.data and b'Opening goal' in repeat.data
+    assert repeat.headers['X-Query-Count'] == '1'
+
+def test_write_invalidates_cached_listing(app, client):
+    """Test a new clip changes the ETag and shows up in the listing"""
+    video = _seed()
+    etag = client.get('/clips').headers['ETag']
+
+    db.session.add(Clip(video_id=video.id, clip_name='Late winner', start_time='01:00',
+                        end_time='01:05', clip_path='clips/winner.mp4'))
+    db.session.commit()
+
+    response = client.get('/clips', headers={'If-None-Match': etag})
+    assert response.status_code == 200 and response.headers['ETag'] != etag
+    assert b'Late winner' in response.data
@@ -0,0 +1,170 @@
+import json
+import subprocess
+import threading
+import pytest
+import worker as worker_module
+from jobs import claim_job, complete_job, enqueue, fail_job, heartbeat, job_status
+from models.models import db, Clip, Job, Video
+from worker import JOB_HANDLERS, Worker
+
+
+@pytest.fixture
+def echo_handler():
+    calls = []
+
+    def echo(payload, report):
+        report(50, 'Halfway')
+        calls.append(payload)
+        if payload.get('fail'):
+            raise RuntimeError('boom')
+        return {'echo': payload['value']}
+
+    JOB_HANDLERS['echo'] = echo
+    yield calls
+    del JOB_HANDLERS['echo']
+
+def test_claim_complete_cycle(app):
+    """Test a job is claimed once, then completed by its owner"""
+    job_id = enqueue('echo', {'value': 1}).id
+    db.session.commit()
+
+    claimed = claim_job('w1', ['echo'])
+    assert claimed == {'id': job_id, 'kind': 'echo', 'payload': {'value': 1}, 'attempts': 1}
+    assert claim_job('w2', ['echo']) is None
+
+    assert complete_job(job_id, 'w1', {'ok': True})
+    status = job_status(job_id)
+    assert status['state'] == 'succeeded' and status['result'] == {'ok': True}
+
+def test_higher_priority_claimed_first(app):
+    """Test claims follow priority, then age"""
+    low = enqueue('echo', {}).id
+    high = enqueue('echo', {}, priority=10).id
+    db.session.commit()
+
+    assert [claim_job('w', ['echo'])['id'] for _ in range(2)] == [high, low]
+
+def test_expired_lease_is_reclaimed(app):
+    """Test a job whose worker stopped heartbeating goes to another worker"""
+    job_id = enqueue('echo', {}).id
+    db.session.commit()
+    claim_job('stalled', ['echo'], lease_seconds=-1)
+
+    reclaimed = claim_job('healthy', ['echo'])
+    assert reclaimed['id'] == job_id and reclaimed['attempts'] == 2
+    # The stalled worker can no longer report on or finish the job
+    assert not heartbeat(job_id, 'stalled', progress=90)
+    assert not complete_job(job_id, 'stalled')
+    assert complete_job(job_id, 'healthy')
+
+def test_failures_retry_then_fail(app):
+    """Test a failing job is requeued until it runs out of attempts"""
+    job_id = enqueue('echo', {}, max_attempts=2).id
+    db.session.commit()
+
+    claim_job('w', ['echo'])
+    assert fail_job(job_id, 'w', 'first', retry_delay=0) == 'queued'
+    claim_job('w', ['echo'])
+    assert fail_job(job_id, 'w', 'second', retry_delay=0) == 'failed'
+    assert job_status(job_id)['error'] == 'second'
+
+def test_abandoned_last_attempt_fails(app):
+    """Test a lapsed lease on the final attempt fails the job"""
+    job_id = enqueue('echo', {}, max_attempts=1).id
+    db.session.commit()
+    claim_job('w', ['echo'], lease_seconds=-1)
+
+    assert claim_job('w2', ['echo']) is None
+    assert job_status(job_id)['state'] == 'failed'
+
+def test_concurrent_workers_never_share_a_job(app):
+    """Test racing workers each claim distinct jobs"""
+    for value in range(40):
+        enqueue('echo', {'value': value})
+    db.session.commit()
+
+    claimed = []
+    def drain(name):
+        with app.app_context():
+            while (job := claim_job(name, ['echo'])) is not None:
+                claimed.append(job['id'])
+
+    threads = [threading.Thread(target=drain, args=(f'w{i}',)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(claimed) == 40 and len(set(claimed)) == 40
+
+def test_worker_runs_handlers(app, echo_handler):
+    """Test a worker records results and retries failures"""
+    ok = enqueue('echo', {'value': 7}).id
+    bad = enqueue('echo', {'value': 0, 'fail': True}, max_attempts=1).id
+    db.session.commit()
+
+    worker = Worker(app, ['echo'])
+    assert worker.run_once() and worker.run_once()
+    assert not worker.run_once()
+
+    assert job_status(ok)['result'] == {'echo': 7}
+    assert job_status(bad)['state'] == 'failed' and job_status(bad)['error'] == 'boom'
+
+def test_clip_render_through_queue(app, client, monkeypatch, tmp_path):
+    """Test /create-clip queues a render that a worker completes"""
+    monkeypatch.chdir(tmp_path)
+    video = Video(title='Match', file_path=str(tmp_path / 'match.mp4'))
+    db.session.add(video)
+    db.session.commit()
+    monkeypatch.setattr(worker_module, 'render_clip',
+                        lambda *args, **kwargs: subprocess.CompletedProcess([], 0, '', ''))
+
+    response = client.post('/create-clip', data={
+        'video_id': str(video.id),
+        'clip_name': 'Goal',
+        'segments': json.dumps({'segments': [{'start': '00:01', 'end': '00:04'}]})
+    })
+    task_id = response.get_json()['task_id']
+    assert client.get(f'/clip-progress/{task_id}').get_json()['state'] == 'PROGRESS'
+
+    assert Worker(app, ['clip']).run_once()
+    progress = client.get(f'/clip-progress/{task_id}').get_json()
+    assert progress['state'] == 'SUCCESS'
+    assert db.session.get(Clip, progress['clip_id']).clip_name == 'Goal'
+    assert Job.query.one().attempts == 1
+
+def test_clip_batch_through_queue(app, client, monkeypatch, tmp_path):
+    """Test /create-clips queues one batch render that creates every clip"""
+    monkeypatch.chdir(tmp_path)
+    video = Video(title='Match', file_path=str(tmp_path / 'match.mp4'))
+    db.session.add(video)
+    db.session.commit()
+    passes = []
+    monkeypatch.setattr(worker_module, 'render_clips', lambda source, clips, **kwargs: passes.append(clips)
+                        or [subprocess.CompletedProcess([], 0, '', '')] * len(clips))
+
+    response = client.post('/create-clips', json={'video_id': video.id, 'clips': [
+        {'name': 'Goal', 'segments': [{'start': '00:01', 'end': '00:04'}]},
+        {'name': 'Goal', 'segments': [{'start': '01:00', 'end': '01:05'}, {'start': '02:00', 'end': '02:03'}]},
+    ]})
+    task_id = response.get_json()['task_id']
+
+    assert Worker(app, ['clip_batch']).run_once()
+    assert len(passes) == 1 and passes[0][1]['intervals'] == [(60, 65), (120, 123)]
+    clip_ids = job_status(task_id)['result']['clip_ids']
+    paths = {db.session.get(Clip, clip_id).clip_path for clip_id in clip_ids}
+    # Clips with the same name do not overwrite each other
+    assert len(paths) == 2
+    # Batches report on /events; clip progress only knows single clips
+    assert client.get(f'/clip-progress/{task_id}').status_code == 404
+
+def test_clip_batch_rejects_bad_segments(app, client):
+    """Test invalid clip definitions are refused before anything is queued"""
+    video = Video(title='Match', file_path='/videos/match.mp4')
+    db.session.add(video)
+    db.session.commit()
+
+    response = client.post('/create-clips', json={'video_id': video.id, 'clips': [
+        {'name': 'Backwards', 'segments': [{'start': '00:05', 'end': '00:01'}]}]})
+    assert response.status_code == 400
+    assert Job.query.count() == 0
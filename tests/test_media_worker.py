@@ -0,0 +1,76 @@
+import shutil
+import subprocess
+import pytest
+import media_worker
+from media_worker import parse_probe_output, probe_durations, generate_thumbnails
+from helper import format_duration
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+
+PROBE_STDERR = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from '/videos/a.mp4':
+  Metadata:
+    major_brand     : isom
+  Duration: 00:01:05.50, start: 0.000000, bitrate: 1205 kb/s
+  Stream #0:0(und): Video: h264
+Input #1, matroska,webm, from '/videos/b.mkv':
+  Duration: N/A, start: 0.000000, bitrate: N/A
+At least one output file must be specified
+"""
+
+def test_parse_probe_output_reads_every_input():
+    """Test parsing durations for several inputs from one FFmpeg run"""
+    durations = parse_probe_output(PROBE_STDERR)
+    assert durations == {0: 65.5, 1: None}
+
+def test_probe_batch_skips_unreadable_input(monkeypatch):
+    """Test that one unreadable file does not fail the rest of the batch"""
+    calls = []
+
+    def fake_run(cmd, capture_output, text):
+        inputs = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-i']
+        calls.append(inputs)
+        lines = []
+        for index, path in enumerate(inputs):
+            if path.endswith('broken.mp4'):
+                lines.append(f"{path}: Invalid data found when processing input")
+                break
+            lines.append(f"Input #{index}, mov,mp4, from '{path}':")
+            lines.append("  Duration: 00:00:02.00, start: 0.000000, bitrate: 1 kb/s")
+        return subprocess.CompletedProcess(cmd, 1, '', '\n'.join(lines))
+
+    monkeypatch.setattr(media_worker, 'av', None)
+    monkeypatch.setattr(media_worker.subprocess, 'run', fake_run)
+
+    results = probe_durations(['a.mp4', 'broken.mp4', 'c.mp4', 'd.mp4'])
+
+    assert [r['status'] for r in results] == ['success', 'error', 'success', 'success']
+    assert results[1]['error'] == 'broken.mp4: Invalid data found when processing input'
+    assert results[3]['duration'] == 2.0
+    assert calls == [['a.mp4', 'broken.mp4', 'c.mp4', 'd.mp4'], ['c.mp4', 'd.mp4']]
+
+def test_format_duration():
+    """Test formatting stored durations for the library grid"""
+    assert format_duration(65.5) == '1:05'
+    assert format_duration(None) == 'Unknown'
+
+@requires_ffmpeg
+def test_batched_thumbnails_report_per_item_results(tmp_path):
+    """Test rendering thumbnails for several files in one batch"""
+    sources = []
+    for i in range(3):
+        source = tmp_path / f'short{i}.mp4'
+        subprocess.run(['ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=2:size=320x240',
+                        str(source)], capture_output=True, check=True)
+        sources.append(source)
+    missing = tmp_path / 'missing.mp4'
+
+    items = [{'source': source, 'output': tmp_path / f'{source.stem}.jpg',
+              'timestamp_ms': 500, 'width': 160, 'fmt': 'jpg'}
+             for source in sources + [missing]]
+    results = generate_thumbnails(items)
+
+    assert [r['status'] for r in results] == ['success', 'success', 'success', 'error']
+    assert all((tmp_path / f'{source.stem}.jpg').exists() for source in sources)
+
+    durations = probe_durations(sources + [missing])
+    assert [r['status'] for r in durations] == ['success', 'success', 'success', 'error']
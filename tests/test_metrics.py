@@ -0,0 +1,81 @@
+from urllib.request import urlopen
+from jobs import enqueue
+from metrics import Counter, Histogram, REGISTRY, STREAM_BYTES
+from models.models import db, Video
+from worker import serve_metrics
+
+
+def _sample(text, line_start):
+    """Value of the first exposition line starting with `line_start`"""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+def test_histogram_exposition():
+    """Test histograms render cumulative buckets, sum and count"""
+    histogram = Histogram('test_latency_seconds', 'Test latency', ('route',), buckets=(0.1, 1))
+    try:
+        for value in (0.05, 0.5, 2):
+            histogram.observe(value, route='/a')
+        assert histogram.render() == [
+            '# HELP test_latency_seconds Test latency',
+            '# TYPE test_latency_seconds histogram',
+            'test_latency_seconds_bucket{route="/a",le="0.1"} 1',
+            'test_latency_seconds_bucket{route="/a",le="1"} 2',
+            'test_latency_seconds_bucket{route="/a",le="+Inf"} 3',
+            'test_latency_seconds_sum{route="/a"} 2.55',
+            'test_latency_seconds_count{route="/a"} 3',
+        ]
+    finally:
+        REGISTRY.remove(histogram)
+
+def test_label_values_are_escaped():
+    """Test quotes in label values cannot break the format"""
+    counter = Counter('test_total', 'Test', ('name',))
+    try:
+        counter.inc(name='say "hi"')
+        assert counter.render()[-1] == 'test_total{name="say \\"hi\\""} 1'
+    finally:
+        REGISTRY.remove(counter)
+
+def test_metrics_endpoint(app, client):
+    """Test /metrics reports route latency and queue depth"""
+    enqueue('clip', {})
+    enqueue('clip', {})
+    db.session.commit()
+    client.get('/clips')
+
+    response = client.get('/metrics')
+    text = response.get_data(as_text=True)
+    assert response.mimetype == 'text/plain'
+    assert _sample(text, 'http_request_duration_seconds_count{method="GET",route="/clips",status="200"}') >= 1
+    assert _sample(text, 'job_queue_depth{kind="clip",state="queued"}') == 2
+    assert _sample(text, 'job_queue_oldest_wait_seconds{kind="clip"}') >= 0
+    # The scrape itself is the only request in flight
+    assert _sample(text, 'http_requests_in_flight') == 1
+
+def test_worker_metrics_server_collects_queue_depth(app):
+    """Test a standalone worker's scrape runs the database collectors"""
+    enqueue('scan', {})
+    db.session.commit()
+    server = serve_metrics(app, 0)
+    try:
+        with urlopen(f'http://127.0.0.1:{server.server_address[1]}/metrics') as response:
+            text = response.read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert _sample(text, 'job_queue_depth{kind="scan",state="queued"}') == 1
+
+def test_stream_bytes_counted(app, client, tmp_path):
+    """Test bytes sent by stream_video are counted"""
+    media = tmp_path / 'match.mp4'
+    media.write_bytes(b'v' * 20000)
+    video = Video(title='Match', file_path=str(media))
+    db.session.add(video)
+    db.session.commit()
+
+    before = _sample('\n'.join(STREAM_BYTES.render()), 'stream_video_bytes_total') or 0
+    assert len(client.get(f'/stream_video/{video.id}').data) == 20000
+    assert _sample('\n'.join(STREAM_BYTES.render()), 'stream_video_bytes_total') - before == 20000
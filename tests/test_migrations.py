@@ -0,0 +1,106 @@
+from types import SimpleNamespace
+import pytest
+from sqlalchemy import create_engine
+from instrumentation import QueryCounter
+from helper import get_library_page, get_clips_page
+from migrations import MIGRATIONS, migrate
+from models.models import db, Video, Clip, Folder, Tag, TagCategory
+
+# Schema as created by releases before migrations existed
+LEGACY_SCHEMA = [
+    "CREATE TABLE videos (id INTEGER PRIMARY KEY, title VARCHAR(255) NOT NULL, "
+    "file_path VARCHAR(255) NOT NULL UNIQUE, thumbnail_path VARCHAR(255), created_at DATETIME)",
+    "CREATE TABLE clips (id INTEGER PRIMARY KEY, video_id INTEGER NOT NULL REFERENCES videos(id), "
+    "clip_name VARCHAR(255) NOT NULL, start_time VARCHAR(20) NOT NULL, end_time VARCHAR(20) NOT NULL, "
+    "clip_path VARCHAR(255) NOT NULL, thumbnail_path VARCHAR(255), created_at DATETIME)",
+    "CREATE TABLE folders (id INTEGER PRIMARY KEY, name VARCHAR(255) NOT NULL, "
+    "parent_id INTEGER REFERENCES folders(id), is_open BOOLEAN, position INTEGER, created_at DATETIME)",
+    "INSERT INTO folders (id, name, parent_id) VALUES (1, 'Top', NULL), (2, 'Middle', 1), (3, 'Bottom', 2)",
+    "INSERT INTO videos (id, title, file_path) VALUES (1, 'Old Video', '/videos/old.mp4')",
+    "INSERT INTO clips (id, video_id, clip_name, start_time, end_time, clip_path) "
+    "VALUES (1, 1, 'Legacy clip', '0', '1', '/clips/legacy.mp4')",
+]
+
+def test_migrate_upgrades_legacy_database_in_place(tmp_path):
+    """Test migrating a database created before the new columns and indexes"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+    with engine.begin() as connection:
+        for statement in LEGACY_SCHEMA:
+            connection.exec_driver_sql(statement)
+
+    assert migrate(engine) == [version for version, _, _ in MIGRATIONS]
+    assert migrate(engine) == []
+
+    with engine.connect() as connection:
+        columns = {row[1] for row in connection.exec_driver_sql("PRAGMA table_info(clips)")}
+        assert 'preview_path' in columns
+        indexes = {row[0] for row in connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert {'ix_clips_video_id_created_at_id', 'ix_folders_parent_id_position',
+                'ix_tags_category_id', 'ix_video_tags_tag_id'} <= indexes
+        assert connection.exec_driver_sql(
+            "SELECT title FROM videos").scalar() == 'Old Video'
+        assert connection.exec_driver_sql(
+            "SELECT rowid / 4 FROM search_index WHERE search_index MATCH 'legacy'").scalar() == 1
+        assert connection.exec_driver_sql(
+            "SELECT depth FROM folders WHERE id = 3").scalar() == 2
+        assert connection.exec_driver_sql(
+            "SELECT COUNT(*) FROM folder_closure WHERE ancestor_id = 1").scalar() == 3
+    engine.dispose()
+
+
+def query_plans(func):
+    """EXPLAIN QUERY PLAN every statement `func` issues"""
+    with QueryCounter() as counter:
+        func()
+    plans = []
+    with db.engine.connect() as connection:
+        for statement, _ in counter.statements:
+            params = (1,) * statement.count('?')
+            rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", params)
+            plans.append('\n'.join(row[3] for row in rows))
+    return '\n'.join(plans)
+
+@pytest.fixture
+def organized(app):
+    category = TagCategory(name='Places')
+    parent = Folder(name='Trips')
+    video = Video(title='Trip', file_path='/videos/trip.mp4')
+    db.session.add_all([category, parent, video,
+                        Tag(name='beach', category=category, videos=[video]),
+                        Folder(name='Summer', parent=parent)])
+    db.session.commit()
+    return category, parent, video
+
+@pytest.mark.parametrize('name, call, index', [
+    ('library first page', lambda: get_library_page(), 'SCAN videos USING INDEX ix_videos_title_id'),
+    ('library next page', lambda: get_library_page(cursor='WyJtIiwgNV0'),
+     'SEARCH videos USING INDEX ix_videos_title_id'),
+    ('library clip counts', lambda: get_library_page(),
+     'USING COVERING INDEX ix_clips_video_id_created_at_id (video_id=?)'),
+    ('clips newest first', lambda: get_clips_page(), 'USING INDEX ix_clips_created_at_id'),
+    ('clips of a video', lambda: get_clips_page(video_id=1),
+     'USING INDEX ix_clips_video_id_created_at_id (video_id=?)'),
+])
+def test_listing_queries_use_indexes(app, name, call, index):
+    """Test the hot listing queries are served by their indexes"""
+    plan = query_plans(call)
+    assert index in plan, plan
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in plan, plan
+
+def test_organize_lookups_use_indexes(organized):
+    """Test folder children, category tags and tagged videos use indexes"""
+    category, parent, video = organized
+    tag = category.tags[0]
+    db.session.expire_all()
+
+    plan = query_plans(lambda: (parent.children, category.tags, tag.videos))
+    assert 'ix_folders_parent_id_position (parent_id=?)' in plan, plan
+    assert 'ix_tags_category_id (category_id=?)' in plan, plan
+    assert 'ix_video_tags_tag_id (tag_id=?)' in plan, plan
+
+def test_migrate_refuses_other_databases():
+    """Test a non-SQLite database fails at startup with a clear error, not mid-migration"""
+    engine = SimpleNamespace(dialect=SimpleNamespace(name='postgresql'))
+    with pytest.raises(RuntimeError, match='requires SQLite'):
+        migrate(engine)
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from models.models import Video, Clip, db
+from pagination import encode_cursor, decode_cursor, keyset_page
+
+def _add_videos(titles):
+    for i, title in enumerate(titles):
+        db.session.add(Video(title=title, file_path=f'/videos/{i}.mp4'))
+    db.session.commit()
+
+def test_cursor_round_trip():
+    """Test that cursors decode back to typed sort keys"""
+    created = datetime(2024, 5, 1, 12, 30)
+    cursor = encode_cursor([created, 42])
+    assert decode_cursor(cursor, [Clip.created_at, Clip.id]) == [created, 42]
+
+def test_invalid_cursor_starts_from_first_page():
+    """Test that malformed cursors are ignored"""
+    assert decode_cursor('not-a-cursor', [Video.title, Video.id]) is None
+    assert decode_cursor(encode_cursor([1]), [Video.title, Video.id]) is None
+
+def test_keyset_pages_cover_every_row_once(app):
+    """Test walking the library page by page, including duplicate titles"""
+    with app.app_context():
+        _add_videos(['b', 'a', 'c', 'a', 'd', 'b', 'e'])
+
+        seen = []
+        cursor = None
+        while True:
+            rows, cursor = keyset_page(Video.query, [Video.title, Video.id], cursor, limit=3)
+            seen.extend((video.title, video.id) for video in rows)
+            if cursor is None:
+                break
+
+        assert seen == sorted(seen)
+        assert len(seen) == len(set(seen)) == 7
+
+def test_clip_pages_newest_first(app, client, monkeypatch):
+    """Test the clip list fragment endpoint returns the next page"""
+    with app.app_context():
+        video = Video(title='Game', file_path='/videos/game.mp4')
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        for i in range(5):
+            video.clips.append(Clip(clip_name=f'Clip {i}', start_time='00:00', end_time='00:05',
+                                    clip_path=f'clips/{i}.mp4', created_at=start + timedelta(minutes=i)))
+        db.session.add(video)
+        db.session.commit()
+
+    monkeypatch.setitem(app.config, 'CLIPS_PAGE_SIZE', 2)
+    first = client.get('/clips', headers={'HX-Request': 'true'}).get_data(as_text=True)
+    assert 'Clip 4' in first and 'Clip 3' in first and 'Clip 2' not in first
+    assert 'hx-trigger="revealed"' in first
+
+    cursor = first.split('/clips/page?cursor=')[1].split('"')[0].split('&')[0]
+    second = client.get(f'/clips/page?cursor={cursor}').get_data(as_text=True)
+    assert 'Clip 2' in second and 'Clip 1' in second and 'Clip 4' not in second
+
+def test_library_page_endpoint(app, client, monkeypatch):
+    """Test that the library fragment endpoint continues after the cursor"""
+    monkeypatch.setitem(app.config, 'LIBRARY_PAGE_SIZE', 2)
+    with app.app_context():
+        _add_videos(['Alpha', 'Bravo', 'Charlie'])
+
+    first = client.get('/').get_data(as_text=True)
+    assert 'Alpha' in first and 'Bravo' in first and 'Charlie' not in first
+
+    cursor = first.split('/videos/page?cursor=')[1].split('"')[0]
+    second = client.get(f'/videos/page?cursor={cursor}').get_data(as_text=True)
+    assert 'Charlie' in second and 'Alpha' not in second
+    assert 'hx-trigger="revealed"' not in second
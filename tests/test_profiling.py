@@ -0,0 +1,62 @@
+import json
+import pytest
+from models.models import db, User
+from profiling import list_profile_names
+
+
+@pytest.fixture
+def profiling(app, tmp_path, test_user):
+    """Profiles saved to a temporary directory, with `testuser` as an admin"""
+    saved = {key: app.config[key] for key in ('PROFILE_DIR', 'PROFILE_MAX_FILES', 'PROFILING_ADMINS', 'PROFILING_SAMPLE_RATE')}
+    app.config.update(PROFILE_DIR=str(tmp_path), PROFILING_ADMINS=['testuser'], PROFILING_SAMPLE_RATE=0)
+    db.session.add(test_user)
+    db.session.commit()
+    yield tmp_path
+    app.config.update(saved)
+
+def _log_in(client, user_id):
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+def test_admin_header_saves_profile(app, client, profiling, test_user):
+    """Test an admin's X-Profile header saves CPU stats and the request's SQL"""
+    _log_in(client, test_user.id)
+    response = client.get('/clips', headers={'X-Profile': '1'})
+    name = response.headers['X-Profile-Id']
+
+    profile = json.loads((profiling / f'{name}.json').read_text())
+    assert profile['path'] == '/clips' and profile['trigger'] == 'admin'
+    assert profile['sql_count'] == len(profile['sql']) > 0
+    assert 'cumulative' in profile['report']
+    assert (profiling / f'{name}.prof').exists()
+
+    assert name in client.get('/_profiles').get_data(as_text=True)
+    assert 'SELECT' in client.get(f'/_profiles/{name}').get_data(as_text=True)
+    assert client.get(f'/_profiles/{name}.prof').status_code == 200
+
+def test_non_admin_cannot_profile(app, client, profiling):
+    """Test the trigger and the profile pages are ignored for anyone else"""
+    other = User(username='viewer', email='viewer@example.com', password_hash='x')
+    db.session.add(other)
+    db.session.commit()
+    _log_in(client, other.id)
+
+    response = client.get('/clips?_profile=1')
+    assert 'X-Profile-Id' not in response.headers
+    assert list_profile_names(str(profiling)) == []
+    assert client.get('/_profiles').status_code == 404
+
+def test_sampling_profiles_anonymous_requests(app, client, profiling):
+    """Test a sample rate profiles requests without any trigger"""
+    app.config['PROFILING_SAMPLE_RATE'] = 1.0
+    response = client.get('/clips')
+    name = response.headers['X-Profile-Id']
+    assert json.loads((profiling / f'{name}.json').read_text())['trigger'] == 'sample'
+
+def test_profiles_rotate(app, client, profiling):
+    """Test only the newest PROFILE_MAX_FILES profiles are kept"""
+    app.config.update(PROFILING_SAMPLE_RATE=1.0, PROFILE_MAX_FILES=2)
+    names = [client.get('/clips').headers['X-Profile-Id'] for _ in range(4)]
+
+    assert sorted(list_profile_names(str(profiling))) == sorted(names)[-2:]
+    assert len(list(profiling.glob('*.prof'))) == 2
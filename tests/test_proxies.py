@@ -0,0 +1,124 @@
+import json
+import shutil
+import subprocess
+import pytest
+import worker as worker_module
+from models.models import db, Job, StorageArtifact, Video
+from proxies import find_proxy, proxy_command, proxy_path, render_proxy
+from worker import Worker
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+
+FINGERPRINT = 'ab' * 10
+
+
+@pytest.fixture
+def proxy_dir(app, tmp_path):
+    app.config['PROXY_DIR'] = str(tmp_path / 'proxies')
+    return tmp_path / 'proxies'
+
+def _video(tmp_path, content=b'o' * 5000):
+    media = tmp_path / 'match.mp4'
+    media.write_bytes(content)
+    video = Video(title='Match', file_path=str(media), fingerprint=FINGERPRINT)
+    db.session.add(video)
+    db.session.commit()
+    return video
+
+def test_proxy_command_is_all_intra_and_small():
+    """Test every proxy frame is a keyframe and sources are never scaled up"""
+    cmd = proxy_command('in.mp4', 'out.mp4', height=540, gop=1)
+    assert cmd[cmd.index('-g') + 1] == '1' and cmd[cmd.index('-keyint_min') + 1] == '1'
+    assert cmd[cmd.index('-vf') + 1] == "scale=-2:'min(540,ih)'"
+    assert '+faststart' in cmd and cmd[-1] == 'out.mp4'
+
+def test_stream_video_serves_ranges(app, client, tmp_path):
+    """Test a Range request gets just those bytes"""
+    video = _video(tmp_path, bytes(range(256)) * 20)
+    response = client.get(f'/stream_video/{video.id}', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.data == (bytes(range(256)) * 20)[100:200]
+    assert response.headers['Content-Range'] == 'bytes 100-199/5120'
+
+def test_stream_video_serves_proxy_when_asked(app, client, tmp_path, proxy_dir):
+    """Test ?proxy=1 plays the proxy once rendered, and the original until then"""
+    video = _video(tmp_path)
+    assert client.get(f'/stream_video/{video.id}?proxy=1').data == b'o' * 5000
+
+    path = proxy_path(proxy_dir, FINGERPRINT, app.config['PROXY_HEIGHT'])
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b'p' * 100)
+    assert client.get(f'/stream_video/{video.id}?proxy=1').data == b'p' * 100
+    assert client.get(f'/stream_video/{video.id}').data == b'o' * 5000
+
+def test_editor_queues_proxy_once_then_plays_it(app, client, tmp_path, proxy_dir):
+    """Test opening the editor queues one proxy job, and uses the proxy when it exists"""
+    video = _video(tmp_path)
+    for _ in range(2):
+        response = client.get(f'/edit-video/{video.id}')
+        assert f'/stream_video/{video.id}"' in response.get_data(as_text=True)
+    job = Job.query.filter_by(kind='proxy').one()
+    assert json.loads(job.payload)['sources'] == [[video.file_path, FINGERPRINT]]
+
+    path = proxy_path(proxy_dir, FINGERPRINT, app.config['PROXY_HEIGHT'])
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b'p')
+    assert f'/stream_video/{video.id}?proxy=1"' in client.get(f'/edit-video/{video.id}').get_data(as_text=True)
+
+def test_proxy_job_renders_missing_proxies(app, tmp_path, proxy_dir, monkeypatch):
+    """Test the proxy job renders each missing proxy and records it for the storage quota"""
+    video = _video(tmp_path)
+    rendered = []
+
+    def fake_render(source, output, height, gop):
+        rendered.append(source)
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_bytes(b'p' * 10)
+        return True
+    monkeypatch.setattr(worker_module, 'render_proxy', fake_render)
+
+    payload = {'root': str(proxy_dir), 'height': 540, 'gop': 1,
+               'sources': [[video.file_path, FINGERPRINT], [video.file_path, FINGERPRINT]]}
+    assert worker_module.render_proxies_job(payload, lambda *args: None) == \
+        {'rendered': 1, 'failed': 0, 'skipped': 1}
+    assert StorageArtifact.query.filter_by(kind='proxy').one().size_bytes == 10
+
+    # Already rendered proxies are skipped
+    db.session.add(Job(kind='proxy', payload=json.dumps(payload), state='queued'))
+    db.session.commit()
+    assert Worker(app, ['proxy']).run_once()
+    assert len(rendered) == 1
+    assert find_proxy(str(proxy_dir), FINGERPRINT, 540) is not None
+
+def test_failed_proxies_are_not_queued_again(app, client, tmp_path, proxy_dir, monkeypatch):
+    """Test a source whose proxy fails to render is remembered and skipped"""
+    video = _video(tmp_path)
+    rendered = []
+    monkeypatch.setattr(worker_module, 'render_proxy', lambda source, *args: rendered.append(source) or False)
+
+    client.get(f'/edit-video/{video.id}')
+    assert Worker(app, ['proxy']).run_once()
+    assert json.loads(Job.query.filter_by(kind='proxy').one().result)['failed'] == 1
+
+    # Neither the editor nor a later scan renders it again
+    client.get(f'/edit-video/{video.id}')
+    assert Job.query.filter_by(kind='proxy').count() == 1
+    payload = {'root': str(proxy_dir), 'height': 540, 'gop': 1, 'sources': [[video.file_path, FINGERPRINT]]}
+    assert worker_module.render_proxies_job(payload, lambda *args: None) == \
+        {'rendered': 0, 'failed': 0, 'skipped': 1}
+    assert len(rendered) == 1
+
+@requires_ffmpeg
+def test_render_proxy(tmp_path):
+    """Test a real proxy is scaled down and every frame is a keyframe"""
+    source = tmp_path / 'source.mp4'
+    subprocess.run(['ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=1:size=1280x720:rate=10',
+                    '-c:v', 'libx264', '-g', '30', str(source)], capture_output=True, check=True)
+    output = tmp_path / 'proxy.mp4'
+    assert render_proxy(source, output, height=360)
+
+    def probe(entries):
+        return subprocess.run(['ffprobe', '-v', 'error', '-select_streams', 'v:0', '-show_entries', entries,
+                               '-of', 'csv=p=0', str(output)], capture_output=True, text=True).stdout.split()
+    assert probe('stream=height') == ['360']
+    assert all('K' in flags for flags in probe('packet=flags'))
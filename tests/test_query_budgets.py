@@ -0,0 +1,54 @@
+import pytest
+from models.models import Video, Clip, Folder, Tag, TagCategory, db
+
+# Maximum queries each endpoint may issue, regardless of library size. Cached
+# listings also read the data version once (a repeat view costs only that).
+QUERY_BUDGETS = {
+    '/': 2,
+    '/clips': 2,
+    '/clips/search?q=Clip': 2,
+    '/clips/page': 2,
+    '/videos/page': 2,
+    '/organize': 7,
+    '/organize/videos?filter={"tags":{"not":1}}': 5,
+}
+
+def _seed_library(n_videos):
+    category = TagCategory(name='Teams')
+    tags = [Tag(name=f'Tag {i}', category=category if i % 2 else None) for i in range(4)]
+    parent = Folder(name='Season', position=0)
+    child = Folder(name='Week 1', parent=parent, position=1)
+    db.session.add_all(tags + [category, parent, child])
+
+    for i in range(n_videos):
+        video = Video(title=f'Game {i}', file_path=f'/videos/game{i}.mp4',
+                      fingerprint=f'{i:020x}', duration=60.0)
+        video.tags = tags[:2]
+        video.folders = [child]
+        for j in range(3):
+            video.clips.append(Clip(clip_name=f'Clip {i}-{j}', start_time='00:00',
+                                    end_time='00:05', clip_path=f'clips/{i}/{j}.mp4'))
+        db.session.add(video)
+    db.session.commit()
+
+@pytest.mark.parametrize('n_videos', [3, 40])
+@pytest.mark.parametrize('url', list(QUERY_BUDGETS))
+def test_endpoint_query_budget(app, client, url, n_videos):
+    """Test that listing endpoints stay within a fixed query budget"""
+    with app.app_context():
+        _seed_library(n_videos)
+
+    response = client.get(url)
+
+    assert response.status_code == 200
+    query_count = int(response.headers['X-Query-Count'])
+    assert query_count <= QUERY_BUDGETS[url], \
+        f"{url} issued {query_count} queries (budget {QUERY_BUDGETS[url]})"
+
+def test_library_shows_clip_counts(app, client):
+    """Test that the aggregated clip counts reach the library grid"""
+    with app.app_context():
+        _seed_library(2)
+
+    response = client.get('/')
+    assert b'bi-scissors me-1"></i>3' in response.data
@@ -0,0 +1,107 @@
+import shutil
+import subprocess
+import pytest
+from render import (build_batch_command, build_batch_filter, build_clip_filter, build_clip_command,
+                    build_thumbnail_command, chunk_clips, render_clip, render_clips)
+
+requires_ffmpeg = pytest.mark.skipif(shutil.which('ffmpeg') is None, reason='ffmpeg not installed')
+
+def test_filter_without_thumbnails_has_no_split():
+    """Test the plain cut-and-join filter graph"""
+    graph = build_clip_filter([(0, 5), (10, 12)])
+    assert 'split' not in graph
+    assert '[v0][v1]concat=n=2:v=1[outv]' in graph
+    assert '[a0][a1]concat=n=2:v=0:a=1[outa]' in graph
+
+def test_filter_splits_joined_video_for_poster_and_preview():
+    """Test that poster and preview branch off the same decoded video"""
+    graph = build_clip_filter([(0, 5)], poster_width=320, preview_seconds=3)
+    assert 'concat=n=1:v=1,split=3[outv][postersrc][previewsrc]' in graph
+    assert '[postersrc]trim=start=1.0,trim=end_frame=1,scale=320:-2[poster]' in graph
+    assert '[previewsrc]trim=duration=3' in graph
+
+def test_poster_offset_stays_inside_short_clips():
+    """Test that the poster frame is taken inside very short clips"""
+    graph = build_clip_filter([(2, 3)], poster_width=160)
+    assert 'trim=start=0.5,' in graph
+
+def test_clip_command_is_a_single_invocation():
+    """Test that one FFmpeg command writes the clip, poster and preview"""
+    cmd = build_clip_command('in.mp4', [(0, 5)], 'out.mp4',
+                             poster_path='poster.webp', preview_path='preview.webp')
+    assert cmd.count('-i') == 1
+    assert cmd[-1] == 'preview.webp'
+    assert 'poster.webp' in cmd
+    assert cmd[cmd.index('poster.webp') - 1] == '-y'
+    assert '[poster]' in cmd and '[preview]' in cmd
+
+def test_thumbnail_command_renders_from_the_clip():
+    """Test an evicted poster alone is re-rendered from the clip file"""
+    cmd = build_thumbnail_command('clip.mp4', 0.5, poster_path='poster.webp')
+    graph = cmd[cmd.index('-filter_complex') + 1]
+    assert graph == '[0:v]split=1[postersrc];[postersrc]trim=start=0.25,trim=end_frame=1,scale=320:-2[poster]'
+    assert cmd[-1] == 'poster.webp' and '[preview]' not in cmd
+
+def test_batch_filter_decodes_source_once():
+    """Test a batch fans one decode out to every clip's segments"""
+    clips = [{'intervals': [(0, 2), (5, 6)], 'poster_path': 'p0.webp'},
+             {'intervals': [(10, 12)]}]
+    graph = build_batch_filter(clips, poster_width=320)
+    assert graph.count('[0:v]') == 1 and graph.count('[0:a]') == 1
+    assert graph.startswith('[0:v]split=3[sv0][sv1][sv2];[0:a]asplit=3[sa0][sa1][sa2];')
+    assert '[sv2]trim=start=10:duration=2,setpts=PTS-STARTPTS[c1v0]' in graph
+    assert '[c0v0][c0v1]concat=n=2:v=1,split=2[c0outv][c0postersrc]' in graph
+    assert '[c1v0]concat=n=1:v=1[c1outv]' in graph
+
+def test_batch_command_writes_every_clip():
+    """Test one FFmpeg invocation maps each clip's outputs to its files"""
+    cmd = build_batch_command('in.mp4', [
+        {'intervals': [(0, 1)], 'output_path': 'a.mp4', 'poster_path': 'a.webp'},
+        {'intervals': [(2, 3)], 'output_path': 'b.mp4'},
+    ])
+    assert cmd.count('-i') == 1
+    output = cmd.index('a.mp4')
+    assert cmd[output - 9:output + 1] == ['-map', '[c0outv]', '-map', '[c0outa]', '-c:v', 'libx264',
+                                          '-c:a', 'aac', '-y', 'a.mp4']
+    assert '[c0poster]' in cmd and '[c1outv]' in cmd and cmd[-1] == 'b.mp4'
+
+def test_chunk_clips_limits_passes():
+    """Test large batches split by clip count and by total segments"""
+    clips = [{'intervals': [(0, 1)] * count} for count in (3, 3, 3, 1, 1)]
+    assert [len(group) for group in chunk_clips(clips, max_clips=4, max_segments=6)] == [2, 3]
+    assert [len(group) for group in chunk_clips(clips, max_clips=2, max_segments=64)] == [2, 2, 1]
+
+@requires_ffmpeg
+def test_render_clip_writes_all_outputs(tmp_path):
+    """Test rendering a clip with its thumbnails from a synthetic source"""
+    source = tmp_path / 'source.mp4'
+    subprocess.run([
+        'ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=6:size=320x240:rate=25',
+        '-f', 'lavfi', '-i', 'sine=duration=6', '-shortest', str(source)
+    ], capture_output=True, check=True)
+
+    output = tmp_path / 'clip.mp4'
+    poster = tmp_path / 'poster.jpg'
+    preview = tmp_path / 'preview.webp'
+    result = render_clip(str(source), [(0, 2), (3, 5)], str(output),
+                         poster_path=str(poster), preview_path=str(preview))
+
+    assert result.returncode == 0, result.stderr
+    assert output.exists() and poster.exists()
+
+@requires_ffmpeg
+def test_render_clips_in_one_pass(tmp_path):
+    """Test a batch renders every clip from a synthetic source"""
+    source = tmp_path / 'source.mp4'
+    subprocess.run([
+        'ffmpeg', '-y', '-f', 'lavfi', '-i', 'testsrc=duration=6:size=320x240:rate=25',
+        '-f', 'lavfi', '-i', 'sine=duration=6', '-shortest', str(source)
+    ], capture_output=True, check=True)
+
+    clips = [{'intervals': [(0, 1), (2, 3)], 'output_path': str(tmp_path / 'a.mp4'),
+              'poster_path': str(tmp_path / 'a.jpg')},
+             {'intervals': [(4, 5)], 'output_path': str(tmp_path / 'b.mp4')}]
+    results = render_clips(str(source), clips)
+
+    assert all(result.returncode == 0 for result in results), results[0].stderr
+    assert (tmp_path / 'a.mp4').exists() and (tmp_path / 'a.jpg').exists() and (tmp_path / 'b.mp4').exists()
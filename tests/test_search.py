@@ -0,0 +1,89 @@
+import pytest
+from models.models import db, Video, Clip, Tag, Folder
+from search import build_match_query, search_all, rebuild_search_index
+
+
+def make_clip(video, name):
+    return Clip(video=video, clip_name=name, start_time='0', end_time='1', clip_path=f'/clips/{name}.mp4')
+
+@pytest.fixture
+def library(app):
+    video = Video(title='Holiday Footage', file_path='/videos/holiday.mp4')
+    db.session.add_all([
+        video,
+        make_clip(video, 'Beach sunset'),
+        make_clip(video, 'Sunrise over the bay'),
+        make_clip(video, 'Café <b>interview</b>'),
+        Tag(name='sunny'),
+        Folder(name='Summer trips'),
+    ])
+    db.session.commit()
+    return video
+
+def test_match_query_prefixes_every_word():
+    """Test building an FTS query from raw user input"""
+    assert build_match_query('sun  be') == '"sun"* "be"*'
+    assert build_match_query('"AND" OR (') == '"AND"* "OR"*'
+    assert build_match_query('!!!') == ''
+
+def test_search_spans_all_kinds_with_prefixes(library):
+    """Test that one query matches clips, tags and folders by prefix"""
+    results = search_all('sun')
+    assert {(r['kind'], r['name']) for r in results} == {
+        ('clip', 'Beach sunset'), ('clip', 'Sunrise over the bay'), ('tag', 'sunny')
+    }
+    assert {r['kind'] for r in search_all('su')} == {'clip', 'tag', 'folder'}
+    assert [r['kind'] for r in search_all('holiday')] == ['video']
+
+def test_search_filters_by_kind_and_ranks(library):
+    """Test restricting results to one kind and ranking closer matches first"""
+    db.session.add(make_clip(library, 'Sunset sunset sunset'))
+    db.session.commit()
+    results = search_all('sunset', kinds=['clip'])
+    assert [r['name'] for r in results] == ['Sunset sunset sunset', 'Beach sunset']
+
+def test_index_follows_renames_and_deletes(library):
+    """Test that triggers keep the index in sync with the source tables"""
+    clip = Clip.query.filter_by(clip_name='Beach sunset').one()
+    clip.clip_name = 'Harbour lights'
+    db.session.commit()
+    assert search_all('beach') == []
+    assert search_all('harbour')[0]['id'] == clip.id
+
+    db.session.delete(clip)
+    db.session.commit()
+    assert search_all('harbour') == []
+
+def test_snippets_escape_names_and_mark_matches(library):
+    """Test highlighted snippets never pass user HTML through"""
+    snippet = search_all('cafe')[0]['snippet']
+    assert str(snippet) == '<mark>Café</mark> &lt;b&gt;interview&lt;/b&gt;'
+
+def test_rebuild_restores_index(app, library):
+    """Test re-indexing rows that were written while the index was missing"""
+    with db.engine.begin() as connection:
+        connection.exec_driver_sql('DELETE FROM search_index')
+        rebuild_search_index(connection)
+    assert len(search_all('sun')) == 3
+
+def test_search_endpoint(client, library):
+    """Test the unified search endpoint as JSON and as an HTMX fragment"""
+    data = client.get('/search?q=sun&kind=tag').get_json()
+    assert data['status'] == 'success'
+    assert [(r['kind'], r['snippet']) for r in data['results']] == [('tag', '<mark>sunny</mark>')]
+
+    html = client.get('/search?q=holi', headers={'HX-Request': 'true'}).get_data(as_text=True)
+    assert '<mark>Holiday</mark> Footage' in html
+    assert f'/edit-video/{library.id}' in html
+
+def test_search_endpoint_clamps_limit(client, library):
+    """Test zero and negative limits still return a bounded page"""
+    for limit in (0, -1):
+        assert len(client.get(f'/search?q=sun&limit={limit}').get_json()['results']) == 1
+    assert len(client.get('/search?q=sun&limit=1000').get_json()['results']) == 3
+
+def test_clip_list_search_uses_index(client, library):
+    """Test the clips page search box matches word prefixes"""
+    html = client.get('/clips/search?q=sun').get_data(as_text=True)
+    assert 'Beach sunset' in html and 'Sunrise over the bay' in html
+    assert 'Café' not in html
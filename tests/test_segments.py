@@ -0,0 +1,159 @@
+import io
+import json
+import subprocess
+import pytest
+import worker as worker_module
+from media_worker import parse_keyframes
+from models.models import db, Clip, ClipSegment, Job, Video
+from segments import (export_segments, format_time, import_segments, normalize_segments,
+                      parse_fps, parse_time, snap_to_keyframes, to_segment_dicts)
+from worker import Worker
+
+
+def test_parse_and_format_time():
+    """Test every accepted time format, and the editor's MM:SS output"""
+    assert parse_time(90) == 90.0
+    assert parse_time('90') == 90.0
+    assert parse_time('01:30') == 90.0
+    assert parse_time('01:01:30.5') == 3690.5
+    for bad in ('', 'abc', '-1', '1:2:3:4', None, True):
+        with pytest.raises(ValueError):
+            parse_time(bad)
+    assert format_time(90) == '01:30'
+    assert format_time(90.25) == '01:30.250'
+    assert format_time(3690) == '61:30'
+
+def test_normalize_sorts_and_merges():
+    """Test overlapping, duplicate and touching segments become one interval"""
+    segments = [
+        {'start': '00:20', 'end': '00:30', 'label': 'Late'},
+        {'start': '00:00', 'end': '00:05', 'label': 'Intro'},
+        {'start': '00:03', 'end': '00:08'},
+        {'start': '00:03', 'end': '00:08'},
+        {'start': '00:08', 'end': '00:10'},
+    ]
+    assert normalize_segments(segments) == [(0, 10, 'Intro'), (20, 30, 'Late')]
+    # Gaps up to merge_gap are bridged too
+    assert normalize_segments(segments, merge_gap=10) == [(0, 30, 'Intro')]
+
+def test_normalize_clamps_and_rejects():
+    """Test segments are clamped to the duration, and bad ones are named in the error"""
+    assert normalize_segments([{'start': '00:50', 'end': '02:00'}], duration=60) == [(50, 60, None)]
+    with pytest.raises(ValueError, match='Segment 2'):
+        normalize_segments([{'start': '00:01', 'end': '00:02'}, {'start': '00:05', 'end': '00:01'}])
+    with pytest.raises(ValueError, match='Segment 1'):
+        normalize_segments([{'start': '00:01'}])
+    # Entirely past the end of the video
+    with pytest.raises(ValueError):
+        normalize_segments([{'start': '02:00', 'end': '03:00'}], duration=60)
+
+def test_snap_to_keyframes():
+    """Test starts move back to the previous keyframe and re-merge"""
+    keyframes = [0.0, 2.0, 4.0, 6.0]
+    intervals = [(2.5, 3.0, 'A'), (3.5, 5.0, 'B'), (6.0, 7.0, None)]
+    assert snap_to_keyframes(intervals, keyframes) == [(2.0, 5.0, 'A'), (6.0, 7.0, None)]
+    assert snap_to_keyframes(intervals, []) == intervals
+
+def test_parse_keyframes():
+    """Test only keyframe packets are kept from ffprobe output"""
+    output = '0.000000,K__\n0.033333,___\n2.002000,K__\nN/A,K__\n'
+    assert parse_keyframes(output) == [0.0, 2.002]
+
+@pytest.mark.parametrize('fmt', ['json', 'csv', 'edl'])
+def test_export_import_round_trip(fmt):
+    """Test each format reads back the intervals it wrote"""
+    intervals = [(1.0, 4.5, 'Goal'), (60.0, 65.0, None)]
+    text = export_segments(intervals, fmt, fps=30)
+    assert normalize_segments(import_segments(text, fmt, fps=30)) == intervals
+
+def test_import_external_formats():
+    """Test CSV with extra columns and an EDL with clip names and record times"""
+    csv_text = 'Start,End,Label,Camera\n00:10,00:12,Shot,A\n,,,\n00:01,00:02,,B\n'
+    assert to_segment_dicts(normalize_segments(import_segments(csv_text, 'csv'))) == [
+        {'start': '00:01', 'end': '00:02'},
+        {'start': '00:10', 'end': '00:12', 'label': 'Shot'},
+    ]
+    edl = ('TITLE: Logged\nFCM: NON-DROP FRAME\n\n'
+           '001  TAPE1    V     C        00:00:10:00 00:00:12:15 01:00:00:00 01:00:02:15\n'
+           '* FROM CLIP NAME: Kickoff\n')
+    assert import_segments(edl, 'edl', fps=30) == [{'start': 10.0, 'end': 12.5, 'label': 'Kickoff'}]
+    with pytest.raises(ValueError):
+        import_segments('start,stop\n1,2\n', 'csv')
+    with pytest.raises(ValueError):
+        import_segments('{"clips": []}', 'json')
+
+def test_parse_fps():
+    """Test frame rates must be whole numbers in range"""
+    assert parse_fps(None) == parse_fps('') == 30
+    assert parse_fps('25') == parse_fps(25) == 25
+    for bad in (0, -1, '0', 'abc', 29.97, '29.97', True, 241, [30]):
+        with pytest.raises(ValueError):
+            parse_fps(bad)
+
+def test_import_endpoint(app, client):
+    """Test an uploaded list is merged and clamped to the video"""
+    video = Video(title='Match', file_path='/videos/match.mp4', duration=100)
+    db.session.add(video)
+    db.session.commit()
+
+    upload = io.BytesIO(b'start,end\n01:30,02:00\n00:10,00:20\n00:15,00:25\n')
+    response = client.post('/segments/import', data={'file': (upload, 'log.csv'), 'video_id': video.id},
+                           content_type='multipart/form-data')
+    data = response.get_json()
+    assert data['segments'] == [{'start': '00:10', 'end': '00:25'}, {'start': '01:30', 'end': '01:40'}]
+    assert data['imported'] == 3 and data['merged'] == 1
+
+    response = client.post('/segments/import', data={'text': '[{"start": "00:05"}]', 'format': 'json'})
+    assert response.status_code == 400 and 'Segment 1' in response.get_json()['message']
+
+def test_endpoints_reject_bad_fps(app, client):
+    """Test a zero or non-numeric fps is a 400, not a server error"""
+    video = Video(title='Match', file_path='/videos/match.mp4')
+    clip = Clip(video=video, clip_name='Goal', start_time='00:01', end_time='00:05', clip_path='clips/1/goal.mp4',
+                segments=[ClipSegment(start_time='00:01', end_time='00:05')])
+    db.session.add(clip)
+    db.session.commit()
+
+    edl = '001  AX V C 00:00:01:00 00:00:02:00 00:00:00:00 00:00:01:00\n'
+    assert client.post('/segments/import', data={'text': edl, 'format': 'edl', 'fps': '0'}).status_code == 400
+    assert client.post('/segments/export', json={'segments': [{'start': '00:01', 'end': '00:02'}],
+                                                 'format': 'edl', 'fps': 'abc'}).status_code == 400
+    assert client.get(f'/clips/{clip.id}/segments.edl?fps=0').status_code == 400
+
+def test_clip_segments_export(app, client):
+    """Test a clip's segments download as an EDL"""
+    video = Video(title='Match', file_path='/videos/match.mp4')
+    clip = Clip(video=video, clip_name='Goal', start_time='00:01', end_time='00:05', clip_path='clips/1/goal.mp4',
+                segments=[ClipSegment(start_time='00:01', end_time='00:05')])
+    db.session.add(clip)
+    db.session.commit()
+
+    response = client.get(f'/clips/{clip.id}/segments.edl')
+    assert response.mimetype == 'text/plain'
+    assert 'filename="Goal.edl"' in response.headers['Content-Disposition']
+    assert '00:00:01:00 00:00:05:00 00:00:00:00 00:00:04:00' in response.get_data(as_text=True)
+    assert client.get(f'/clips/{clip.id}/segments.xml').status_code == 404
+
+def test_create_clip_merges_and_snaps(app, client, monkeypatch, tmp_path):
+    """Test overlapping editor segments render once, snapped to keyframes"""
+    monkeypatch.chdir(tmp_path)
+    video = Video(title='Match', file_path=str(tmp_path / 'match.mp4'), duration=120)
+    db.session.add(video)
+    db.session.commit()
+    rendered = []
+    monkeypatch.setattr(worker_module, 'probe_keyframes', lambda path: [0.0, 8.0, 16.0])
+    monkeypatch.setattr(worker_module, 'render_clip', lambda source, intervals, output, **kwargs:
+                        rendered.append(intervals) or subprocess.CompletedProcess([], 0, '', ''))
+
+    segments = [{'start': '00:12', 'end': '00:20'}, {'start': '00:10', 'end': '00:14'}]
+    response = client.post('/create-clip', data={
+        'video_id': video.id, 'clip_name': 'Goal',
+        'segments': json.dumps({'segments': segments, 'snap_keyframes': True})})
+    assert response.get_json()['status'] == 'success'
+    assert json.loads(Job.query.one().payload)['segments'] == [{'start': '00:10', 'end': '00:20'}]
+
+    assert Worker(app, ['clip']).run_once()
+    assert rendered == [[(8.0, 20.0)]]
+    clip = Clip.query.one()
+    assert (clip.start_time, clip.end_time) == ('00:08', '00:20')
+    assert [(segment.start_time, segment.end_time) for segment in clip.segments] == [('00:08', '00:20')]
@@ -0,0 +1,23 @@
+from benchmarks.startup import check_startup, measure_startup, parse_importtime
+
+def test_parse_importtime():
+    """Test -X importtime lines are parsed into module timings"""
+    stderr = ("import time: self [us] | cumulative | imported package\n"
+              "import time:       120 |        120 |   helper\n"
+              "import time:      1308 |     761384 | app\n")
+    assert parse_importtime(stderr) == [('helper', 120, 120), ('app', 1308, 761384)]
+
+def test_check_startup_reports_budget_and_lazy_modules():
+    """Test a slow import and an eager subsystem are both reported"""
+    measurement = {'import_ms': 2000, 'modules': ['app', 'tkinter']}
+    assert check_startup(measurement, budget_ms=1500) == [
+        'import took 2000 ms, budget is 1500 ms', 'tkinter is imported at startup']
+
+def test_startup_skips_lazy_subsystems():
+    """Test importing and building the app does not load the lazy subsystems
+
+    The import time budget depends on the machine, so it is only checked
+    by `python -m benchmarks.startup`.
+    """
+    measurement = measure_startup()
+    assert check_startup(measurement, budget_ms=float('inf')) == []
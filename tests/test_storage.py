@@ -0,0 +1,146 @@
+import json
+import os
+import subprocess
+import time
+import worker as worker_module
+from background import stop_background_worker
+from helper import clip_thumbnail_settings
+from jobs import job_status
+from models.models import db, Clip, ClipSegment, Job, StorageArtifact, Video
+from storage import evict_to_quota, reconcile_storage, storage_usage
+from worker import Worker
+
+FINGERPRINT = 'ab' * 10
+
+
+def _write(path, size, age=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'x' * size)
+    if age:
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+    return path
+
+
+def _library(tmp_path):
+    """One video with a clip (file, poster, preview) and two store thumbnails"""
+    static = tmp_path / 'static'
+    store = static / 'thumbnails' / 'store'
+    clip_file = _write(tmp_path / 'clips' / 'goal.mp4', 5000)
+    _write(static / 'thumbnails' / 'clips' / 'goal.webp', 300, age=300)
+    _write(static / 'thumbnails' / 'clips' / 'goal_preview.webp', 700, age=200)
+    _write(store / 'ab' / f'{FINGERPRINT}_1000_md.webp', 400, age=100)
+    _write(store / 'ab' / f'{FINGERPRINT}_1000_sm.webp', 100)
+
+    video = Video(title='Final', file_path=str(tmp_path / 'final.mp4'), fingerprint=FINGERPRINT)
+    clip = Clip(video=video, clip_name='Goal', start_time='0:00', end_time='0:05',
+                clip_path=str(clip_file), thumbnail_path='thumbnails/clips/goal.webp',
+                preview_path='thumbnails/clips/goal_preview.webp')
+    db.session.add(clip)
+    db.session.commit()
+    reconcile_storage(str(store), str(static))
+    return video.id, clip.id, clip_file
+
+def test_reconcile_attributes_files_to_videos(app, tmp_path):
+    """Test the ledger records every artifact with its size and owner"""
+    video_id, clip_id, _ = _library(tmp_path)
+
+    usage = storage_usage()
+    assert usage['total_bytes'] == 6500
+    assert usage['evictable_bytes'] == 1500
+    assert usage['by_kind']['clip'] == {'count': 1, 'bytes': 5000}
+    assert usage['by_kind']['thumbnail'] == {'count': 2, 'bytes': 500}
+    assert usage['videos'] == [{'video_id': video_id, 'title': 'Final', 'bytes': 6500}]
+    assert StorageArtifact.query.filter_by(kind='clip_poster').one().clip_id == clip_id
+
+def test_reconcile_drops_rows_for_missing_files(app, tmp_path):
+    """Test files removed by hand disappear from the ledger"""
+    _library(tmp_path)
+    os.remove(tmp_path / 'static' / 'thumbnails' / 'store' / 'ab' / f'{FINGERPRINT}_1000_sm.webp')
+
+    reconcile_storage(str(tmp_path / 'static' / 'thumbnails' / 'store'), str(tmp_path / 'static'))
+    assert StorageArtifact.query.filter_by(kind='thumbnail').count() == 1
+
+def test_eviction_is_lru_and_spares_clips(app, tmp_path):
+    """Test eviction removes the oldest regenerable files and never the clip"""
+    _, clip_id, clip_file = _library(tmp_path)
+
+    # 6500 bytes against a 6200 byte quota: evict down to 5580
+    freed = evict_to_quota(6200)
+
+    assert freed == 1000
+    assert sorted(row.kind for row in StorageArtifact.query.all()) == ['clip', 'thumbnail', 'thumbnail']
+    assert clip_file.exists()
+    assert not (tmp_path / 'static' / 'thumbnails' / 'clips' / 'goal.webp').exists()
+    clip = db.session.get(Clip, clip_id)
+    assert clip.thumbnail_path is None and clip.preview_path is None
+
+def test_eviction_stops_when_only_clips_remain(app, tmp_path):
+    """Test a quota below the size of user clips only evicts derived media"""
+    _, _, clip_file = _library(tmp_path)
+
+    assert evict_to_quota(100) == 1500
+    assert [row.kind for row in StorageArtifact.query.all()] == ['clip']
+    assert clip_file.exists()
+
+def test_storage_report_endpoint(app, client, tmp_path):
+    """Test the usage report is served as JSON"""
+    _library(tmp_path)
+    data = client.get('/api/storage').get_json()
+
+    assert data['status'] == 'success'
+    assert data['usage']['total_bytes'] == 6500
+    assert data['usage']['quota_bytes'] == app.config['STORAGE_QUOTA_MB'] * 1024 * 1024
+
+def test_delete_videos_removes_clip_files(app, client, tmp_path):
+    """Test deleting a video removes its clip files and ledger rows"""
+    video_id, _, clip_file = _library(tmp_path)
+
+    response = client.post('/delete-videos', json={'video_ids': [video_id]})
+    stop_background_worker()
+
+    assert response.get_json()['status'] == 'success'
+    assert not clip_file.exists()
+    assert Clip.query.count() == 0
+    assert StorageArtifact.query.filter_by(video_id=video_id).count() == 0
+
+def test_evicted_clip_thumbnails_are_regenerated(app, client, tmp_path, monkeypatch):
+    """Test eviction queues one job for evicted posters and previews, and a worker renders them again"""
+    monkeypatch.chdir(tmp_path)
+    _, clip_id, clip_file = _library(tmp_path)
+    db.session.get(Clip, clip_id).segments = [ClipSegment(start_time='0:00', end_time='0:05')]
+    db.session.commit()
+    evict_to_quota(6200, clip_thumbnails=clip_thumbnail_settings(app.config))
+    job = Job.query.filter_by(kind='clip_thumbnail').one()
+    assert json.loads(job.payload)['clip_ids'] == [clip_id]
+
+    # Listing clips without thumbnails does not queue anything
+    client.get('/clips')
+    assert Job.query.filter_by(kind='clip_thumbnail').count() == 1
+
+    rendered = []
+
+    def fake_render(clip_path, duration, poster_path=None, preview_path=None, **kwargs):
+        rendered.append((clip_path, duration))
+        for path in (poster_path, preview_path):
+            _write(tmp_path / path, 10)
+        return subprocess.CompletedProcess([], 0, '', '')
+    monkeypatch.setattr(worker_module, 'render_clip_thumbnails', fake_render)
+
+    assert Worker(app, ['clip_thumbnail']).run_once()
+    assert rendered == [(str(clip_file), 5.0)]
+    clip = db.session.get(Clip, clip_id)
+    assert clip.thumbnail_path.startswith('thumbnails/clips/') and clip.preview_path.endswith('_preview.webp')
+    assert StorageArtifact.query.filter_by(kind='clip_poster', clip_id=clip_id).count() == 1
+    assert job_status(job.id)['result'] == {'regenerated': 1, 'failed': [], 'skipped': []}
+
+def test_unregenerable_clip_thumbnails_are_not_retried(app, tmp_path, monkeypatch):
+    """Test clips whose file is gone are reported once, not queued again"""
+    _, clip_id, clip_file = _library(tmp_path)
+    os.remove(clip_file)
+    evict_to_quota(6200, clip_thumbnails=clip_thumbnail_settings(app.config))
+    job = Job.query.filter_by(kind='clip_thumbnail').one()
+
+    assert Worker(app, ['clip_thumbnail']).run_once()
+    assert job_status(job.id)['result'] == {'regenerated': 0, 'failed': [], 'skipped': [clip_id]}
+    assert not Worker(app, ['clip_thumbnail']).run_once()
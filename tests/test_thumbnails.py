@@ -0,0 +1,99 @@
+import os
+import time
+from models.models import Video, Clip, db
+from helper import cleanup_orphaned_thumbnails
+from thumbnails import compute_fingerprint, store_path, is_valid_key
+
+def _write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return path
+
+def test_fingerprint_ignores_file_location(tmp_path):
+    """Test that identical content gets the same fingerprint in any folder"""
+    first = _write(tmp_path / 'a' / 'game.mp4', b'x' * 200000)
+    second = _write(tmp_path / 'b' / 'game.mp4', b'x' * 200000)
+    other = _write(tmp_path / 'c' / 'game.mp4', b'y' * 200000)
+
+    assert compute_fingerprint(first) == compute_fingerprint(second)
+    assert compute_fingerprint(first) != compute_fingerprint(other)
+    assert is_valid_key(compute_fingerprint(first), 'md', 'webp')
+
+def test_store_path_is_keyed_by_fingerprint_timestamp_and_size(tmp_path):
+    """Test the store layout for thumbnail renditions"""
+    path = store_path(tmp_path, 'abcdef0123456789abcd', 1000, 'sm', 'webp')
+    assert path == tmp_path / 'ab' / 'abcdef0123456789abcd_1000_sm.webp'
+
+def test_invalid_keys_are_rejected():
+    """Test that malformed thumbnail keys are not accepted"""
+    assert not is_valid_key('../../etc/passwd', 'md', 'webp')
+    assert not is_valid_key('abcdef0123456789abcd', 'huge', 'webp')
+    assert not is_valid_key('abcdef0123456789abcd', 'md', 'gif')
+
+def test_thumbnail_route_serves_immutable_response(app, client, tmp_path, monkeypatch):
+    """Test that stored thumbnails are served with immutable cache headers"""
+    monkeypatch.setitem(app.config, 'THUMBNAIL_STORE', str(tmp_path))
+    fingerprint = 'abcdef0123456789abcd'
+    _write(store_path(tmp_path, fingerprint, 1000, 'md', 'webp'), b'RIFFfake')
+
+    response = client.get(f'/thumbnails/{fingerprint}/1000/md.webp')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    assert 'immutable' in response.headers['Cache-Control']
+    assert response.data == b'RIFFfake'
+
+def test_thumbnail_route_unknown_fingerprint(app, client, tmp_path, monkeypatch):
+    """Test that thumbnails for unknown sources return 404"""
+    monkeypatch.setitem(app.config, 'THUMBNAIL_STORE', str(tmp_path))
+    response = client.get('/thumbnails/abcdef0123456789abcd/1000/md.webp')
+    assert response.status_code == 404
+
+def test_thumbnail_route_rejects_other_timestamps(app, client, tmp_path, monkeypatch):
+    """Test that only the configured thumbnail frame can be requested"""
+    monkeypatch.setitem(app.config, 'THUMBNAIL_STORE', str(tmp_path))
+    fingerprint = 'abcdef0123456789abcd'
+    _write(store_path(tmp_path, fingerprint, 2000, 'md', 'webp'), b'RIFFfake')
+    with app.app_context():
+        db.session.add(Video(title='Game 1', file_path=__file__, fingerprint=fingerprint))
+        db.session.commit()
+
+    assert client.get(f'/thumbnails/{fingerprint}/2000/md.webp').status_code == 404
+    assert client.get(f'/thumbnails/{fingerprint}/1234/md.webp').status_code == 404
+    assert not any(tmp_path.glob('*/*_1234_*'))
+
+def test_library_uses_thumbnail_store_urls(app, client):
+    """Test that the library grid links to sized store renditions"""
+    with app.app_context():
+        db.session.add(Video(title='Game 1', file_path='/videos/game1.mp4',
+                             fingerprint='abcdef0123456789abcd'))
+        db.session.commit()
+
+    response = client.get('/')
+
+    assert b'/thumbnails/abcdef0123456789abcd/1000/md.webp' in response.data
+    assert b'/thumbnails/abcdef0123456789abcd/1000/sm.webp 160w' in response.data
+
+def test_orphaned_clip_thumbnails_collected_after_grace_period(app, tmp_path):
+    """Test that only old, unreferenced clip thumbnails are removed"""
+    old = time.time() - 7200
+    referenced = _write(tmp_path / 'kept.webp', b'0')
+    preview = _write(tmp_path / 'kept_preview.webp', b'0')
+    orphan = _write(tmp_path / 'orphan.webp', b'0')
+    fresh = _write(tmp_path / 'fresh.webp', b'0')
+    for path in (referenced, preview, orphan):
+        os.utime(path, (old, old))
+
+    with app.app_context():
+        video = Video(title='Game 1', file_path='/videos/game1.mp4')
+        db.session.add(Clip(video=video, clip_name='Goal', start_time='00:00',
+                            end_time='00:05', clip_path='clips/1/Goal.mp4',
+                            thumbnail_path='thumbnails/clips/kept.webp',
+                            preview_path='thumbnails/clips/kept_preview.webp'))
+        db.session.commit()
+
+        removed = cleanup_orphaned_thumbnails(tmp_path, grace_seconds=3600)
+
+    assert removed == 1
+    assert not orphan.exists()
+    assert referenced.exists() and preview.exists() and fresh.exists()
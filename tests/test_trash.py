@@ -0,0 +1,180 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import pytest
+from background import start_background_worker, stop_background_worker
+from helper import cleanup_orphaned_thumbnails
+from instrumentation import QueryCounter
+from models.models import db, Clip, ClipSegment, TrashItem, Video
+from trash import purge_expired, restore_batch, restore_item, trash_clips
+
+TTL = 3600
+
+
+@pytest.fixture
+def clips(app, tmp_path):
+    video = Video(title='Match', file_path=str(tmp_path / 'match.mp4'))
+    clips = []
+    for i in range(3):
+        path = tmp_path / f'clip{i}.mp4'
+        path.write_bytes(b'clip')
+        clips.append(Clip(video=video, clip_name=f'Clip {i}', start_time='0:00', end_time='0:05',
+                          clip_path=str(path), thumbnail_path=f'thumbnails/clips/clip{i}.webp',
+                          segments=[ClipSegment(start_time='0:00', end_time='0:02'),
+                                    ClipSegment(start_time='0:03', end_time='0:05')]))
+    db.session.add_all(clips)
+    db.session.commit()
+    return [(clip.id, clip.clip_path) for clip in clips]
+
+def test_trash_and_restore_batch(clips):
+    """Test a trashed batch comes back with its ids, segments and files"""
+    ids = [clip_id for clip_id, _ in clips]
+    batch_id, count = trash_clips(ids[:2], TTL)
+    db.session.commit()
+
+    assert count == 2
+    assert Clip.query.count() == 1 and ClipSegment.query.count() == 2
+    assert not os.path.exists(clips[0][1])
+    assert all(os.path.exists(item.trashed_path) for item in TrashItem.query.all())
+
+    assert restore_batch(batch_id) == (2, 0)
+    db.session.commit()
+    assert sorted(clip.id for clip in Clip.query.all()) == ids
+    assert ClipSegment.query.count() == 6
+    assert all(os.path.exists(path) for _, path in clips)
+    assert TrashItem.query.count() == 0
+
+def test_restore_single_item(clips):
+    """Test restoring one clip out of a batch"""
+    trash_clips([clip_id for clip_id, _ in clips], TTL)
+    db.session.commit()
+    item = TrashItem.query.filter_by(clip_id=clips[1][0]).one()
+
+    assert restore_item(item.id) == (1, 0)
+    db.session.commit()
+    assert [clip.clip_name for clip in Clip.query.all()] == ['Clip 1']
+    assert TrashItem.query.count() == 2
+
+def test_restore_does_not_overwrite_a_newer_clip(clips):
+    """Test a clip restored onto a reused path gets a new file name"""
+    trash_clips([clips[0][0]], TTL)
+    db.session.commit()
+    # A clip rendered since under the same name owns the original path now
+    with open(clips[0][1], 'wb') as newer:
+        newer.write(b'newer')
+    db.session.add(Clip(video_id=Video.query.one().id, clip_name='Clip 0', start_time='0:00',
+                        end_time='0:05', clip_path=clips[0][1]))
+    db.session.commit()
+
+    assert restore_batch(TrashItem.query.one().batch_id) == (1, 0)
+    db.session.commit()
+    restored = db.session.get(Clip, clips[0][0])
+    assert restored.clip_path.endswith('clip0_2.mp4')
+    with open(restored.clip_path, 'rb') as restored_file:
+        assert restored_file.read() == b'clip'
+    with open(clips[0][1], 'rb') as newer:
+        assert newer.read() == b'newer'
+
+def test_restore_purges_clips_of_deleted_videos(client, clips):
+    """Test clips whose video is gone are purged and reported, not left behind"""
+    trash_clips([clips[0][0]], TTL)
+    db.session.commit()
+    item = TrashItem.query.one()
+    trashed_file = item.trashed_path
+    db.session.delete(Video.query.one())
+    db.session.commit()
+
+    response = client.post(f'/clips/restore-batch/{item.batch_id}')
+    assert response.status_code == 410 and 'video was deleted' in response.get_data(as_text=True)
+    assert TrashItem.query.count() == 0
+    assert not os.path.exists(trashed_file)
+
+def test_purge_removes_only_expired_items(clips):
+    """Test the purge deletes expired rows and their files"""
+    ids = [clip_id for clip_id, _ in clips]
+    trash_clips(ids[:1], TTL)
+    trash_clips(ids[1:], TTL * 10)
+    db.session.commit()
+    expired_file = TrashItem.query.filter_by(clip_id=ids[0]).one().trashed_path
+
+    assert purge_expired(datetime.now(timezone.utc) + timedelta(seconds=TTL * 2)) == 1
+    assert not os.path.exists(expired_file)
+    assert sorted(item.clip_id for item in TrashItem.query.all()) == ids[1:]
+
+def test_thumbnail_gc_keeps_trashed_clip_thumbnails(clips, tmp_path):
+    """Test thumbnails of restorable clips survive the orphan sweep"""
+    thumb_dir = tmp_path / 'thumbs'
+    thumb_dir.mkdir()
+    for name in ['clip0.webp', 'clip1.webp', 'stray.webp']:
+        (thumb_dir / name).write_bytes(b'x')
+        old = time.time() - 7200
+        os.utime(thumb_dir / name, (old, old))
+
+    trash_clips([clips[0][0]], TTL)
+    db.session.commit()
+    assert cleanup_orphaned_thumbnails(str(thumb_dir), grace_seconds=3600) == 1
+    assert sorted(os.listdir(thumb_dir)) == ['clip0.webp', 'clip1.webp']
+
+def test_deletes_do_not_grow_the_session_cookie(client, clips):
+    """Test undo state lives in the database, not the cookie"""
+    response = client.delete('/clips/batch-delete',
+                             data={'clip-checkbox': [str(clip_id) for clip_id, _ in clips]})
+    assert '3 clips deleted' in response.get_data(as_text=True)
+    assert 'session=' not in response.headers.get('Set-Cookie', '')
+
+    batch_id = TrashItem.query.first().batch_id
+    assert client.post(f'/clips/restore-batch/{batch_id}').status_code == 200
+    assert Clip.query.count() == 3
+    assert client.post('/clips/restore-batch/missing').status_code == 404
+
+def _make_clips(tmp_path, count):
+    video = Video(title='Bulk', file_path=str(tmp_path / 'bulk.mp4'))
+    clips = []
+    for i in range(count):
+        path = tmp_path / f'bulk{i}.mp4'
+        path.write_bytes(b'clip')
+        clips.append(Clip(video=video, clip_name=f'Bulk {i}', start_time='0:00', end_time='0:05',
+                          clip_path=str(path), segments=[ClipSegment(start_time='0:00', end_time='0:05')]))
+    db.session.add_all(clips)
+    db.session.commit()
+    return [clip.id for clip in clips]
+
+@pytest.mark.parametrize('count', [5, 300])
+def test_batch_delete_statement_count_is_flat(app, client, tmp_path, count):
+    """Test bulk deletion issues the same statements for 5 or 300 clips"""
+    ids = _make_clips(tmp_path, count)
+    with QueryCounter() as counter:
+        response = client.delete('/clips/batch-delete', data={'clip-checkbox': ids},
+                                 headers={'HX-Request': 'true'})
+
+    assert response.status_code == 200
+    assert f'{count} clips deleted' in response.get_data(as_text=True)
+    assert Clip.query.count() == 0 and ClipSegment.query.count() == 0
+    assert TrashItem.query.count() == count
+    writes = [sql for sql, _ in counter.statements if not sql.lstrip().upper().startswith('SELECT')]
+    assert len(writes) <= 4
+
+def test_file_moves_run_on_background_worker(app, client, tmp_path):
+    """Test clip files are renamed by the worker after the commit, in order"""
+    ids = _make_clips(tmp_path, 20)
+    start_background_worker()
+    try:
+        response = client.delete('/clips/batch-delete', data={'clip-checkbox': ids})
+        batch_id = TrashItem.query.first().batch_id
+        # The restore's moves queue behind the move-aside of the same files
+        assert client.post(f'/clips/restore-batch/{batch_id}').status_code == 200
+    finally:
+        stop_background_worker()
+
+    assert response.status_code == 200
+    assert Clip.query.count() == 20
+    assert all((tmp_path / f'bulk{i}.mp4').exists() for i in range(20))
+    assert not list(tmp_path.glob('*.deleted'))
+
+def test_rollback_leaves_files_in_place(clips):
+    """Test a rolled back trash leaves clip files where they were"""
+    trash_clips([clip_id for clip_id, _ in clips], TTL)
+    db.session.rollback()
+
+    assert Clip.query.count() == 3
+    assert all(os.path.exists(path) for _, path in clips)
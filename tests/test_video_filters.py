@@ -0,0 +1,109 @@
+from datetime import datetime, timezone
+import pytest
+from models.models import db, Video, Clip, Folder, Tag
+from video_filters import facet_counts, filter_videos, tag_clause
+
+
+@pytest.fixture
+def library(app):
+    red, green, blue = Tag(name='red'), Tag(name='green'), Tag(name='blue')
+    root = Folder(name='Root')
+    child = Folder(name='Child', parent=root)
+    grandchild = Folder(name='Grandchild', parent=child)
+    other = Folder(name='Other')
+    videos = {}
+    for name, tags, folders, clips, year in [
+        ('a', [red], [root], 0, 2020),
+        ('b', [red, green], [child], 2, 2021),
+        ('c', [green], [grandchild], 5, 2022),
+        ('d', [blue], [other], 1, 2023),
+        ('e', [], [], 0, 2024),
+    ]:
+        video = Video(title=name, file_path=f'/videos/{name}.mp4', tags=tags, folders=folders,
+                      created_at=datetime(year, 1, 1, tzinfo=timezone.utc))
+        video.clips = [Clip(clip_name=f'{name}{i}', start_time='0', end_time='1',
+                            clip_path=f'/clips/{name}{i}.mp4') for i in range(clips)]
+        videos[name] = video
+    db.session.add_all(list(videos.values()) + [other])
+    db.session.commit()
+    return {'red': red.id, 'green': green.id, 'blue': blue.id,
+            'root': root.id, 'child': child.id, 'other': other.id}
+
+def titles(spec, **kwargs):
+    rows, _ = filter_videos(spec, **kwargs)
+    return [row.title for row in rows]
+
+def test_tag_expressions(library):
+    """Test AND, OR and NOT tag expressions"""
+    red, green, blue = library['red'], library['green'], library['blue']
+    assert titles({'tags': red}) == ['a', 'b']
+    assert titles({'tags': [red, green]}) == ['b']
+    assert titles({'tags': {'or': [green, blue]}}) == ['b', 'c', 'd']
+    assert titles({'tags': {'and': [{'or': [red, green]}, {'not': red}]}}) == ['c']
+    assert titles({'tags': {'not': {'or': [red, green, blue]}}}) == ['e']
+
+@pytest.mark.parametrize('expression', ['red', {'xor': [1]}, {'and': []}, {'and': [1], 'or': [2]}, True])
+def test_invalid_tag_expressions(expression):
+    """Test malformed expressions are rejected"""
+    with pytest.raises(ValueError):
+        tag_clause(expression)
+
+def test_folder_scope_includes_subfolders(library):
+    """Test filtering by a folder and everything below it"""
+    assert titles({'folder_id': library['root']}) == ['a', 'b', 'c']
+    assert titles({'folder_id': library['child'], 'include_subfolders': False}) == ['b']
+
+def test_clip_count_and_date_ranges(library):
+    """Test clip count and creation date bounds"""
+    assert titles({'min_clips': 1, 'max_clips': 2}) == ['b', 'd']
+    assert titles({'created_after': '2021-06-01', 'created_before': '2024-01-01'}) == ['c', 'd']
+
+def test_filtered_pages_chain(library):
+    """Test walking the filtered set with cursors"""
+    rows, cursor = filter_videos({}, limit=2)
+    seen = [row.title for row in rows]
+    while cursor:
+        rows, cursor = filter_videos({}, cursor=cursor, limit=2)
+        seen += [row.title for row in rows]
+    assert seen == ['a', 'b', 'c', 'd', 'e']
+
+def test_facet_counts_follow_the_filter(library):
+    """Test total, tag and folder counts are computed for the matching set"""
+    facets = facet_counts({'folder_id': library['root']})
+    assert facets['total'] == 3
+    assert facets['tags'] == {library['red']: 2, library['green']: 2}
+    assert sum(facets['folders'].values()) == 3
+
+    assert facet_counts({})['total'] == 5
+
+def test_filter_api(client, library):
+    """Test the filter endpoint returns ids, a cursor and facets"""
+    response = client.post('/api/videos/filter', json={
+        'filter': {'tags': {'or': [library['green'], library['blue']]}}, 'limit': 2
+    })
+    data = response.get_json()
+    assert data['status'] == 'success'
+    assert len(data['video_ids']) == 2 and data['next_cursor']
+    assert data['facets']['total'] == 3
+
+    response = client.post('/api/videos/filter', json={'filter': {'tags': 'red'}})
+    assert response.status_code == 400
+
+def test_filter_api_limit(client, library):
+    """Test bad limits are rejected and out of range ones clamped"""
+    for limit in (None, 'abc', 1.5):
+        assert client.post('/api/videos/filter', json={'limit': limit}).status_code == 400
+    data = client.post('/api/videos/filter', json={'limit': -1}).get_json()
+    assert len(data['video_ids']) == 1 and data['next_cursor']
+
+def test_organize_grid_and_folder_fragments(client, library):
+    """Test the organize page only inlines the first page and loads the rest"""
+    html = client.get('/organize').get_data(as_text=True)
+    assert 'hx-get="/organize/folders/' in html
+
+    html = client.get(f"/organize/folders/{library['child']}/videos").get_data(as_text=True)
+    assert '<span>b</span>' in html and '<span>c</span>' not in html
+
+    html = client.get('/organize/videos', query_string={
+        'filter': f'{{"tags": {library["blue"]}}}'}).get_data(as_text=True)
+    assert 'data-video-id' in html and '>d</h6>' in html and '>a</h6>' not in html
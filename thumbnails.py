@@ -0,0 +1,113 @@
+import hashlib
+import os
+import re
+import subprocess
+import threading
+import uuid
+from pathlib import Path
+
+# Widths (in pixels) of the renditions kept for every thumbnail key
+THUMBNAIL_SIZES = {
+    'sm': 160,
+    'md': 320,
+    'lg': 640
+}
+
+# Encoder arguments and mimetypes for the supported output formats
+THUMBNAIL_FORMATS = {
+    'webp': {'args': ['-c:v', 'libwebp', '-quality', '80'], 'mimetype': 'image/webp'},
+    'avif': {'args': ['-c:v', 'libaom-av1', '-still-picture', '1', '-crf', '32'], 'mimetype': 'image/avif'},
+    'jpg': {'args': ['-q:v', '3'], 'mimetype': 'image/jpeg'}
+}
+
+FINGERPRINT_PATTERN = re.compile(r'^[0-9a-f]{20}$')
+
+# Bytes hashed from the start and the end of a file when fingerprinting
+_SAMPLE_SIZE = 64 * 1024
+
+# Striped locks so concurrent requests for one key only render it once
+_key_locks = [threading.Lock() for _ in range(64)]
+
+
+def compute_fingerprint(file_path):
+    """Fingerprint a media file from its size and sampled content"""
+    size = os.path.getsize(file_path)
+    digest = hashlib.sha1(str(size).encode())
+    with open(file_path, 'rb') as media_file:
+        digest.update(media_file.read(_SAMPLE_SIZE))
+        if size > 2 * _SAMPLE_SIZE:
+            media_file.seek(size - _SAMPLE_SIZE)
+            digest.update(media_file.read(_SAMPLE_SIZE))
+    return digest.hexdigest()[:20]
+
+
+def is_valid_key(fingerprint, size, fmt):
+    """Check that a requested thumbnail key is well formed"""
+    return (bool(FINGERPRINT_PATTERN.match(fingerprint or ''))
+            and size in THUMBNAIL_SIZES
+            and fmt in THUMBNAIL_FORMATS)
+
+
+def store_path(root, fingerprint, timestamp_ms, size, fmt):
+    """Location of a thumbnail rendition inside the store"""
+    return Path(root) / fingerprint[:2] / f"{fingerprint}_{timestamp_ms}_{size}.{fmt}"
+
+
+def render_thumbnail(source_path, output_path, timestamp_ms, size, fmt):
+    """Render a single thumbnail rendition with FFmpeg"""
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = output_path.with_name(f".{output_path.name}.{uuid.uuid4().hex[:8]}.tmp")
+
+    cmd = [
+        'ffmpeg', '-y',
+        '-ss', f"{timestamp_ms / 1000:.3f}",
+        '-i', str(source_path),
+        '-frames:v', '1',
+        '-vf', f"scale={THUMBNAIL_SIZES[size]}:-2",
+        *THUMBNAIL_FORMATS[fmt]['args'],
+        '-f', 'image2',
+        str(temp_path)
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0 or not temp_path.exists():
+            print(f"Error generating thumbnail: {result.stderr}")
+            return False
+        os.replace(temp_path, output_path)
+        return True
+    except Exception as e:
+        print(f"Error generating thumbnail: {str(e)}")
+        return False
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def get_or_create_thumbnail(root, source_path, fingerprint, timestamp_ms, size, fmt):
+    """Return the path of a thumbnail rendition, rendering it on first use"""
+    path = store_path(root, fingerprint, timestamp_ms, size, fmt)
+    if path.exists():
+        _touch(path)
+        return path
+
+    if source_path is None:
+        return None
+
+    with _key_lock(path.name):
+        if not path.exists():
+            if not render_thumbnail(source_path, path, timestamp_ms, size, fmt):
+                return None
+    return path
+
+
+def _touch(path):
+    """Mark a rendition as recently used for storage eviction"""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def _key_lock(name):
+    return _key_locks[hash(name) % len(_key_locks)]
@@ -0,0 +1,172 @@
+import json
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import delete, insert, select
+from models.models import db, Clip, ClipSegment, TrashItem, Video
+from background import submit_after_commit, submit_background
+from storage import move_files, remove_files
+
+TRASHED_SUFFIX = '.deleted'
+
+
+def trash_clips(clip_ids, ttl_seconds):
+    """Move clips to the trash as one batch
+
+    Clip rows and segments are copied into trash_items and deleted in the
+    caller's transaction; once it commits, clip files are renamed aside by
+    the background worker so they can be restored until the batch expires.
+    Returns (batch_id, trashed_count).
+    """
+    clips = Clip.query.filter(Clip.id.in_(clip_ids)).all()
+    if not clips:
+        return None, 0
+
+    segments = {}
+    for segment in ClipSegment.query.filter(ClipSegment.clip_id.in_([c.id for c in clips]))\
+            .order_by(ClipSegment.id):
+        segments.setdefault(segment.clip_id, []).append({
+            'start_time': segment.start_time,
+            'end_time': segment.end_time
+        })
+
+    batch_id = uuid.uuid4().hex
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    items = []
+    for clip in clips:
+        items.append({
+            'batch_id': batch_id,
+            'clip_id': clip.id,
+            'video_id': clip.video_id,
+            'clip_name': clip.clip_name,
+            'data': json.dumps({
+                'clip_name': clip.clip_name,
+                'start_time': clip.start_time,
+                'end_time': clip.end_time,
+                'clip_path': clip.clip_path,
+                'thumbnail_path': clip.thumbnail_path,
+                'preview_path': clip.preview_path,
+                'created_at': clip.created_at.isoformat() if clip.created_at else None,
+                'segments': segments.get(clip.id, [])
+            }),
+            'original_path': clip.clip_path,
+            'trashed_path': _trashed_path(clip.clip_path, batch_id),
+            'thumbnail_path': clip.thumbnail_path,
+            'preview_path': clip.preview_path,
+            'deleted_at': now,
+            'expires_at': expires_at
+        })
+
+    db.session.execute(insert(TrashItem), items)
+    ids = [clip.id for clip in clips]
+    db.session.execute(delete(ClipSegment).where(ClipSegment.clip_id.in_(ids)))
+    db.session.execute(delete(Clip).where(Clip.id.in_(ids)),
+                       execution_options={'synchronize_session': False})
+
+    # Renaming hundreds of files is left to the background worker
+    submit_after_commit(db.session, move_files,
+                        [(item['original_path'], item['trashed_path'])
+                         for item in items if item['trashed_path']])
+    return batch_id, len(items)
+
+
+def restore_batch(batch_id):
+    """Restore every clip in a trash batch
+
+    Returns (restored, purged): clips whose video has been deleted since
+    can never come back, so they are purged instead.
+    """
+    return _restore(TrashItem.query.filter_by(batch_id=batch_id).all())
+
+
+def restore_item(item_id):
+    """Restore a single trashed clip; returns (restored, purged) like restore_batch"""
+    item = db.session.get(TrashItem, item_id)
+    return _restore([item] if item else [])
+
+
+def purge_expired(now=None):
+    """Permanently delete expired trash items and their files"""
+    now = now or datetime.now(timezone.utc)
+    expired = db.session.execute(
+        select(TrashItem.id, TrashItem.trashed_path).where(TrashItem.expires_at <= now)
+    ).all()
+    if not expired:
+        return 0
+
+    # Thumbnails are left for the orphaned-thumbnail sweep to collect
+    db.session.execute(delete(TrashItem).where(TrashItem.id.in_([row.id for row in expired])))
+    db.session.commit()
+    submit_background(remove_files, [path for _, path in expired if path])
+    return len(expired)
+
+
+def _restore(items):
+    video_ids = {row[0] for row in db.session.execute(
+        select(Video.id).where(Video.id.in_({item.video_id for item in items})))}
+    taken_ids = {row[0] for row in db.session.execute(
+        select(Clip.id).where(Clip.id.in_([item.clip_id for item in items])))}
+    taken_paths = {row[0] for row in db.session.execute(
+        select(Clip.clip_path).where(Clip.clip_path.in_([item.original_path for item in items])))}
+
+    restored = 0
+    moves = []
+    purged = []
+    for item in items:
+        if item.video_id not in video_ids:
+            purged.append(item.trashed_path)
+            db.session.delete(item)
+            continue
+        data = json.loads(item.data)
+        clip_path = (_free_path(data['clip_path'], item.trashed_path, taken_paths)
+                     if item.trashed_path else data['clip_path'])
+        taken_paths.add(clip_path)
+        clip = Clip(
+            # Keep the original id unless it has been reused since
+            id=None if item.clip_id in taken_ids else item.clip_id,
+            video_id=item.video_id,
+            clip_name=data['clip_name'],
+            start_time=data['start_time'],
+            end_time=data['end_time'],
+            clip_path=clip_path,
+            thumbnail_path=data['thumbnail_path'],
+            preview_path=data['preview_path'],
+            created_at=datetime.fromisoformat(data['created_at']) if data['created_at'] else None,
+            segments=[ClipSegment(**segment) for segment in data['segments']]
+        )
+        db.session.add(clip)
+        if item.trashed_path:
+            moves.append((item.trashed_path, clip_path))
+        db.session.delete(item)
+        restored += 1
+
+    # Queued behind any pending move-aside of the same files
+    submit_after_commit(db.session, move_files, moves)
+    if purged:
+        submit_after_commit(db.session, remove_files, [path for path in purged if path])
+    return restored, len(purged)
+
+
+def _free_path(path, trashed_path, taken_paths):
+    """`path`, or a numbered variant if a newer clip has been saved there
+
+    Clips rendered since the trashing reuse the same name, so restoring
+    onto an existing file would overwrite the newer clip. A file still at
+    `path` before the move-aside has run is the trashed clip's own.
+    """
+    stem, ext = os.path.splitext(path)
+    candidate = path
+    suffix = 2
+    while candidate in taken_paths or (os.path.exists(candidate)
+                                       and (candidate != path or os.path.exists(trashed_path))):
+        candidate = f"{stem}_{suffix}{ext}"
+        suffix += 1
+    return candidate
+
+
+def _trashed_path(path, batch_id):
+    """Where a clip file is kept while trashed, or None if it is missing"""
+    if not path or not os.path.exists(path):
+        return None
+    return f"{path}.{batch_id[:8]}{TRASHED_SUFFIX}"
@@ -0,0 +1,118 @@
+from datetime import datetime
+from sqlalchemy import and_, func, literal, not_, or_, select, union_all
+from models.models import db, Clip, Video, video_folders, video_tags
+from folder_tree import subtree_ids
+from pagination import keyset_page
+
+# Deepest tag expression accepted, to bound the generated SQL
+MAX_EXPRESSION_DEPTH = 16
+
+
+def tag_clause(expression, depth=0):
+    """Translate a tag expression into a condition on Video.id
+
+    An expression is a tag id, a list of expressions (all must match), or
+    a dict with one of the keys 'and', 'or' (lists) or 'not' (one
+    expression). Raises ValueError for anything else.
+    """
+    if depth > MAX_EXPRESSION_DEPTH:
+        raise ValueError('Tag expression is nested too deeply')
+
+    if isinstance(expression, bool) or not isinstance(expression, (int, list, dict)):
+        raise ValueError(f'Invalid tag expression: {expression!r}')
+    if isinstance(expression, int):
+        # Served by the (tag_id, video_id) index
+        return Video.id.in_(select(video_tags.c.video_id).where(video_tags.c.tag_id == expression))
+    if isinstance(expression, list):
+        expression = {'and': expression}
+    if len(expression) != 1:
+        raise ValueError('Tag expression objects take exactly one operator')
+
+    operator, operand = next(iter(expression.items()))
+    if operator == 'not':
+        return not_(tag_clause(operand, depth + 1))
+    if operator in ('and', 'or') and isinstance(operand, list) and operand:
+        clauses = [tag_clause(item, depth + 1) for item in operand]
+        return and_(*clauses) if operator == 'and' else or_(*clauses)
+    raise ValueError(f'Invalid tag operator: {operator!r}')
+
+
+def filter_conditions(spec):
+    """Build the WHERE conditions for a filter spec
+
+    Supported keys: `tags` (a tag expression), `folder_id` with
+    `include_subfolders` (default true), `min_clips`/`max_clips` and
+    `created_after`/`created_before` (ISO dates).
+    """
+    spec = spec or {}
+    conditions = []
+
+    if spec.get('tags') is not None:
+        conditions.append(tag_clause(spec['tags']))
+
+    if spec.get('folder_id') is not None:
+        folder_id = _integer(spec, 'folder_id')
+        folder_ids = subtree_ids(folder_id) if spec.get('include_subfolders', True) else [folder_id]
+        conditions.append(Video.id.in_(
+            select(video_folders.c.video_id).where(video_folders.c.folder_id.in_(folder_ids))
+        ))
+
+    if spec.get('min_clips') is not None or spec.get('max_clips') is not None:
+        clip_count = select(func.count(Clip.id)).where(Clip.video_id == Video.id).scalar_subquery()
+        if spec.get('min_clips') is not None:
+            conditions.append(clip_count >= _integer(spec, 'min_clips'))
+        if spec.get('max_clips') is not None:
+            conditions.append(clip_count <= _integer(spec, 'max_clips'))
+
+    if spec.get('created_after'):
+        conditions.append(Video.created_at >= _date(spec, 'created_after'))
+    if spec.get('created_before'):
+        conditions.append(Video.created_at < _date(spec, 'created_before'))
+
+    return conditions
+
+
+def filter_videos(spec, cursor=None, limit=100):
+    """One keyset page of videos matching a filter spec, ordered by title
+
+    Returns (rows, next_cursor); rows have `id`, `title` and `thumbnail_path`.
+    """
+    query = db.session.query(Video.id, Video.title, Video.thumbnail_path)\
+        .filter(*filter_conditions(spec))
+    return keyset_page(query, [Video.title, Video.id], cursor, limit)
+
+
+def facet_counts(spec):
+    """Count matching videos overall, per tag and per folder in one query"""
+    matching = select(Video.id).where(*filter_conditions(spec))
+    rows = db.session.execute(union_all(
+        select(literal('total'), literal(None), func.count()).select_from(matching.subquery()),
+        select(literal('tag'), video_tags.c.tag_id, func.count())
+            .where(video_tags.c.video_id.in_(matching))
+            .group_by(video_tags.c.tag_id),
+        select(literal('folder'), video_folders.c.folder_id, func.count())
+            .where(video_folders.c.video_id.in_(matching))
+            .group_by(video_folders.c.folder_id),
+    )).all()
+
+    facets = {'total': 0, 'tags': {}, 'folders': {}}
+    for kind, key, count in rows:
+        if kind == 'total':
+            facets['total'] = count
+        else:
+            facets[f'{kind}s'][key] = count
+    return facets
+
+
+def _integer(spec, key):
+    value = spec[key]
+    if isinstance(value, bool) or not isinstance(value, int):
+        raise ValueError(f'{key} must be an integer')
+    return value
+
+
+def _date(spec, key):
+    try:
+        return datetime.fromisoformat(spec[key])
+    except (TypeError, ValueError):
+        raise ValueError(f'{key} must be an ISO date')
@@ -0,0 +1,362 @@
+"""Render worker: claims clip, scan, thumbnail, proxy and analysis jobs from the database queue
+
+Run one or more with `python -m worker` on any host that shares the
+database (and media paths) with the web app:
+
+    python -m worker                     # every job kind
+    python -m worker --kinds clip        # only clip renders
+    python -m worker --once              # drain the queue and exit
+    python -m worker --metrics-port 9101 # expose job and FFmpeg metrics
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from database import submit_write
+from storage import record_artifacts
+from helper import (backfill_video_durations, clip_thumbnail_paths, ingest_video_files, is_video_file,
+                    save_clip, save_clip_thumbnails, timeToSeconds)
+from jobs import claim_job, complete_job, enqueue, fail_job, heartbeat
+from media_worker import probe_keyframes, warm_thumbnail_store
+from metrics import ENCODE_SPEED, FFMPEG_DURATION, JOB_DURATION, render_metrics
+from models.models import db, Clip, Video
+from proxies import find_proxy, mark_proxy_failed, proxy_failed, proxy_path, render_proxy
+from render import render_clip, render_clip_thumbnails, render_clips
+from segments import normalize_segments, snap_to_keyframes, to_segment_dicts
+
+# Handlers by job kind; each takes (payload, report) and returns a JSON-able result
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+class LeaseLost(Exception):
+    """The job was taken over by another worker after this one's lease lapsed"""
+
+
+class Worker:
+    """Claims and runs jobs, keeping each one's lease alive while it runs"""
+
+    def __init__(self, app, kinds=None, lease_seconds=60, poll_interval=1.0, retry_delay=5):
+        self.app = app
+        self.kinds = list(kinds) if kinds else list(JOB_HANDLERS)
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.retry_delay = retry_delay
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+    def run_once(self):
+        """Claim and run one job; returns False when nothing was runnable"""
+        with self.app.app_context():
+            job = claim_job(self.worker_id, self.kinds, self.lease_seconds)
+            if job is None:
+                return False
+            self._run(job)
+            return True
+
+    def run(self, stop_event=None):
+        """Run jobs until `stop_event` is set, polling while the queue is empty"""
+        stop_event = stop_event or threading.Event()
+        while not stop_event.is_set():
+            try:
+                if not self.run_once():
+                    stop_event.wait(self.poll_interval)
+            except Exception as e:
+                # Keep the worker alive through database hiccups
+                print(f"Worker {self.worker_id} error: {str(e)}")
+                stop_event.wait(self.poll_interval)
+
+    def _run(self, job):
+        stop = threading.Event()
+        keep_alive = threading.Thread(target=self._keep_alive, args=(job['id'], stop), daemon=True)
+        keep_alive.start()
+
+        def report(progress, status=None):
+            if not heartbeat(job['id'], self.worker_id, self.lease_seconds, progress, status):
+                raise LeaseLost(f"Lost the lease on job {job['id']}")
+
+        started = time.perf_counter()
+        outcome = 'succeeded'
+        try:
+            handler = JOB_HANDLERS[job['kind']]
+            result = handler(job['payload'], report)
+        except LeaseLost as e:
+            outcome = 'lease_lost'
+            db.session.rollback()
+            print(str(e))
+        except Exception as e:
+            outcome = 'failed'
+            db.session.rollback()
+            print(f"Job {job['id']} ({job['kind']}) failed: {str(e)}")
+            fail_job(job['id'], self.worker_id, str(e), self.retry_delay)
+        else:
+            complete_job(job['id'], self.worker_id, result)
+        finally:
+            stop.set()
+            keep_alive.join()
+            JOB_DURATION.observe(time.perf_counter() - started, kind=job['kind'], outcome=outcome)
+
+    def _keep_alive(self, job_id, stop):
+        # Renders can run longer than a lease without reporting progress
+        with self.app.app_context():
+            while not stop.wait(self.lease_seconds / 3):
+                if not heartbeat(job_id, self.worker_id, self.lease_seconds):
+                    return
+
+
+def start_worker_threads(app, count):
+    """Run `count` workers as daemon threads inside the web process"""
+    threads = []
+    for index in range(count):
+        worker = Worker(app, lease_seconds=app.config['JOB_LEASE_SECONDS'],
+                        poll_interval=app.config['JOB_POLL_INTERVAL'])
+        thread = threading.Thread(target=worker.run, name=f'job-worker-{index}', daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def snap_clip(fields, segments, keyframes):
+    """Clip fields and segments with each start moved back onto a keyframe (cut points only)"""
+    segments = to_segment_dicts(snap_to_keyframes(normalize_segments(segments), keyframes))
+    return dict(fields, start_time=segments[0]['start'], end_time=segments[-1]['end']), segments
+
+
+@job_handler('clip')
+def render_clip_job(payload, report):
+    """Render a clip with its poster and preview, then save it"""
+    video = db.session.get(Video, payload['fields']['video_id'])
+    if video is None:
+        raise ValueError(f"Video {payload['fields']['video_id']} no longer exists")
+    source_path = video.file_path
+    # Release the read snapshot rather than hold it for the whole render
+    db.session.rollback()
+
+    fields, segments = payload['fields'], payload['segments']
+    if payload.get('snap_keyframes'):
+        fields, segments = snap_clip(fields, segments, probe_keyframes(source_path))
+    intervals = [(timeToSeconds(segment['start']), timeToSeconds(segment['end']))
+                 for segment in segments]
+
+    report(10, 'Rendering clip')
+    started = time.perf_counter()
+    result = render_clip(source_path, intervals, payload['output_path'],
+                         poster_path=payload.get('poster_path'),
+                         preview_path=payload.get('preview_path'),
+                         preview_seconds=payload.get('preview_seconds', 3))
+    elapsed = time.perf_counter() - started
+    FFMPEG_DURATION.observe(elapsed, kind='clip')
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg error: {result.stderr.strip()[-500:]}")
+    if elapsed > 0:
+        ENCODE_SPEED.observe(sum(end - start for start, end in intervals) / elapsed)
+
+    report(90, 'Saving clip')
+    return {'clip_id': submit_write(save_clip, fields, segments).result()}
+
+
+@job_handler('clip_batch')
+def render_clip_batch_job(payload, report):
+    """Render many clips of one video, decoding the source once per pass"""
+    video = db.session.get(Video, payload['video_id'])
+    if video is None:
+        raise ValueError(f"Video {payload['video_id']} no longer exists")
+    source_path = video.file_path
+    db.session.rollback()
+
+    clips = payload['clips']
+    if payload.get('snap_keyframes'):
+        keyframes = probe_keyframes(source_path)
+        snapped = []
+        for clip in clips:
+            fields, segments = snap_clip(clip['fields'], clip['segments'], keyframes)
+            snapped.append(dict(clip, fields=fields, segments=segments))
+        clips = snapped
+    clips = [dict(clip, intervals=[(timeToSeconds(segment['start']), timeToSeconds(segment['end']))
+                                   for segment in clip['segments']])
+             for clip in clips]
+    report(5, f"Rendering {len(clips)} clips")
+    started = time.perf_counter()
+    results = render_clips(source_path, clips, preview_seconds=payload.get('preview_seconds', 3),
+                           on_pass=lambda done, total: report(5 + int(done / total * 85),
+                                                              f"Rendered pass {done} of {total}"))
+    elapsed = time.perf_counter() - started
+    FFMPEG_DURATION.observe(elapsed, kind='clip_batch')
+
+    rendered = [clip for clip, result in zip(clips, results) if result.returncode == 0]
+    if not rendered:
+        raise RuntimeError(f"FFmpeg error: {results[0].stderr.strip()[-500:]}")
+    if elapsed > 0:
+        ENCODE_SPEED.observe(sum(end - start for clip in rendered for start, end in clip['intervals']) / elapsed)
+
+    report(90, 'Saving clips')
+    clip_ids = [submit_write(save_clip, clip['fields'], clip['segments']).result() for clip in rendered]
+    return {'clip_ids': clip_ids,
+            'failed': [clip['fields']['clip_name'] for clip, result in zip(clips, results)
+                       if result.returncode != 0]}
+
+
+@job_handler('clip_thumbnail')
+def regenerate_clip_thumbnails_job(payload, report):
+    """Re-render clip posters and previews from the clip files after eviction
+
+    Queued once per eviction and not retried, so clips that cannot be
+    rendered again (their file is gone, or FFmpeg fails) are listed in the
+    result rather than queued forever.
+    """
+    preview_seconds = payload.get('preview_seconds')
+    clips = [{'id': clip.id, 'video_id': clip.video_id, 'clip_path': clip.clip_path,
+              'poster': clip.thumbnail_path is None,
+              'preview': bool(preview_seconds) and clip.preview_path is None,
+              'duration': sum(timeToSeconds(segment.end_time) - timeToSeconds(segment.start_time)
+                              for segment in clip.segments) or 1.0}
+             for clip in Clip.query.filter(Clip.id.in_(payload['clip_ids']))]
+    db.session.rollback()
+
+    skipped = [clip['id'] for clip in clips
+               if not (clip['poster'] or clip['preview']) or not os.path.exists(clip['clip_path'])]
+    clips = [clip for clip in clips if clip['id'] not in skipped]
+    regenerated = 0
+    failed = []
+    for index, clip in enumerate(clips):
+        report(int(index / len(clips) * 100), f"Rendering thumbnails for clip {index + 1} of {len(clips)}")
+        paths = clip_thumbnail_paths(payload['thumb_dir'], payload['fmt'], clip['video_id'], clip['preview'])
+        started = time.perf_counter()
+        result = render_clip_thumbnails(clip['clip_path'], clip['duration'],
+                                        poster_path=paths['poster_file'] if clip['poster'] else None,
+                                        preview_path=paths['preview_file'],
+                                        preview_seconds=preview_seconds)
+        FFMPEG_DURATION.observe(time.perf_counter() - started, kind='clip_thumbnail')
+        if result.returncode != 0:
+            print(f"Error regenerating thumbnails for clip {clip['id']}: {result.stderr.strip()[-500:]}")
+            failed.append(clip['id'])
+            continue
+        if submit_write(save_clip_thumbnails, clip['id'],
+                        paths['thumbnail_path'] if clip['poster'] else None,
+                        paths['preview_path']).result():
+            regenerated += 1
+    return {'regenerated': regenerated, 'failed': failed, 'skipped': skipped}
+
+
+@job_handler('scan')
+def scan_folder_job(payload, report):
+    """Ingest every video in a folder batch by batch, queueing their thumbnails"""
+    paths = [str(path.absolute()) for path in sorted(Path(payload['folder']).glob('*'))
+             if is_video_file(str(path))]
+    batch_size = payload['batch_size']
+    for start in range(0, len(paths), batch_size):
+        sources = ingest_video_files(paths[start:start + batch_size])
+        enqueue('thumbnail', dict(payload['thumbnails'], sources=sources))
+        if payload.get('proxies'):
+            # After thumbnails: the library needs those first
+            enqueue('proxy', dict(payload['proxies'], sources=sources), priority=-5)
+        db.session.commit()
+        processed = start + len(sources)
+        report(int(processed / len(paths) * 100), f"Processed {processed} of {len(paths)} videos...")
+    return {'processed': len(paths)}
+
+
+@job_handler('thumbnail')
+def warm_thumbnails_job(payload, report):
+    """Pre-render store thumbnails for (path, fingerprint) sources"""
+    report(10, f"Rendering thumbnails for {len(payload['sources'])} videos")
+    started = time.perf_counter()
+    results = warm_thumbnail_store(payload['root'], [tuple(source) for source in payload['sources']],
+                                   payload['timestamp_ms'], payload['fmt'])
+    FFMPEG_DURATION.observe(time.perf_counter() - started, kind='thumbnail')
+    return {'rendered': sum(1 for result in results if result['status'] == 'success'),
+            'failed': sum(1 for result in results if result['status'] == 'error')}
+
+
+@job_handler('proxy')
+def render_proxies_job(payload, report):
+    """Render editing proxies for (path, fingerprint) sources that have none yet"""
+    # One proxy per fingerprint, however many copies of the file were scanned;
+    # sources that failed before are not rendered again
+    sources = {fingerprint: path for path, fingerprint in payload['sources']
+               if fingerprint and find_proxy(payload['root'], fingerprint, payload['height']) is None
+               and not proxy_failed(payload['root'], fingerprint, payload['height'])}
+    sources = [(path, fingerprint) for fingerprint, path in sources.items()]
+    rendered = failed = 0
+    for index, (path, fingerprint) in enumerate(sources):
+        report(int(index / len(sources) * 100), f"Rendering proxy {index + 1} of {len(sources)}")
+        output = proxy_path(payload['root'], fingerprint, payload['height'])
+        started = time.perf_counter()
+        if render_proxy(path, output, payload['height'], payload['gop']):
+            FFMPEG_DURATION.observe(time.perf_counter() - started, kind='proxy')
+            submit_write(record_artifacts, [{'path': str(output), 'kind': 'proxy'}]).result()
+            rendered += 1
+        else:
+            mark_proxy_failed(payload['root'], fingerprint, payload['height'])
+            failed += 1
+    return {'rendered': rendered, 'failed': failed, 'skipped': len(payload['sources']) - len(sources)}
+
+
+@job_handler('analysis')
+def analyze_videos_job(payload, report):
+    """Probe durations for videos that do not have one yet"""
+    report(10, 'Probing video durations')
+    return {'updated': backfill_video_durations(payload.get('limit', 64))}
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        # Collectors read the jobs table, which needs the app's context
+        with self.server.app.app_context():
+            body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_metrics(app, port):
+    """Serve this worker's metrics for Prometheus on a background thread"""
+    server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+    server.app = app
+    threading.Thread(target=server.serve_forever, name='worker-metrics', daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run jobs from the shared render queue')
+    parser.add_argument('--kinds', help='comma-separated job kinds to claim (default: all)')
+    parser.add_argument('--once', action='store_true', help='exit once the queue is empty')
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on this port')
+    args = parser.parse_args(argv)
+
+    from app import create_app
+    # A standalone worker runs no web-side threads of its own
+    app = create_app(JOB_WORKER_THREADS=0, BACKGROUND_TASKS_ENABLED=False, WRITE_QUEUE_ENABLED=False)
+    kinds = args.kinds.split(',') if args.kinds else None
+    worker = Worker(app, kinds, app.config['JOB_LEASE_SECONDS'], app.config['JOB_POLL_INTERVAL'])
+    print(f"Worker {worker.worker_id} claiming {', '.join(worker.kinds)}")
+    if args.metrics_port:
+        serve_metrics(app, args.metrics_port)
+
+    if args.once:
+        while worker.run_once():
+            pass
+        return
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()